@@ -1,19 +1,42 @@
 import os
-import logging
+import hmac
+import time
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+import json
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import RequestEntityTooLarge
 
+from config import Config
+from utils.thread_budget import apply_thread_budget
+from utils.structured_logging import configure_logging, log_request
+
+# TensorFlow's C++ logging is configured from the environment at import time
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+# Thread pools must be sized before the services import TensorFlow, OpenCV and numpy
+thread_budget = apply_thread_budget(Config, include_tensorflow=Config.INFERENCE_MODE != 'sidecar')
+
 # Import our services
 from models.session import session_manager
-from services.ocr_service import OCRService
-from services.face_service import FaceService
+from models.progress import progress_tracker
 from services.age_service import AgeService
+from services.hash_service import HashService
+from services.janitor_service import JanitorService
+from services.shadow_service import ShadowService
 from utils.image_utils import ImageUtils
+from utils.image_store import upload_extension, unique_name
 from utils.validators import Validators
+from utils.multipart_stream import iter_multipart_parts
+from utils.memory_accounting import memory_accountant
+from utils.image_header import HEADER_READ_LIMIT, sniff_image_header, check_image_header
+from utils.geometry_hints import parse_face_box, parse_card_quad
+from utils.node_routing import NodeRouter, CLUSTER_SECRET_HEADER
 from config import config
 
+# Endpoints that run OCR or the face models; shadow evaluation waits for them
+MODEL_ENDPOINTS = {'upload_aadhaar', 'upload_selfie', 'upload_selfie_burst'}
+
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
@@ -25,21 +48,95 @@ def create_app(config_name='default'):
     if not os.path.exists('logs'):
         os.makedirs('logs')
     
-    logging.basicConfig(
-        level=getattr(logging, app.config['LOG_LEVEL']),
-        format='%(asctime)s %(levelname)s: %(message)s',
-        handlers=[
-            logging.FileHandler(app.config['LOG_FILE']),
-            logging.StreamHandler()
-        ]
+    configure_logging(
+        level=app.config['LOG_LEVEL'],
+        log_file=app.config['LOG_FILE'],
+        json_format=app.config['LOG_FORMAT'] == 'json',
+        noisy_loggers=app.config['LOG_NOISY_LOGGERS'],
+        noisy_sample_rate=app.config['LOG_NOISY_SAMPLE_RATE'],
+        queue_size=app.config['LOG_QUEUE_SIZE']
     )
     
+    app.logger.info(f'Thread budget: {thread_budget}')
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+    
+    if app.config['NODE_ID']:
+        router = NodeRouter(
+            app.config['NODE_ID'],
+            app.config['CLUSTER_NODES'],
+            app.config['NODE_FORWARD_TIMEOUT_SECONDS'],
+            form_endpoints={'upload_selfie'}
+        )
+        
+        @app.before_request
+        def route_to_owner_node():
+            return router.route(request)
+    
+    @app.after_request
+    def log_request_event(response):
+        if request.endpoint == 'session_events':
+            return response  # streaming; the response outlives this hook
+        # Only use a form that was already parsed: parsing here could consume a streamed body
+        form = request.__dict__.get('form')
+        session_id = (request.view_args or {}).get('session_id') or request.args.get('session_id') \
+            or (form.get('session_id') if form else None)
+        log_request(
+            app.logger, g.get('request_started', time.perf_counter()), response.status_code,
+            method=request.method, path=request.path, session_id=session_id
+        )
+        return response
+    
     # Initialize services
-    ocr_service = OCRService()
-    face_service = FaceService()
+    if app.config['INFERENCE_MODE'] == 'sidecar':
+        # Models live in the inference server; this worker never loads TensorFlow
+        from services.inference_client import InferenceClient
+        ocr_service = face_service = InferenceClient()
+    else:
+        from services.ocr_service import OCRService
+        from services.face_service import FaceService
+        ocr_service = OCRService()
+        face_service = FaceService()
     age_service = AgeService()
+    hash_owner = app.config['DOCUMENT_HASH_NODE']
+    if app.config['NODE_ID'] and hash_owner and hash_owner != app.config['NODE_ID']:
+        if hash_owner not in app.config['CLUSTER_NODES']:
+            raise ValueError(f'DOCUMENT_HASH_NODE {hash_owner!r} is not in CLUSTER_NODES')
+        if not app.config['CLUSTER_SECRET']:
+            raise ValueError('DOCUMENT_HASH_NODE needs CLUSTER_SECRET to call the owner node')
+        hash_service = HashService(owner_url=app.config['CLUSTER_NODES'][hash_owner], secret=app.config['CLUSTER_SECRET'])
+    else:
+        hash_service = HashService()
+    if app.config['NODE_ID'] and not hash_owner:
+        app.logger.warning(
+            'NODE_ID is set without DOCUMENT_HASH_NODE: each node keeps its own document hash index, '
+            'so a document reused on another node is not detected'
+        )
     image_utils = ImageUtils()
     validators = Validators()
+    janitor_service = JanitorService(session_manager, image_utils)
+    if app.config['JANITOR_ENABLED']:
+        janitor_service.start()
+    shadow_service = None
+    if app.config['SHADOW_ENABLED'] and app.config['SHADOW_CONFIGS']:
+        if app.config['INFERENCE_MODE'] == 'sidecar':
+            app.logger.warning('Shadow evaluation needs local models and is disabled in sidecar mode')
+        else:
+            shadow_service = ShadowService()
+            shadow_service.start()
+            
+            @app.before_request
+            def hold_shadow_evaluation():
+                if request.endpoint in MODEL_ENDPOINTS:
+                    shadow_service.primary_started()
+                    g.shadow_held = True
+            
+            @app.teardown_request
+            def release_shadow_evaluation(exc):
+                if g.pop('shadow_held', False):
+                    shadow_service.primary_finished()
     
     @app.errorhandler(413)
     @app.errorhandler(RequestEntityTooLarge)
@@ -56,9 +153,47 @@ def create_app(config_name='default'):
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'node_id': app.config['NODE_ID'] or None,
+            'thread_budget': thread_budget
         })
     
+    if app.config['NODE_ID'] and hash_owner == app.config['NODE_ID']:
+        @app.route('/internal/document-hashes/<action>', methods=['POST'])
+        def document_hash_index(action):
+            """The cluster's document hash index, used by the other nodes' HashService"""
+            secret = app.config['CLUSTER_SECRET']
+            if not secret or not hmac.compare_digest(request.headers.get(CLUSTER_SECRET_HEADER, ''), secret):
+                return jsonify({'error': 'Forbidden'}), 403
+            data = request.get_json(silent=True) or {}
+            try:
+                doc_hash = int(data['hash'], 16)
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'error': 'Invalid hash'}), 400
+            if action == 'lookup':
+                return jsonify({'duplicate': hash_service.find_duplicate(doc_hash)})
+            if action == 'add':
+                hash_service.add(doc_hash, data.get('session_id'), data.get('dob'), data.get('dob_confidence', 0))
+                return jsonify({'success': True})
+            return jsonify({'error': 'Unknown action'}), 404
+    
+    @app.route('/shadow/report', methods=['GET'])
+    def shadow_report():
+        """Agreement and latency of shadow configurations against primary results"""
+        if not shadow_service:
+            return jsonify({'enabled': False})
+        return jsonify({'enabled': True, **shadow_service.report()})
+    
+    @app.route('/metrics/memory', methods=['GET'])
+    def memory_metrics():
+        """Per-stage peak/retained allocations and RSS deltas (MEMORY_ACCOUNTING)"""
+        metrics = memory_accountant.report()
+        metrics['active_sessions'] = len(session_manager.sessions)
+        top = request.args.get('top', type=int)
+        if top:
+            metrics['top_allocations'] = memory_accountant.top_allocations(top)
+        return jsonify(metrics)
+    
     @app.route('/upload-aadhaar', methods=['POST'])
     def upload_aadhaar():
         try:
@@ -71,6 +206,10 @@ def create_app(config_name='default'):
             if not file_validation['valid']:
                 return jsonify({'error': file_validation['error']}), 400
             
+            # Optional geometry from the capture client; checked before it is relied on
+            card_quad = parse_card_quad(request.form.get('card_quad'))
+            aadhaar_face = parse_face_box(request.form.get('face_box'))
+            
             # Save file
             file_path = image_utils.save_uploaded_file(file, 'aadhaar')
             
@@ -80,11 +219,18 @@ def create_app(config_name='default'):
                 image_utils.cleanup_file(file_path)
                 return jsonify({'error': image_validation['error']}), 400
             
-            # Resize if needed
-            image_utils.resize_image(file_path)
+            # Reuse the OCR result of a near-duplicate document if we've seen one
+            doc_hash = hash_service.compute_hash(file_path)
+            duplicate = hash_service.find_duplicate(doc_hash) if doc_hash is not None else None
             
-            # Extract DOB from Aadhaar
-            dob, dob_confidence = ocr_service.extract_dob_from_aadhaar(file_path)
+            timings = {}
+            if duplicate:
+                dob, dob_confidence = duplicate['dob'], duplicate['dob_confidence']
+            else:
+                # Extract DOB from Aadhaar
+                started = time.perf_counter()
+                dob, dob_confidence = ocr_service.extract_dob_from_aadhaar(file_path, card_quad=card_quad)
+                timings['extract_dob'] = round((time.perf_counter() - started) * 1000, 1)
             
             # Calculate age if DOB found
             document_age = None
@@ -96,19 +242,38 @@ def create_app(config_name='default'):
             session_manager.update_session(
                 session_id,
                 aadhaar_path=file_path,
+                aadhaar_face=aadhaar_face,
                 dob=dob,
                 dob_confidence=dob_confidence,
                 extracted_age=document_age,
+                document_reused=duplicate is not None,
+                timings=timings,
                 status='aadhaar_uploaded'
             )
+            janitor_service.track(file_path, session_id)
+            
+            if duplicate:
+                app.logger.warning(
+                    f'Aadhaar for session {session_id} reuses document from session '
+                    f'{duplicate["session_id"]} (distance {duplicate["distance"]})'
+                )
+            elif doc_hash is not None and dob:
+                hash_service.add(doc_hash, session_id, dob, dob_confidence)
+            
+            progress_tracker.publish(session_id, 'aadhaar_processed', {
+                'dob_found': dob is not None,
+                'dob_confidence': dob_confidence,
+                'document_reused': duplicate is not None
+            })
             
-            app.logger.info(f'Aadhaar uploaded for session {session_id}')
+            app.logger.info(f'Aadhaar uploaded for session {session_id}', extra={'session_id': session_id})
             
             return jsonify({
                 'session_id': session_id,
                 'dob': dob,
                 'dob_confidence': dob_confidence,
                 'extracted_age': document_age,
+                'document_reused': duplicate is not None,
                 'message': 'Aadhaar uploaded successfully'
             })
             
@@ -116,8 +281,111 @@ def create_app(config_name='default'):
             app.logger.error(f'Error in upload_aadhaar: {str(e)}')
             return jsonify({'error': 'Failed to process Aadhaar upload'}), 500
     
+    def run_verification(session_id, session, quality=None):
+        """Run face verification and age checks for a session and store the result"""
+        def progress(stage, data):
+            progress_tracker.publish(session_id, stage, data)
+        
+        # Unusable selfies are turned away before the face models run
+        if quality is None:
+            quality = face_service.check_image_quality(session['selfie_path'], face_hint=session.get('selfie_face'))
+        progress('quality_checked', {'acceptable': quality['acceptable'], 'issues': quality['issues']})
+        if not quality['acceptable']:
+            verification_result = {
+                'session_id': session_id,
+                'status': 'RETAKE_REQUIRED',
+                'error': 'Selfie is not usable, please retake it',
+                'issues': quality['issues'],
+                'timestamp': datetime.now().isoformat()
+            }
+            session_manager.update_session(session_id, verification_result=verification_result, status='selfie_rejected')
+            progress('failed', verification_result)
+            return verification_result
+        
+        timings = dict(session.get('timings') or {})
+        
+        # Perform face verification; the gate result stands in for a second selfie detection
+        started = time.perf_counter()
+        face_result = face_service.verify_faces(
+            session['aadhaar_path'],
+            session['selfie_path'],
+            progress=progress,
+            aadhaar_face=session.get('aadhaar_face'),
+            selfie_quality=quality
+        )
+        timings['verify_faces'] = round((time.perf_counter() - started) * 1000, 1)
+        progress('match_computed', {
+            'verified': face_result.get('verified', False),
+            'confidence': face_result.get('confidence'),
+            'error': face_result.get('error')
+        })
+        
+        # Perform age estimation from selfie
+        started = time.perf_counter()
+        age_result = face_service.estimate_age_from_selfie(session['selfie_path'], quality=quality)
+        timings['estimate_age'] = round((time.perf_counter() - started) * 1000, 1)
+        progress('age_estimated', {
+            'estimated_age': age_result.get('estimated_age'),
+            'age_range': age_result.get('age_range'),
+            'error': age_result.get('error')
+        })
+        
+        # Age consistency check
+        age_consistency = None
+        if session.get('extracted_age') and age_result.get('estimated_age'):
+            age_consistency = age_service.verify_age_consistency(
+                session['extracted_age'],
+                age_result['estimated_age']
+            )
+        
+        # Determine overall verification status
+        face_verified = face_result.get('verified', False)
+        age_verified = True  # Default to true if no age data available
+        
+        if age_consistency:
+            age_verified = age_consistency.get('consistent', False)
+        
+        overall_status = 'VERIFIED' if (face_verified and age_verified) else 'REJECTED'
+        
+        # Create verification result
+        verification_result = {
+            'session_id': session_id,
+            'status': overall_status,
+            'face_verification': face_result,
+            'age_estimation': age_result,
+            'age_consistency': age_consistency,
+            'document_info': {
+                'dob': session.get('dob'),
+                'dob_confidence': session.get('dob_confidence'),
+                'extracted_age': session.get('extracted_age')
+            },
+            'eligibility': None,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Check eligibility if age is available
+        if session.get('extracted_age'):
+            eligibility = age_service.is_eligible_for_verification(session['extracted_age'])
+            verification_result['eligibility'] = eligibility
+        
+        # Update session with results
+        session_manager.update_session(
+            session_id,
+            verification_result=verification_result,
+            status='verification_complete'
+        )
+        
+        progress('verification_complete', verification_result)
+        app.logger.info(f'Verification completed for session {session_id}: {overall_status}', extra={'session_id': session_id})
+        
+        if shadow_service:
+            shadow_service.maybe_submit(session_id, session, verification_result, timings)
+        
+        return verification_result
+    
     @app.route('/upload-selfie', methods=['POST'])
     def upload_selfie():
+        session_id = None
         try:
             # Validate session ID
             session_id = request.form.get('session_id')
@@ -134,68 +402,154 @@ def create_app(config_name='default'):
             if not session.get('aadhaar_path') or not session.get('selfie_path'):
                 return jsonify({'error': 'Both Aadhaar and selfie must be uploaded'}), 400
             
-            # Perform face verification
-            face_result = face_service.verify_faces(
-                session['aadhaar_path'],
-                session['selfie_path']
-            )
-            
-            # Perform age estimation from selfie
-            age_result = face_service.estimate_age_from_selfie(session['selfie_path'])
-            
-            # Age consistency check
-            age_consistency = None
-            if session.get('extracted_age') and age_result.get('estimated_age'):
-                age_consistency = age_service.verify_age_consistency(
-                    session['extracted_age'],
-                    age_result['estimated_age']
-                )
+            progress_tracker.reset(session_id)
+            verification_result = run_verification(session_id, session)
+            if verification_result['status'] == 'RETAKE_REQUIRED':
+                return jsonify(verification_result), 422
+            return jsonify(verification_result)
             
-            # Determine overall verification status
-            face_verified = face_result.get('verified', False)
-            age_verified = True  # Default to true if no age data available
+        except Exception as e:
+            app.logger.error(f'Error in verify: {str(e)}')
+            if session_id:
+                progress_tracker.publish(session_id, 'failed', {'error': 'Verification process failed'})
+            return jsonify({'error': 'Verification process failed'}), 500
+    
+    @app.route('/upload-selfie-burst', methods=['POST'])
+    def upload_selfie_burst():
+        """Accept a burst of selfie frames and verify using the best one.
+        
+        Frames are scored as they arrive; reading stops at the first frame that
+        passes the quality thresholds, so the rest of the body is never parsed.
+        """
+        session_id, session = None, None
+        try:
+            boundary = request.mimetype_params.get('boundary')
+            if request.mimetype != 'multipart/form-data' or not boundary:
+                return jsonify({'error': 'Expected multipart/form-data upload'}), 400
             
-            if age_consistency:
-                age_verified = age_consistency.get('consistent', False)
+            session_id = request.args.get('session_id')
+            face_hints = []
+            best = None
+            frames_read = 0
             
-            overall_status = 'VERIFIED' if (face_verified and age_verified) else 'REJECTED'
+            parts = iter_multipart_parts(request.stream, boundary, max_part_size=app.config['MAX_CONTENT_LENGTH'])
+            for name, filename, data in parts:
+                if name == 'session_id' and filename is None:
+                    session_id = data.decode('utf-8', 'ignore').strip()
+                    continue
+                if name == 'face_hints' and filename is None:
+                    # Per-frame face boxes; must precede the frames to be used
+                    try:
+                        face_hints = json.loads(data)
+                    except ValueError:
+                        face_hints = []
+                    if not isinstance(face_hints, list):
+                        face_hints = []
+                    continue
+                if name != 'frames' or not data:
+                    continue
+                
+                # Validate the session before spending any work on frames
+                if session is None:
+                    session_validation = validators.validate_session_id(session_id)
+                    if not session_validation['valid']:
+                        return jsonify({'error': session_validation['error']}), 400
+                    session = session_manager.get_session(session_id)
+                    if not session or not session.get('aadhaar_path'):
+                        return jsonify({'error': 'Invalid session or missing Aadhaar image'}), 400
+                    progress_tracker.reset(session_id)
+                
+                # Reject hostile frames from their header, before decoding
+                try:
+                    header = sniff_image_header(data[:HEADER_READ_LIMIT])
+                    if header is None:
+                        raise ValueError('Could not find image dimensions in the file header')
+                    check_image_header(
+                        header,
+                        max_dimension=app.config['MAX_IMAGE_DIMENSION'],
+                        max_pixels=app.config['MAX_IMAGE_PIXELS']
+                    )
+                except ValueError as e:
+                    return jsonify({'error': f'Invalid frame: {str(e)}'}), 400
+                
+                face_hint = parse_face_box(face_hints[frames_read]) if frames_read < len(face_hints) else None
+                frames_read += 1
+                quality = face_service.assess_frame(data, face_hint=face_hint)
+                if best is None or quality['score'] > best['quality']['score']:
+                    best = {'quality': quality, 'data': data, 'filename': filename, 'index': frames_read - 1}
+                
+                if quality['acceptable'] or frames_read >= app.config['SELFIE_BURST_MAX_FRAMES']:
+                    break
             
-            # Create verification result
-            verification_result = {
-                'session_id': session_id,
-                'status': overall_status,
-                'face_verification': face_result,
-                'age_estimation': age_result,
-                'age_consistency': age_consistency,
-                'document_info': {
-                    'dob': session.get('dob'),
-                    'dob_confidence': session.get('dob_confidence'),
-                    'extracted_age': session.get('extracted_age')
-                },
-                'eligibility': None,
-                'timestamp': datetime.now().isoformat()
-            }
+            if best is None:
+                return jsonify({'error': 'No frames received'}), 400
             
-            # Check eligibility if age is available
-            if session.get('extracted_age'):
-                eligibility = age_service.is_eligible_for_verification(session['extracted_age'])
-                verification_result['eligibility'] = eligibility
+            if best['quality']['score'] == 0:
+                progress_tracker.publish(session_id, 'failed', {
+                    'error': 'No usable frame in burst',
+                    'issues': best['quality']['issues']
+                })
+                return jsonify({
+                    'error': 'No usable frame in burst',
+                    'issues': best['quality']['issues'],
+                    'frames_read': frames_read
+                }), 422
             
-            # Update session with results
+            file_ext = upload_extension(best['filename']) or 'jpg'
+            selfie_path = image_utils.store.save_bytes(best['data'], file_ext, unique_name('selfie'))
             session_manager.update_session(
                 session_id,
-                verification_result=verification_result,
-                status='verification_complete'
+                selfie_path=selfie_path,
+                selfie_face=best['quality'].get('face_box'),
+                status='selfie_uploaded'
             )
+            janitor_service.track(selfie_path, session_id)
+            progress_tracker.publish(session_id, 'frame_selected', {
+                'frames_read': frames_read,
+                'selected_frame': best['index']
+            })
             
-            app.logger.info(f'Verification completed for session {session_id}: {overall_status}')
-            
+            verification_result = run_verification(session_id, session, quality=best['quality'])
+            verification_result['frame_selection'] = {
+                'frames_read': frames_read,
+                'selected_frame': best['index'],
+                'quality': {k: v for k, v in best['quality'].items() if k != 'score'}
+            }
+            if verification_result['status'] == 'RETAKE_REQUIRED':
+                return jsonify(verification_result), 422
             return jsonify(verification_result)
             
+        except ValueError as e:
+            return jsonify({'error': f'Malformed upload: {str(e)}'}), 400
         except Exception as e:
-            app.logger.error(f'Error in verify: {str(e)}')
+            app.logger.error(f'Error in upload_selfie_burst: {str(e)}')
+            if session is not None:
+                progress_tracker.publish(session_id, 'failed', {'error': 'Verification process failed'})
             return jsonify({'error': 'Verification process failed'}), 500
     
+    @app.route('/session/<session_id>/events', methods=['GET'])
+    def session_events(session_id):
+        """Server-sent events for each pipeline stage of a session"""
+        session_validation = validators.validate_session_id(session_id)
+        if not session_validation['valid']:
+            return jsonify({'error': session_validation['error']}), 400
+        
+        if not session_manager.get_session(session_id):
+            return jsonify({'error': 'Session not found or expired'}), 404
+        
+        def generate():
+            for event in progress_tracker.follow(session_id):
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['stage']}\ndata: {json.dumps(event, default=str)}\n\n"
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     @app.route('/session/<session_id>', methods=['GET'])
     def get_session_info(session_id):
         try:
@@ -216,7 +570,9 @@ def create_app(config_name='default'):
                 'dob_confidence': session.get('dob_confidence'),
                 'extracted_age': session.get('extracted_age'),
                 'has_aadhaar': session.get('aadhaar_path') is not None,
-                'has_selfie': session.get('selfie_path') is not None
+                'has_selfie': session.get('selfie_path') is not None,
+                # Stored compressed; only decoded for this request
+                'verification_result': session.verification_result
             }
             
             return jsonify(session_info)
@@ -228,8 +584,13 @@ def create_app(config_name='default'):
     @app.route('/cleanup-sessions', methods=['POST'])
     def cleanup_sessions():
         try:
-            session_manager.cleanup_expired_sessions()
-            return jsonify({'message': 'Expired sessions cleaned up successfully'})
+            result = janitor_service.run_once()
+            return jsonify({
+                'message': 'Expired sessions cleaned up successfully',
+                'files_removed': result['files_removed'],
+                'bytes_reclaimed': result['bytes_reclaimed'],
+                'total_bytes_reclaimed': janitor_service.stats['bytes_reclaimed']
+            })
         except Exception as e:
             app.logger.error(f'Error cleaning up sessions: {str(e)}')
             return jsonify({'error': 'Failed to cleanup sessions'}), 500
@@ -237,9 +598,8 @@ def create_app(config_name='default'):
     # Cleanup function to run periodically
     def cleanup_files_and_sessions():
         try:
-            session_manager.cleanup_expired_sessions()
-            # You might want to add file cleanup logic here
-            app.logger.info('Cleanup completed')
+            result = janitor_service.run_once()
+            app.logger.info(f'Cleanup completed, reclaimed {result["bytes_reclaimed"]} bytes')
         except Exception as e:
             app.logger.error(f'Error in cleanup: {str(e)}')
     
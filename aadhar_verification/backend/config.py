@@ -1,4 +1,5 @@
 import os
+import json
 from datetime import timedelta
 
 class Config:
@@ -10,31 +11,123 @@ class Config:
     UPLOAD_FOLDER = './uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+    # Enforced from the image header, before an upload is read or decoded
+    MAX_IMAGE_DIMENSION = 8000
+    MAX_IMAGE_PIXELS = 40_000_000
+    
+    # Upload retention and cleanup
+    UPLOAD_RETENTION = timedelta(hours=24)  # hard limit for any upload
+    COMPLETED_UPLOAD_RETENTION = timedelta(minutes=10)  # after verification completes
+    UPLOAD_DISK_QUOTA = 2 * 1024 * 1024 * 1024  # 2GB
+    JANITOR_ENABLED = True
+    JANITOR_INTERVAL_SECONDS = 30
+    JANITOR_BATCH_SIZE = 200
+    
+    # Image store
+    IMAGE_STORE_MAX_DIMENSION = 1024  # working resolution, longest side
+    IMAGE_STORE_JPEG_QUALITY = 90
+    IMAGE_STORE_KEEP_ORIGINALS = False
     
     # OCR settings
     OCR_LANGUAGES = 'eng+hin'
     TESSERACT_CONFIG = '--oem 3 --psm 6'
     
+    # Duplicate document detection (perceptual hash)
+    DOCUMENT_HASH_BANDS = 4
+    DOCUMENT_HASH_MAX_DISTANCE = 6
+    DOCUMENT_HASH_DB = os.environ.get('DOCUMENT_HASH_DB', './data/document_hashes.db')
+    DOCUMENT_HASH_MAX_ENTRIES = 200_000  # oldest hashes are dropped beyond this
+    
     # Face verification settings
     FACE_VERIFICATION_MODEL = 'VGG-Face'
     FACE_VERIFICATION_DISTANCE_METRIC = 'cosine'
     FACE_VERIFICATION_THRESHOLD = 0.68
+    FACE_DETECTOR_BACKEND = 'opencv'
     
     # Age verification settings
     AGE_TOLERANCE = 10
     AGE_ESTIMATION_MODEL = 'Age'
     
+    # Memory-mappable model weights, built with `python -m utils.model_cache build`
+    MODEL_CACHE_ENABLED = os.environ.get('MODEL_CACHE_ENABLED', 'true').lower() == 'true'
+    MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', './model_cache')
+    
     # Image quality thresholds
     BLUR_THRESHOLD = 100
     BRIGHTNESS_THRESHOLD = 50
     MIN_FACE_SIZE = 50
+    OVEREXPOSED_FRACTION = 0.25  # share of near-white pixels a selfie may have
+    QUALITY_ANALYSIS_MAX_DIMENSION = 640  # frames are downscaled before scoring
+    
+    # Client geometry hints (utils/geometry_hints.py), checked before they replace full-frame detection
+    FACE_HINT_MARGIN = 0.5  # searched around a hinted face box, as a share of its size
+    FACE_HINT_WINDOW = 160  # longest side the search window is scaled down to
+    FACE_HINT_MIN_IOU = 0.3  # overlap a detected face needs with the hint to confirm it
+    FACE_HINT_MIN_AREA = 0.04  # share of the frame a hinted selfie face must cover
+    FACE_CROP_MARGIN = 0.4  # context kept around a confirmed face for DeepFace
+    CARD_ASPECT_RATIO = 1.586  # ID-1 card, 85.6 x 54 mm
+    CARD_HINT_ASPECT_TOLERANCE = 0.25
+    CARD_HINT_MIN_AREA = 0.15  # share of the image a hinted card must cover
+    CARD_HINT_MIN_EDGE_SUPPORT = 0.5  # share of the hinted card outline that must lie on image edges
+    CARD_WARP_WIDTH = 1012  # long side of the rectified card passed to OCR
+    
+    # Multi-frame selfie capture
+    SELFIE_BURST_MAX_FRAMES = 8
+    
+    # CPU thread budgets per worker process, applied before any model loads
+    WORKERS_PER_NODE = int(os.environ.get('WORKERS_PER_NODE', 1))
+    THREADS_PER_WORKER = int(os.environ.get('THREADS_PER_WORKER', 0)) or max(1, (os.cpu_count() or 1) // WORKERS_PER_NODE)
+    TF_INTRA_OP_THREADS = THREADS_PER_WORKER
+    TF_INTER_OP_THREADS = 1
+    OPENCV_THREADS = THREADS_PER_WORKER
+    BLAS_THREADS = THREADS_PER_WORKER
+    TESSERACT_THREADS = 1
+    
+    # Inference placement: 'local' runs the models in each web worker,
+    # 'sidecar' sends them to the inference server (services/inference_server.py)
+    INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'local')
+    # In a directory only this user can enter; the server creates it mode 0700 and the socket 0600
+    INFERENCE_SOCKET_PATH = os.environ.get('INFERENCE_SOCKET_PATH') or os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR', './run'), 'aadhaar-inference', 'inference.sock'
+    )
+    INFERENCE_SERVER_CONCURRENCY = int(os.environ.get('INFERENCE_SERVER_CONCURRENCY', 2))
+    INFERENCE_TIMEOUT_SECONDS = 120
+    
+    # Per-stage memory accounting (utils/memory_accounting.py); adds tracemalloc overhead
+    MEMORY_ACCOUNTING = os.environ.get('MEMORY_ACCOUNTING', 'false').lower() == 'true'
+    MEMORY_ACCOUNTING_FRAMES = 1  # traceback depth kept per allocation
+    
+    # Shadow evaluation of alternate settings on sampled traffic (services/shadow_service.py)
+    SHADOW_ENABLED = os.environ.get('SHADOW_ENABLED', 'false').lower() == 'true'
+    SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.05))
+    SHADOW_CONFIGS = json.loads(os.environ.get('SHADOW_CONFIGS', '{}'))  # name -> Config overrides
+    SHADOW_QUEUE_SIZE = 50
+    SHADOW_MAX_RESULTS = 1000
+    SHADOW_AGE_AGREEMENT_YEARS = 5
+    # Shadow runs start only while at most this many model requests are running...
+    SHADOW_MAX_PRIMARY_IN_FLIGHT = int(os.environ.get('SHADOW_MAX_PRIMARY_IN_FLIGHT', 0))
+    # ...and use at most this fraction of wall time
+    SHADOW_DUTY_CYCLE = float(os.environ.get('SHADOW_DUTY_CYCLE', 0.1))
+    
+    # Multi-node locality (utils/node_routing.py): session ids name the node holding their files
+    NODE_ID = os.environ.get('NODE_ID', '')  # lowercase letters and digits; empty runs a single node
+    CLUSTER_NODES = json.loads(os.environ.get('CLUSTER_NODES', '{}'))  # node id -> base URL
+    NODE_FORWARD_TIMEOUT_SECONDS = 120
+    # Node whose document hash index all nodes use; empty keeps one index per node
+    DOCUMENT_HASH_NODE = os.environ.get('DOCUMENT_HASH_NODE', '')
+    DOCUMENT_HASH_TIMEOUT_SECONDS = 2
+    CLUSTER_SECRET = os.environ.get('CLUSTER_SECRET', '')  # shared by the nodes for internal endpoints
     
     # Session settings
     SESSION_TIMEOUT = timedelta(hours=1)
     
-    # Logging
+    # Logging: records are queued and written by a background thread (utils/structured_logging.py)
     LOG_LEVEL = 'INFO'
     LOG_FILE = './logs/app.log'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # or 'text'
+    LOG_QUEUE_SIZE = 10000  # records beyond this are dropped instead of blocking requests
+    LOG_NOISY_LOGGERS = ['tensorflow', 'h5py', 'PIL', 'urllib3', 'werkzeug']
+    LOG_NOISY_SAMPLE_RATE = 0.01  # share of their sub-WARNING records that is kept
 
 class DevelopmentConfig(Config):
     DEBUG = True
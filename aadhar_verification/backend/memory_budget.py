@@ -0,0 +1,137 @@
+"""Check per-stage memory on reference images against stored budgets.
+
+The reference directory holds one folder per case with an aadhaar.* and a
+selfie.* image. Every pipeline stage runs on each case in this process with
+memory accounting on, after one untimed warm-up pass that loads the models.
+
+    python memory_budget.py record reference_images/ [--headroom 0.15]
+    python memory_budget.py check reference_images/
+
+record stores each stage's largest Python peak (tracemalloc) and largest RSS
+growth, plus headroom, in memory_budgets.json. tracemalloc does not see
+TensorFlow's or OpenCV's native buffers, so the RSS budget is what covers the
+model stages. check exits non-zero if any stage goes over either budget, or
+if a stage is measured without a budget or budgeted but not measured, so it
+can gate CI; tests/test_memory_budget.py runs it under pytest.
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from utils.thread_budget import apply_thread_budget
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET_FILE = os.path.join(BACKEND_DIR, 'memory_budgets.json')
+DEFAULT_REFERENCE_DIR = os.environ.get('MEMORY_BUDGET_REFERENCE_DIR', os.path.join(BACKEND_DIR, 'reference_images'))
+# Budgeted figures, as keys of a stage's entry in the budget file
+METRICS = ('peak_bytes', 'rss_delta_bytes')
+# RSS moves in whole pages and allocator arenas, so small stages need absolute slack
+DEFAULT_RSS_SLACK = 16 * 2**20
+
+def find_cases(reference_dir: str) -> List[Tuple[str, str]]:
+    cases = []
+    for case_dir in sorted(glob.glob(os.path.join(reference_dir, '*'))):
+        aadhaar = glob.glob(os.path.join(case_dir, 'aadhaar.*'))
+        selfie = glob.glob(os.path.join(case_dir, 'selfie.*'))
+        if aadhaar and selfie:
+            cases.append((aadhaar[0], selfie[0]))
+    return cases
+
+def measure(cases: List[Tuple[str, str]]) -> Dict[str, Dict[str, Optional[int]]]:
+    """Largest Python peak and RSS growth in bytes of each stage over all cases"""
+    apply_thread_budget(Config)
+    from utils.memory_accounting import memory_accountant
+    from services.ocr_service import OCRService
+    from services.face_service import FaceService
+    from services.hash_service import HashService
+
+    ocr_service, face_service, hash_service = OCRService(), FaceService(), HashService()
+    face_service.warmup()
+
+    def run(aadhaar: str, selfie: str):
+        hash_service.compute_hash(aadhaar)
+        ocr_service.extract_dob_from_aadhaar(aadhaar)
+        face_service.quality_gate(selfie)
+        face_service.verify_faces(aadhaar, selfie)
+        face_service.estimate_age_from_selfie(selfie)
+
+    memory_accountant.enable()
+    # Lazy model and library initialization would otherwise count against the first case
+    run(*cases[0])
+    memory_accountant.reset()
+    for aadhaar, selfie in cases:
+        run(aadhaar, selfie)
+
+    return {
+        name: {'peak_bytes': stats['max_peak_bytes'], 'rss_delta_bytes': stats['max_rss_delta_bytes']}
+        for name, stats in memory_accountant.report()['stages'].items()
+    }
+
+def make_budgets(measured: Dict[str, Dict[str, Optional[int]]], headroom: float,
+                 rss_slack: int = DEFAULT_RSS_SLACK) -> Dict[str, Dict[str, int]]:
+    budgets = {}
+    for name, figures in sorted(measured.items()):
+        if figures['rss_delta_bytes'] is None:
+            raise ValueError(f'RSS was not measured for {name}; record on a system with /proc')
+        budgets[name] = {
+            'peak_bytes': int(figures['peak_bytes'] * (1 + headroom)),
+            'rss_delta_bytes': int(max(figures['rss_delta_bytes'], 0) * (1 + headroom)) + rss_slack
+        }
+    return budgets
+
+def compare(measured: Dict[str, Dict[str, Optional[int]]], budgets: Dict[str, Dict[str, int]]) -> List[Dict[str, Any]]:
+    """One row per stage and metric; a row fails when it is over budget or either side is missing"""
+    rows = []
+    for name in sorted(set(budgets) | set(measured)):
+        for metric in METRICS:
+            value = measured.get(name, {}).get(metric)
+            budget = budgets.get(name, {}).get(metric)
+            if value is None or budget is None:
+                problem = 'not measured' if value is None else 'no budget'
+            else:
+                problem = 'OVER' if value > budget else None
+            rows.append({'stage': name, 'metric': metric, 'value': value, 'budget': budget, 'problem': problem})
+    return rows
+
+def load_budgets(path: str) -> Dict[str, Dict[str, int]]:
+    with open(path) as f:
+        return json.load(f)
+
+def _mib(value: Optional[int]) -> str:
+    return f'{value / 2**20:8.1f} MiB' if value is not None else '       - MiB'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['record', 'check'])
+    parser.add_argument('reference_dir', nargs='?', default=DEFAULT_REFERENCE_DIR)
+    parser.add_argument('--budgets', default=DEFAULT_BUDGET_FILE)
+    parser.add_argument('--headroom', type=float, default=0.15, help='Slack added to measurements when recording')
+    parser.add_argument('--rss-slack-mib', type=float, default=DEFAULT_RSS_SLACK / 2**20,
+                        help='Absolute slack added to RSS budgets when recording')
+    args = parser.parse_args()
+
+    cases = find_cases(args.reference_dir)
+    if not cases:
+        sys.exit(f'No reference cases found in {args.reference_dir}')
+    if args.command == 'check' and not os.path.exists(args.budgets):
+        sys.exit(f'No budgets at {args.budgets}; run record first')
+    measured = measure(cases)
+
+    if args.command == 'record':
+        budgets = make_budgets(measured, args.headroom, int(args.rss_slack_mib * 2**20))
+        with open(args.budgets, 'w') as f:
+            json.dump(budgets, f, indent=2)
+        print(f'Recorded budgets for {len(budgets)} stages from {len(cases)} cases in {args.budgets}')
+        return
+
+    rows = compare(measured, load_budgets(args.budgets))
+    for row in rows:
+        print(f"{row['stage']:<15} {row['metric']:<16} {_mib(row['value'])}  budget {_mib(row['budget'])}  "
+              f"{row['problem'] or 'ok'}")
+    sys.exit(1 if any(row['problem'] for row in rows) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+from config import Config
+
+TERMINAL_STAGES = {'verification_complete', 'failed'}
+
+class ProgressTracker:
+    """Per-session log of pipeline stage events that clients can follow live"""
+
+    def __init__(self):
+        self.config = Config()
+        # session_id -> {'created_at': datetime, 'events': [...]}, oldest first
+        self._sessions: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._condition = threading.Condition()
+        # Numbers every event across all sessions; never reset, so followers
+        # can tell new events apart even after a reset or a pruned session
+        self._seq = 0
+
+    def publish(self, session_id: str, stage: str, data: Optional[Dict[str, Any]] = None):
+        """Record a stage transition and wake up any listeners"""
+        with self._condition:
+            self._seq += 1
+            event = {'seq': self._seq, 'stage': stage, 'data': data or {}, 'timestamp': datetime.now().isoformat()}
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self._prune()
+                entry = self._sessions[session_id] = {'created_at': datetime.now(), 'events': []}
+            entry['events'].append(event)
+            self._condition.notify_all()
+
+    def reset(self, session_id: str):
+        """Forget earlier events, e.g. when a new selfie attempt starts"""
+        with self._condition:
+            entry = self._sessions.get(session_id)
+            if entry:
+                entry['events'] = []
+
+    def get_events(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._condition:
+            entry = self._sessions.get(session_id)
+            return list(entry['events']) if entry else []
+
+    def follow(self, session_id: str, keepalive: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """Yield events as they arrive until a terminal stage; None means keepalive"""
+        cursor = 0  # seq of the last event yielded
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._last_seq(session_id) > cursor, timeout=keepalive)
+                new_events = [e for e in self._events(session_id) if e['seq'] > cursor]
+                if new_events:
+                    cursor = new_events[-1]['seq']
+
+            if not new_events:
+                yield None
+            for event in new_events:
+                yield event
+                if event['stage'] in TERMINAL_STAGES:
+                    return
+
+    def _events(self, session_id: str) -> List[Dict[str, Any]]:
+        entry = self._sessions.get(session_id)
+        return entry['events'] if entry else []
+
+    def _last_seq(self, session_id: str) -> int:
+        events = self._events(session_id)
+        return events[-1]['seq'] if events else 0
+
+    def _prune(self):
+        """Drop event logs of sessions that have timed out"""
+        cutoff = datetime.now() - self.config.SESSION_TIMEOUT
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry['created_at'] >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+# Global progress tracker instance
+progress_tracker = ProgressTracker()
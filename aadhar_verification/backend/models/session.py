@@ -1,36 +1,102 @@
+import json
+import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Any
+import zlib
+import enum
+from datetime import datetime
+from typing import Dict, Optional, Any, Tuple
 from config import Config
 
+class SessionStatus(str, enum.Enum):
+    CREATED = 'created'
+    AADHAAR_UPLOADED = 'aadhaar_uploaded'
+    SELFIE_UPLOADED = 'selfie_uploaded'
+    SELFIE_REJECTED = 'selfie_rejected'
+    VERIFICATION_COMPLETE = 'verification_complete'
+
+class SessionRecord:
+    """Compact, fixed-field session state.
+    
+    Slots instead of a per-session dict, and the verification result is kept
+    as one compressed JSON blob that is only decoded when asked for. get(),
+    [] and update() keep the mapping interface the routes use; unknown field
+    names raise AttributeError rather than silently adding keys.
+    """
+    
+    __slots__ = (
+        'created', 'status', 'aadhaar_path', 'selfie_path', 'aadhaar_face', 'selfie_face',
+        'dob', 'dob_confidence', 'extracted_age', 'document_reused', 'timings', '_result'
+    )
+    
+    def __init__(self):
+        self.created = time.time()
+        self.status = SessionStatus.CREATED
+        self.aadhaar_path: Optional[str] = None
+        self.selfie_path: Optional[str] = None
+        self.aadhaar_face: Optional[Tuple[float, float, float, float]] = None
+        self.selfie_face: Optional[Tuple[float, float, float, float]] = None
+        self.dob: Optional[str] = None
+        self.dob_confidence = 0
+        self.extracted_age: Optional[int] = None
+        self.document_reused = False
+        self.timings: Optional[Dict[str, float]] = None
+        self._result: Optional[bytes] = None
+    
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created)
+    
+    @property
+    def verification_result(self) -> Optional[Dict[str, Any]]:
+        return json.loads(zlib.decompress(self._result)) if self._result is not None else None
+    
+    @verification_result.setter
+    def verification_result(self, result: Optional[Dict[str, Any]]):
+        self._result = None if result is None else zlib.compress(
+            json.dumps(result, default=str, separators=(',', ':')).encode()
+        )
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None) if not name.startswith('_') else None
+        return default if value is None else value
+    
+    def __getitem__(self, name: str) -> Any:
+        if name.startswith('_') or not hasattr(self, name):
+            raise KeyError(name)
+        return getattr(self, name)
+    
+    def update(self, fields: Dict[str, Any]):
+        for name, value in fields.items():
+            if name == 'status':
+                value = SessionStatus(value)
+            elif name in ('aadhaar_face', 'selfie_face') and value is not None:
+                value = tuple(value)
+            elif name == 'timings':
+                value = value or None
+            setattr(self, name, value)
+
 class SessionManager:
     def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.sessions: Dict[str, SessionRecord] = {}
         self.config = Config()
     
     def create_session(self) -> str:
         """Create a new session and return session ID"""
         session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            'created_at': datetime.now(),
-            'aadhaar_path': None,
-            'selfie_path': None,
-            'dob': None,
-            'dob_confidence': 0,
-            'extracted_age': None,
-            'verification_result': None,
-            'status': 'created'
-        }
+        if self.config.NODE_ID:
+            # Lets any node route later requests back to the one holding the files
+            session_id = f'{self.config.NODE_ID}-{session_id}'
+        self.sessions[session_id] = SessionRecord()
         return session_id
     
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get_session(self, session_id: str) -> Optional[SessionRecord]:
         """Get session data by ID"""
         session = self.sessions.get(session_id)
         if session and self._is_session_valid(session):
             return session
         elif session:
             # Clean up expired session
-            del self.sessions[session_id]
+            self.sessions.pop(session_id, None)
         return None
     
     def update_session(self, session_id: str, **kwargs) -> bool:
@@ -41,19 +107,25 @@ class SessionManager:
             return True
         return False
     
-    def _is_session_valid(self, session: Dict[str, Any]) -> bool:
+    def get_verification_result(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Decode a session's stored verification result"""
+        session = self.get_session(session_id)
+        return session.verification_result if session else None
+    
+    def _is_session_valid(self, session: SessionRecord) -> bool:
         """Check if session is still valid"""
-        return datetime.now() - session['created_at'] < self.config.SESSION_TIMEOUT
+        return time.time() - session.created < self.config.SESSION_TIMEOUT.total_seconds()
     
-    def cleanup_expired_sessions(self):
-        """Remove expired sessions"""
-        current_time = datetime.now()
+    def cleanup_expired_sessions(self) -> int:
+        """Remove expired sessions and return how many were removed"""
+        cutoff = time.time() - self.config.SESSION_TIMEOUT.total_seconds()
         expired_sessions = [
-            sid for sid, session in self.sessions.items()
-            if current_time - session['created_at'] > self.config.SESSION_TIMEOUT
+            sid for sid, session in list(self.sessions.items())
+            if session.created < cutoff
         ]
         for sid in expired_sessions:
-            del self.sessions[sid]
+            self.sessions.pop(sid, None)
+        return len(expired_sessions)
 
 # Global session manager instance
-session_manager = SessionManager()
\ No newline at end of file
+session_manager = SessionManager()
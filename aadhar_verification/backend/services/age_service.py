@@ -1,6 +1,10 @@
+import logging
 from datetime import datetime
 from typing import Optional, Dict, Any
 from dateutil.relativedelta import relativedelta
+from utils.eligibility import MIN_VERIFICATION_AGE
+
+logger = logging.getLogger(__name__)
 
 class AgeService:
     def __init__(self):
@@ -31,7 +35,7 @@ class AgeService:
             return age
             
         except Exception as e:
-            print(f"Error calculating age: {str(e)}")
+            logger.error(f"Error calculating age: {str(e)}")
             return None
     
     def verify_age_consistency(self, document_age: int, estimated_age: int, tolerance: int = 10) -> Dict[str, Any]:
@@ -65,7 +69,7 @@ class AgeService:
         else:
             return 'Elderly'
     
-    def is_eligible_for_verification(self, age: int, min_age: int = 18) -> Dict[str, Any]:
+    def is_eligible_for_verification(self, age: int, min_age: int = MIN_VERIFICATION_AGE) -> Dict[str, Any]:
         """Check if person is eligible for verification based on age"""
         eligible = age >= min_age
         
@@ -1,20 +1,58 @@
 import cv2
 import numpy as np
 from deepface import DeepFace
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Callable
 from config import Config
+from utils.image_store import ImageStore, ImageInput
+from utils.memory_accounting import memory_accountant
+from utils.model_cache import build_model, load_cached_models
+from utils.geometry_hints import Box, PixelBox, box_to_pixels, box_from_pixels, expand_box, box_iou
 import os
 
 class FaceService:
     def __init__(self):
         self.config = Config()
+        self.store = ImageStore.from_config(self.config)
+        self._face_cascade = None
     
-    def verify_faces(self, aadhaar_path: str, selfie_path: str) -> Dict[str, Any]:
-        """Verify if faces in Aadhaar and selfie match"""
+    def warmup(self):
+        """Load the verification and age models up front, from the model cache when it is current"""
+        cached = []
+        if self.config.MODEL_CACHE_ENABLED:
+            cached = load_cached_models(
+                [self.config.FACE_VERIFICATION_MODEL, self.config.AGE_ESTIMATION_MODEL], self.config.MODEL_CACHE_DIR
+            )
+        for model_name in (self.config.FACE_VERIFICATION_MODEL, self.config.AGE_ESTIMATION_MODEL):
+            if model_name not in cached:
+                build_model(model_name)
+    
+    @memory_accountant.track('verify_faces')
+    def verify_faces(self, aadhaar_path: ImageInput, selfie_path: ImageInput,
+                     progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                     aadhaar_face: Optional[Box] = None, selfie_face: Optional[Box] = None,
+                     selfie_quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Verify if faces in Aadhaar and selfie match.
+        
+        Face boxes hinted for either image are checked with a small-window
+        detection; a confirmed face is cropped so DeepFace only searches around it.
+        A quality gate result for the selfie supplies its face detection instead.
+        """
         try:
+            aadhaar_image = self.store.as_array(aadhaar_path)
+            selfie_image = self.store.as_array(selfie_path)
+            
             # Check if both images have detectable faces
-            aadhaar_faces = self._detect_faces(aadhaar_path)
-            selfie_faces = self._detect_faces(selfie_path)
+            aadhaar_faces = self._detect_faces(aadhaar_image, aadhaar_face)
+            if selfie_quality is not None:
+                selfie_faces = self._faces_from_gate(selfie_quality)
+            else:
+                selfie_faces = self._detect_faces(selfie_image, selfie_face, self.config.FACE_HINT_MIN_AREA)
+            
+            if progress:
+                progress('face_detected', {
+                    'aadhaar_faces': aadhaar_faces['face_count'],
+                    'selfie_faces': selfie_faces['face_count']
+                })
             
             if not aadhaar_faces['face_detected']:
                 return {
@@ -34,10 +72,11 @@ class FaceService:
             
             # Perform face verification using DeepFace
             result = DeepFace.verify(
-                img1_path=aadhaar_path,
-                img2_path=selfie_path,
+                img1_path=self._face_crop(aadhaar_image, aadhaar_faces.get('face_box')),
+                img2_path=self._face_crop(selfie_image, selfie_faces.get('face_box')),
                 model_name=self.config.FACE_VERIFICATION_MODEL,
                 distance_metric=self.config.FACE_VERIFICATION_DISTANCE_METRIC,
+                detector_backend=self.config.FACE_DETECTOR_BACKEND,
                 enforce_detection=True
             )
             
@@ -58,11 +97,15 @@ class FaceService:
                 'error': f'Face verification failed: {str(e)}'
             }
     
-    def estimate_age_from_selfie(self, image_path: str) -> Dict[str, Any]:
-        """Estimate age from selfie using DeepFace"""
+    @memory_accountant.track('estimate_age')
+    def estimate_age_from_selfie(self, image_path: ImageInput, face_hint: Optional[Box] = None,
+                                 quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Estimate age from selfie using DeepFace, reusing a quality gate result when given"""
         try:
+            image = self.store.as_array(image_path)
+            
             # Check image quality first
-            quality_check = self._check_image_quality(image_path)
+            quality_check = quality if quality is not None else self.check_image_quality(image, face_hint)
             if not quality_check['acceptable']:
                 return {
                     'estimated_age': None,
@@ -71,17 +114,19 @@ class FaceService:
                     'error': f'Poor image quality: {quality_check["issues"]}'
                 }
             
-            # Perform age estimation
+            # Perform age estimation; a hinted face box never picks the face for it
             analysis = DeepFace.analyze(
-                img_path=image_path,
+                img_path=image,
                 actions=['age'],
                 model_name=self.config.AGE_ESTIMATION_MODEL,
+                detector_backend=self.config.FACE_DETECTOR_BACKEND,
                 enforce_detection=True
             )
             
             # Handle both single face and multiple faces
             if isinstance(analysis, list):
-                analysis = analysis[0]  # Take first face if multiple detected
+                # The largest face is the one in front of the camera
+                analysis = max(analysis, key=lambda a: a['region']['w'] * a['region']['h'])
             
             estimated_age = analysis['age']
             age_range = self._calculate_age_range(estimated_age)
@@ -101,19 +146,28 @@ class FaceService:
                 'error': f'Age estimation failed: {str(e)}'
             }
     
-    def _detect_faces(self, image_path: str) -> Dict[str, Any]:
-        """Detect faces in image"""
+    def _detect_faces(self, image_path: ImageInput, face_hint: Optional[Box] = None,
+                      min_hint_area: float = 0.0) -> Dict[str, Any]:
+        """Detect faces in image, checking a hinted face box before searching the whole frame"""
         try:
             # Use OpenCV for face detection
-            image = cv2.imread(image_path)
+            image = self.store.as_array(image_path)
             if image is None:
                 return {'face_detected': False, 'face_count': 0}
             
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            height, width = gray.shape[:2]
+            
+            face = self.locate_face_hint(gray, face_hint, min_hint_area)
+            if face is not None and min(face[2], face[3]) >= self.config.MIN_FACE_SIZE:
+                return {
+                    'face_detected': True,
+                    'face_count': 1,
+                    'faces': [list(face)],
+                    'face_box': box_from_pixels(face, width, height)
+                }
             
-            # Load face cascade classifier
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            faces = self._get_face_cascade().detectMultiScale(gray, 1.1, 4)
             
             # Filter faces by minimum size
             valid_faces = [face for face in faces if face[2] >= self.config.MIN_FACE_SIZE and face[3] >= self.config.MIN_FACE_SIZE]
@@ -121,43 +175,164 @@ class FaceService:
             return {
                 'face_detected': len(valid_faces) > 0,
                 'face_count': len(valid_faces),
-                'faces': valid_faces.tolist()
+                'faces': [[int(v) for v in face] for face in valid_faces]
             }
             
         except Exception as e:
             return {'face_detected': False, 'face_count': 0, 'error': str(e)}
     
-    def _check_image_quality(self, image_path: str) -> Dict[str, Any]:
-        """Check if image quality is acceptable for processing"""
+    def _faces_from_gate(self, quality: Dict[str, Any]) -> Dict[str, Any]:
+        """_detect_faces-style result from a quality gate run on the same image"""
+        face_box = quality.get('face_box') if quality.get('face_hint') == 'verified' else None
+        result = {'face_detected': bool(quality.get('face_count')), 'face_count': quality.get('face_count', 0)}
+        if face_box is not None:
+            result['face_box'] = face_box
+        return result
+    
+    def assess_frame(self, data: bytes, face_hint: Optional[Box] = None) -> Dict[str, Any]:
+        """Score an encoded frame with the quality gate"""
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return self.quality_gate(image, face_hint)
+    
+    def locate_face_hint(self, gray: np.ndarray, face_hint: Optional[Box], min_area: float = 0.0) -> Optional[PixelBox]:
+        """Check a hinted face box by detecting faces in a small window around it.
+        
+        Returns the face found there in pixels of gray, or None when there is no
+        hint, it covers less than min_area of the frame, nothing in the
+        window overlaps it enough to trust it, or a larger face shows up
+        elsewhere in the frame (the hint may have picked someone behind the user).
+        """
+        if face_hint is None:
+            return None
+        height, width = gray.shape[:2]
+        hint = box_to_pixels(face_hint, width, height)
+        if hint[2] * hint[3] < min_area * width * height:
+            return None
+        x, y, w, h = expand_box(hint, self.config.FACE_HINT_MARGIN, width, height)
+        if w == 0 or h == 0 or min(hint[2], hint[3]) == 0:
+            return None
+        
+        window = gray[y:y + h, x:x + w]
+        scale = min(1.0, self.config.FACE_HINT_WINDOW / max(w, h))
+        if scale < 1:
+            window = cv2.resize(window, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        min_size = max(1, int(min(hint[2], hint[3]) * scale / 2))
+        faces = self._get_face_cascade().detectMultiScale(window, 1.1, 4, minSize=(min_size, min_size))
+        
+        best, best_iou = None, self.config.FACE_HINT_MIN_IOU
+        for fx, fy, fw, fh in faces:
+            face = (x + int(fx / scale), y + int(fy / scale), int(fw / scale), int(fh / scale))
+            iou = box_iou(face, hint)
+            if iou >= best_iou:
+                best, best_iou = face, iou
+        if best is not None and self._larger_face_elsewhere(gray, best):
+            return None
+        return best
+    
+    def _larger_face_elsewhere(self, gray: np.ndarray, face: PixelBox) -> bool:
+        """Whether a full-frame pass at the analysis pyramid level finds a face bigger than face"""
+        level, scale = self._analysis_level(gray)
+        # Only windows larger than the confirmed face are scanned, which keeps the pass cheap
+        min_size = int(min(face[2], face[3]) * scale) + 1
+        for fx, fy, fw, fh in self._get_face_cascade().detectMultiScale(level, 1.1, 4, minSize=(min_size, min_size)):
+            other = (int(fx / scale), int(fy / scale), int(fw / scale), int(fh / scale))
+            if other[2] * other[3] > face[2] * face[3] and box_iou(other, face) < self.config.FACE_HINT_MIN_IOU:
+                return True
+        return False
+    
+    def _analysis_level(self, gray: np.ndarray) -> Tuple[np.ndarray, float]:
+        """The largest pyramid level no bigger than QUALITY_ANALYSIS_MAX_DIMENSION, and its scale"""
+        scale = 1.0
+        while max(gray.shape) > self.config.QUALITY_ANALYSIS_MAX_DIMENSION:
+            gray = cv2.pyrDown(gray)
+            scale /= 2
+        return gray, scale
+    
+    @memory_accountant.track('quality_gate')
+    def quality_gate(self, image: ImageInput, face_hint: Optional[Box] = None) -> Dict[str, Any]:
+        """Cheap blur, exposure and face-size checks run before any model.
+        
+        Everything is measured on one grayscale pyramid level no larger than
+        QUALITY_ANALYSIS_MAX_DIMENSION; face size is reported in original pixels.
+        A hinted face box that passes locate_face_hint replaces the full-frame
+        face search; any other hint falls back to it.
+        """
         try:
-            image = cv2.imread(image_path)
+            image = self.store.as_array(image)
             if image is None:
-                return {'acceptable': False, 'issues': ['Cannot read image']}
-            
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            issues = []
-            
-            # Check blur
-            blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
-            if blur_score < self.config.BLUR_THRESHOLD:
-                issues.append('Image too blurry')
+                return {'acceptable': False, 'issues': ['Cannot read image - upload a JPEG or PNG photo'], 'score': 0}
             
-            # Check brightness
-            brightness = np.mean(gray)
-            if brightness < self.config.BRIGHTNESS_THRESHOLD:
-                issues.append('Image too dark')
-            elif brightness > 255 - self.config.BRIGHTNESS_THRESHOLD:
-                issues.append('Image too bright')
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            gray, scale = self._analysis_level(gray)
             
-            return {
-                'acceptable': len(issues) == 0,
-                'issues': issues,
-                'blur_score': blur_score,
-                'brightness': brightness
-            }
+            # Mean brightness and the share of blown-out pixels come from one histogram
+            hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+            brightness = float(np.dot(hist, np.arange(256)) / hist.sum())
+            overexposed = float(hist[250:].sum() / hist.sum())
+            blur_score = float(cv2.Laplacian(gray, cv2.CV_64F).var())
             
+            face = self.locate_face_hint(gray, face_hint, self.config.FACE_HINT_MIN_AREA)
+            if face is not None:
+                faces = [face]
+            else:
+                min_face = max(1, int(self.config.MIN_FACE_SIZE * scale / 2))
+                faces = self._get_face_cascade().detectMultiScale(gray, 1.1, 4, minSize=(min_face, min_face))
+            largest = max(faces, key=lambda f: f[2] * f[3], default=None)
+            face_size = max((min(w, h) for (x, y, w, h) in faces), default=0) / scale
         except Exception as e:
-            return {'acceptable': False, 'issues': [f'Quality check failed: {str(e)}']}
+            return {'acceptable': False, 'issues': [f'Quality check failed: {str(e)}'], 'score': 0}
+        
+        issues = []
+        if blur_score < self.config.BLUR_THRESHOLD:
+            issues.append('Image too blurry - hold the camera steady and let it focus')
+        if brightness < self.config.BRIGHTNESS_THRESHOLD:
+            issues.append('Image too dark - move to a brighter place')
+        elif brightness > 255 - self.config.BRIGHTNESS_THRESHOLD:
+            issues.append('Image too bright - avoid direct light on the camera')
+        if overexposed > self.config.OVEREXPOSED_FRACTION:
+            issues.append('Parts of the image are washed out - avoid glare and backlight')
+        if len(faces) == 0:
+            issues.append('No face detected - look straight at the camera')
+        elif face_size < self.config.MIN_FACE_SIZE:
+            issues.append('Face too small - move closer to the camera')
+        
+        # Rank frames: no face is worthless, otherwise favour sharp, well-lit, large faces
+        score = 0.0
+        if face_size >= self.config.MIN_FACE_SIZE:
+            score = (min(blur_score / self.config.BLUR_THRESHOLD, 2.0)
+                     + 1 - abs(brightness - 128) / 128
+                     + min(face_size / (self.config.MIN_FACE_SIZE * 4), 1.0))
+        
+        return {
+            'acceptable': len(issues) == 0,
+            'issues': issues,
+            'blur_score': blur_score,
+            'brightness': brightness,
+            'overexposed_fraction': overexposed,
+            'face_size': face_size,
+            'face_count': len(faces),
+            'face_box': box_from_pixels(largest, gray.shape[1], gray.shape[0]) if largest is not None else None,
+            'face_hint': None if face_hint is None else ('verified' if face is not None else 'rejected'),
+            'score': score
+        }
+    
+    def _get_face_cascade(self) -> cv2.CascadeClassifier:
+        """Load the Haar cascade once instead of on every detection"""
+        if self._face_cascade is None:
+            self._face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        return self._face_cascade
+    
+    def check_image_quality(self, image_path: ImageInput, face_hint: Optional[Box] = None) -> Dict[str, Any]:
+        """Check if image quality is acceptable for processing"""
+        return self.quality_gate(image_path, face_hint)
+    
+    def _face_crop(self, image: np.ndarray, face_box: Optional[Box]) -> np.ndarray:
+        """A located face with context around it, so DeepFace's own detector searches a small crop"""
+        if face_box is None:
+            return image
+        height, width = image.shape[:2]
+        x, y, w, h = expand_box(box_to_pixels(face_box, width, height), self.config.FACE_CROP_MARGIN, width, height)
+        return image[y:y + h, x:x + w] if w and h else image
     
     def _calculate_age_range(self, estimated_age: int) -> Dict[str, int]:
         """Calculate age range with tolerance"""
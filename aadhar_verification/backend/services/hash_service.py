@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+import cv2
+import numpy as np
+from typing import Dict, Any, Optional, List
+from config import Config
+from utils.image_store import ImageStore
+from utils.memory_accounting import memory_accountant
+from utils.node_routing import CLUSTER_SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+class HashService:
+    """Perceptual hashing of Aadhaar card crops with a multi-index Hamming lookup.
+
+    The 64-bit dHash is split into bands; two hashes within distance r share at
+    least one band within r // bands bits, so a lookup probes a handful of
+    indexed band values rather than comparing against every stored hash.
+    Hashes live in a SQLite file, so they survive restarts and every process
+    pointed at the same file shares them; only the newest
+    DOCUMENT_HASH_MAX_ENTRIES are kept.
+
+    In a cluster the file is per node, so a document reused on another node
+    would go unnoticed. Given owner_url (the DOCUMENT_HASH_NODE), lookups and
+    inserts are sent to that node's index instead. An unreachable owner counts
+    as no match: reuse detection is a hint, and uploads must not fail on it.
+    """
+
+    HASH_BITS = 64
+
+    def __init__(self, db_path: Optional[str] = None, owner_url: Optional[str] = None, secret: str = ''):
+        self.config = Config()
+        self.store = ImageStore.from_config(self.config)
+        self.bands = self.config.DOCUMENT_HASH_BANDS
+        self.band_bits = self.HASH_BITS // self.bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.max_distance = self.config.DOCUMENT_HASH_MAX_DISTANCE
+        self.band_radius = self.max_distance // self.bands
+        self.max_entries = self.config.DOCUMENT_HASH_MAX_ENTRIES
+        self.db_path = db_path or self.config.DOCUMENT_HASH_DB
+        self.owner_url = owner_url
+        self.secret = secret
+
+        self._local = threading.local()
+        if owner_url is None:
+            self._create_tables()
+
+    @memory_accountant.track('document_hash')
+    def compute_hash(self, image_path: str) -> Optional[int]:
+        """Compute a 64-bit difference hash of the card crop"""
+        try:
+            image = self.store.load_image(image_path)
+            if image is None:
+                return None
+
+            small = cv2.resize(self._crop_card(image), (9, 8), interpolation=cv2.INTER_AREA)
+            bits = (small[:, 1:] > small[:, :-1]).flatten()
+            return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+        except Exception as e:
+            logger.error(f"Error computing document hash: {str(e)}")
+            return None
+
+    def find_duplicate(self, doc_hash: int) -> Optional[Dict[str, Any]]:
+        """Return the closest previously seen document within the distance limit"""
+        if self.owner_url:
+            return self._call_owner('lookup', {'hash': f'{doc_hash:016x}'}).get('duplicate')
+        clauses, params = [], []
+        for i, band in enumerate(self._split(doc_hash)):
+            values = sorted(self._neighbours(band))
+            clauses.append(f"(position = ? AND band IN ({', '.join('?' * len(values))}))")
+            params += [i, *values]
+
+        rows = self._connection().execute(
+            'SELECT hash, session_id, dob, dob_confidence FROM document_hashes WHERE id IN '
+            f"(SELECT entry_id FROM document_hash_bands WHERE {' OR '.join(clauses)})",
+            params
+        ).fetchall()
+
+        best, best_distance = None, self.max_distance + 1
+        for stored_hash, session_id, dob, dob_confidence in rows:
+            entry_hash = int(stored_hash, 16)
+            distance = (doc_hash ^ entry_hash).bit_count()
+            if distance < best_distance:
+                best_distance = distance
+                best = {'hash': entry_hash, 'session_id': session_id, 'dob': dob, 'dob_confidence': dob_confidence}
+
+        if best is None:
+            return None
+        return {**best, 'distance': best_distance}
+
+    def add(self, doc_hash: int, session_id: str, dob: Optional[str], dob_confidence: int):
+        """Index a document hash together with its OCR result"""
+        if self.owner_url:
+            self._call_owner('add', {
+                'hash': f'{doc_hash:016x}', 'session_id': session_id, 'dob': dob, 'dob_confidence': dob_confidence
+            })
+            return
+        conn = self._connection()
+        with conn:
+            entry_id = conn.execute(
+                'INSERT INTO document_hashes (hash, session_id, dob, dob_confidence, created) VALUES (?, ?, ?, ?, ?)',
+                (f'{doc_hash:016x}', session_id, dob, dob_confidence, time.time())
+            ).lastrowid
+            conn.executemany(
+                'INSERT INTO document_hash_bands (position, band, entry_id) VALUES (?, ?, ?)',
+                [(i, band, entry_id) for i, band in enumerate(self._split(doc_hash))]
+            )
+            # Ids only grow, so everything at or below this one is past the cap
+            cutoff = entry_id - self.max_entries
+            if cutoff > 0:
+                conn.execute('DELETE FROM document_hash_bands WHERE entry_id <= ?', (cutoff,))
+                conn.execute('DELETE FROM document_hashes WHERE id <= ?', (cutoff,))
+
+    def _call_owner(self, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to the owner node's index; returns {} when it can't be reached"""
+        request = urllib.request.Request(
+            f"{self.owner_url.rstrip('/')}/internal/document-hashes/{action}",
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json', CLUSTER_SECRET_HEADER: self.secret},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.config.DOCUMENT_HASH_TIMEOUT_SECONDS) as response:
+                return json.load(response)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            logger.warning(f'Document hash {action} on {self.owner_url} failed: {str(e)}')
+            return {}
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections can't be shared between threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS document_hashes ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT NOT NULL, session_id TEXT, '
+                'dob TEXT, dob_confidence INTEGER, created REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS document_hash_bands ('
+                'position INTEGER NOT NULL, band INTEGER NOT NULL, entry_id INTEGER NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_document_hash_bands ON document_hash_bands (position, band)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_document_hash_entries ON document_hash_bands (entry_id)')
+
+    def _split(self, doc_hash: int) -> List[int]:
+        return [(doc_hash >> (i * self.band_bits)) & self.band_mask for i in range(self.bands)]
+
+    def _neighbours(self, value: int) -> set:
+        """All band values within band_radius bits of value"""
+        neighbours = frontier = {value}
+        for _ in range(self.band_radius):
+            frontier = {v ^ (1 << bit) for v in frontier for bit in range(self.band_bits)}
+            neighbours = neighbours | frontier
+        return neighbours
+
+    def _crop_card(self, image: np.ndarray) -> np.ndarray:
+        """Crop to the largest card-like contour, falling back to the full frame"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return gray
+
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if w * h < 0.2 * gray.shape[0] * gray.shape[1]:
+            return gray
+        return gray[y:y + h, x:x + w]
@@ -0,0 +1,94 @@
+import os
+import logging
+import socket
+import numpy as np
+from typing import Dict, Any, Optional, Tuple, Callable, List
+from config import Config
+from utils.image_store import ImageStore, ImageInput
+from utils.ipc import send_message, recv_message, share_array, peer_uid
+from utils.geometry_hints import Box, Quad
+
+logger = logging.getLogger(__name__)
+
+class InferenceClient:
+    """Stand-in for OCRService and FaceService that runs them in the inference server.
+
+    Images are decoded here and handed over through shared memory, so nothing
+    is re-encoded or written to a temp file on the way.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.store = ImageStore.from_config(self.config)
+
+    def extract_dob_from_aadhaar(self, image_path: ImageInput, card_quad: Optional[Quad] = None) -> Tuple[Optional[str], int]:
+        try:
+            result = self._call('extract_dob', [self._load(image_path)], {'card_quad': card_quad})
+            return result['dob'], result['dob_confidence']
+        except Exception as e:
+            logger.error(f"Error in DOB extraction: {str(e)}")
+            return None, 0
+
+    def verify_faces(self, aadhaar_path: ImageInput, selfie_path: ImageInput,
+                     progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                     aadhaar_face: Optional[Box] = None, selfie_face: Optional[Box] = None,
+                     selfie_quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        try:
+            reply = self._call('verify_faces', [self._load(aadhaar_path), self._load(selfie_path)],
+                               {'aadhaar_face': aadhaar_face, 'selfie_face': selfie_face, 'selfie_quality': selfie_quality})
+        except Exception as e:
+            return {'verified': False, 'confidence': 0, 'distance': 1.0, 'error': f'Face verification failed: {str(e)}'}
+
+        if progress:
+            for stage, data in reply['events']:
+                progress(stage, data)
+        return reply['result']
+
+    def estimate_age_from_selfie(self, image_path: ImageInput, face_hint: Optional[Box] = None,
+                                 quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        try:
+            return self._call('estimate_age', [self._load(image_path)], {'face_hint': face_hint, 'quality': quality})
+        except Exception as e:
+            return {'estimated_age': None, 'age_range': None, 'confidence': 0, 'error': f'Age estimation failed: {str(e)}'}
+
+    def check_image_quality(self, image_path: ImageInput, face_hint: Optional[Box] = None) -> Dict[str, Any]:
+        try:
+            return self._call('check_quality', [self._load(image_path)], {'face_hint': face_hint})
+        except Exception as e:
+            return {'acceptable': False, 'issues': [f'Quality check failed: {str(e)}']}
+
+    def assess_frame(self, data: bytes, face_hint: Optional[Box] = None) -> Dict[str, Any]:
+        try:
+            return self._call('assess_frame', [np.frombuffer(data, np.uint8)], {'face_hint': face_hint})
+        except Exception as e:
+            return {'acceptable': False, 'issues': [f'Quality check failed: {str(e)}'], 'score': 0}
+
+    def _load(self, image: ImageInput) -> np.ndarray:
+        array = self.store.as_array(image)
+        if array is None:
+            raise ValueError('Cannot read image')
+        return array
+
+    def _call(self, op: str, images: List[np.ndarray], args: Optional[Dict[str, Any]] = None) -> Any:
+        blocks, specs = [], []
+        try:
+            for image in images:
+                shm, spec = share_array(image)
+                blocks.append(shm)
+                specs.append(spec)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.config.INFERENCE_TIMEOUT_SECONDS)
+                sock.connect(self.config.INFERENCE_SOCKET_PATH)
+                if peer_uid(sock) != os.getuid():
+                    raise PermissionError('Inference socket is served by another user')
+                send_message(sock, {'op': op, 'images': specs, 'args': args or {}})
+                reply = recv_message(sock)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
@@ -0,0 +1,143 @@
+"""Local inference server that owns the OCR and face models.
+
+Web workers started with INFERENCE_MODE=sidecar send decoded images through
+shared memory and requests over a Unix socket (see inference_client.py).
+The socket lives in a 0700 directory, is created mode 0600, and connections
+from processes of any other user are refused, so the web workers and the
+server must run as the same user.
+
+Run from the backend directory:
+    python -m services.inference_server
+"""
+import os
+import stat
+import logging
+import threading
+import socketserver
+from typing import Dict, Any, List
+from config import Config
+from utils.thread_budget import apply_thread_budget
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+# Thread pools must be sized before utils.ipc and the services import numpy, OpenCV and TensorFlow
+thread_budget = apply_thread_budget(Config, include_tensorflow=True)
+
+from utils.ipc import send_message, recv_message, attach_array, peer_uid, prepare_socket_dir
+from utils.structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except ConnectionError:
+                return
+            send_message(self.request, self.server.dispatch(message))
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, ocr_service, face_service, max_concurrency: int):
+        # umask applies to bind(), so the socket is never reachable by others, even briefly
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, InferenceHandler)
+        finally:
+            os.umask(previous_umask)
+        self.ocr_service = ocr_service
+        self.face_service = face_service
+        # Connections are cheap; concurrent model runs are bounded by the thread budget
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.ops = {
+            'extract_dob': self._extract_dob,
+            'verify_faces': self._verify_faces,
+            'estimate_age': lambda images, args: self.face_service.estimate_age_from_selfie(
+                images[0], args.get('face_hint'), args.get('quality')),
+            'check_quality': lambda images, args: self.face_service.check_image_quality(images[0], args.get('face_hint')),
+            'assess_frame': lambda images, args: self.face_service.assess_frame(images[0].tobytes(), args.get('face_hint')),
+        }
+
+    def verify_request(self, request, client_address) -> bool:
+        uid = peer_uid(request)
+        if uid != os.getuid():
+            logger.warning(f'Refused inference connection from uid {uid}')
+            return False
+        return True
+
+    def dispatch(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        handles, images = [], []
+        try:
+            op = self.ops.get(message.get('op'))
+            if op is None:
+                return {'ok': False, 'error': f"Unknown operation: {message.get('op')}"}
+            for spec in message.get('images', []):
+                shm, array = attach_array(spec)
+                handles.append(shm)
+                images.append(array)
+            with self.slots:
+                return {'ok': True, 'result': op(images, message.get('args', {}))}
+        except Exception as e:
+            logger.error(f"Inference request failed: {str(e)}")
+            return {'ok': False, 'error': str(e)}
+        finally:
+            # Views into the shared blocks must be gone before the blocks are closed
+            images.clear()
+            array = None
+            for shm in handles:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+
+    def _extract_dob(self, images: List, args: Dict[str, Any]):
+        dob, confidence = self.ocr_service.extract_dob_from_aadhaar(images[0], args.get('card_quad'))
+        return {'dob': dob, 'dob_confidence': confidence}
+
+    def _verify_faces(self, images: List, args: Dict[str, Any]):
+        events = []
+        result = self.face_service.verify_faces(
+            images[0], images[1], progress=lambda stage, data: events.append([stage, data]),
+            aadhaar_face=args.get('aadhaar_face'), selfie_face=args.get('selfie_face'),
+            selfie_quality=args.get('selfie_quality')
+        )
+        return {'result': result, 'events': events}
+
+def main():
+    config = Config()
+    configure_logging(
+        level=config.LOG_LEVEL,
+        json_format=config.LOG_FORMAT == 'json',
+        noisy_loggers=config.LOG_NOISY_LOGGERS,
+        noisy_sample_rate=config.LOG_NOISY_SAMPLE_RATE,
+        queue_size=config.LOG_QUEUE_SIZE
+    )
+    from services.ocr_service import OCRService
+    from services.face_service import FaceService
+
+    face_service = FaceService()
+    face_service.warmup()
+
+    socket_path = config.INFERENCE_SOCKET_PATH
+    prepare_socket_dir(socket_path)
+    try:
+        info = os.lstat(socket_path)
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+            raise PermissionError(f'{socket_path} exists and is not a socket of this user')
+        os.unlink(socket_path)  # left by a previous run
+
+    server = InferenceServer(socket_path, OCRService(), face_service, config.INFERENCE_SERVER_CONCURRENCY)
+    logger.info(f'Inference server listening on {socket_path}, thread budget: {thread_budget}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config import Config
+from utils.process_lock import ProcessLock
+
+logger = logging.getLogger(__name__)
+
+class JanitorService:
+    """Background cleanup of uploaded images.
+
+    Uploads are tracked in memory in save order, so the retention sweep does
+    not have to list the uploads folder; every worker sweeps the files it
+    saved itself, since only it knows their sessions.
+
+    All workers share UPLOAD_FOLDER, so the disk quota is enforced by one of
+    them, the holder of a lock file in the folder. It walks the shards a batch
+    per run, measuring disk usage over each full pass, and adopts files older
+    than SESSION_TIMEOUT: no live session in any worker can still own those,
+    whether they are leftovers from a previous run or another worker's. Quota
+    eviction only touches its own and adopted files, oldest first.
+    """
+
+    def __init__(self, session_manager, image_utils):
+        self.config = Config()
+        self.session_manager = session_manager
+        self.image_utils = image_utils
+
+        # path -> {'session_id', 'saved_at', 'size'}, oldest first
+        self._files: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._tracked_bytes = 0
+        self._sweep_keys = []
+        self._leader = ProcessLock(os.path.join(self.config.UPLOAD_FOLDER, '.janitor.lock'))
+        # The lock holder's walk; usage comes from the last full pass, less what was removed since
+        self._adopt_iter = None
+        self._pass_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        # Held for a whole run; the adopt walk and stats are only touched under it
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {'runs': 0, 'files_removed': 0, 'bytes_reclaimed': 0}
+
+    def track(self, file_path: str, session_id: Optional[str] = None):
+        """Register a saved upload so it can be cleaned up later"""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return
+        with self._lock:
+            if file_path in self._files:
+                self._tracked_bytes -= self._files[file_path]['size']
+            self._files[file_path] = {'session_id': session_id, 'saved_at': time.time(), 'size': size}
+            self._tracked_bytes += size
+
+    def start(self):
+        """Start the background cleanup thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> Dict[str, int]:
+        """Run one small batch of cleanup and return what was reclaimed"""
+        with self._run_lock:
+            return self._run_batch()
+
+    def _run_batch(self) -> Dict[str, int]:
+        self.session_manager.cleanup_expired_sessions()
+        leader = self._leader.acquire()
+        if leader:
+            self._adopt_existing()
+
+        now = time.time()
+        batch_size = self.config.JANITOR_BATCH_SIZE
+        removed, reclaimed = 0, 0
+
+        # Retention sweep over a rolling window of tracked files
+        with self._lock:
+            if not self._sweep_keys:
+                self._sweep_keys = list(self._files)
+            batch = self._sweep_keys[:batch_size]
+            del self._sweep_keys[:batch_size]
+
+        for path in batch:
+            entry = self._files.get(path)
+            if entry and self._is_expired(entry, now):
+                reclaimed += self._remove(path)
+                removed += 1
+
+        # Disk quota, across all workers: evict oldest first until we're back under the ceiling
+        evicted = 0
+        while leader and self._disk_usage() > self.config.UPLOAD_DISK_QUOTA and evicted < batch_size:
+            with self._lock:
+                if not self._files:
+                    break
+                path = next(iter(self._files))
+            freed = self._remove(path)
+            reclaimed += freed
+            removed += 1
+            evicted += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes -= freed
+
+        self.stats['runs'] += 1
+        self.stats['files_removed'] += removed
+        self.stats['bytes_reclaimed'] += reclaimed
+        if removed:
+            logger.info(f'Janitor removed {removed} files, reclaimed {reclaimed} bytes')
+
+        return {
+            'files_removed': removed,
+            'bytes_reclaimed': reclaimed,
+            'tracked_bytes': self._tracked_bytes,
+            'disk_bytes': self._disk_bytes if leader else None,
+            'quota_enforced_here': leader
+        }
+
+    def _disk_usage(self) -> int:
+        # Until the first full pass, what this worker knows about is the best guess
+        return self._disk_bytes if self._disk_bytes is not None else self._tracked_bytes
+
+    def _run(self):
+        while not self._stop.wait(self.config.JANITOR_INTERVAL_SECONDS):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f'Error in upload janitor: {str(e)}')
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        """Apply the retention policy to a tracked file"""
+        age = now - entry['saved_at']
+        if age > self.config.UPLOAD_RETENTION.total_seconds():
+            return True
+
+        if entry['session_id'] is None:
+            # Adopted from a previous run; only the hard retention applies
+            return False
+
+        session = self.session_manager.get_session(entry['session_id'])
+        if session is None:
+            return True
+        if session.get('status') == 'verification_complete':
+            return age > self.config.COMPLETED_UPLOAD_RETENTION.total_seconds()
+        return False
+
+    def _remove(self, path: str) -> int:
+        with self._lock:
+            entry = self._files.pop(path, None)
+            if entry is None:
+                return 0
+            self._tracked_bytes -= entry['size']
+        return entry['size'] if self.image_utils.cleanup_file(path) else 0
+
+    def _walk_uploads(self, root: str):
+        """Lazily yield files across the image store's shard directories"""
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk_uploads(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.path != self._leader.path:
+                    yield entry
+
+    def _adopt_existing(self):
+        """Walk the next batch of the uploads folder, adopting files no live session can own"""
+        if self._adopt_iter is None:
+            if not os.path.isdir(self.config.UPLOAD_FOLDER):
+                return
+            self._adopt_iter = self._walk_uploads(self.config.UPLOAD_FOLDER)
+            self._pass_bytes = 0
+
+        owned_before = time.time() - self.config.SESSION_TIMEOUT.total_seconds()
+        batch = []
+        for _ in range(self.config.JANITOR_BATCH_SIZE):
+            entry = next(self._adopt_iter, None)
+            if entry is None:
+                # Pass complete; the next run starts another one
+                self._adopt_iter = None
+                self._disk_bytes = self._pass_bytes
+                break
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            self._pass_bytes += stat.st_size
+            if stat.st_mtime > owned_before:
+                continue  # may belong to a live session in another worker
+            batch.append((entry.path, {'session_id': None, 'saved_at': stat.st_mtime, 'size': stat.st_size, 'adopted': True}))
+        if not batch:
+            return
+
+        by_mtime = lambda item: item[1]['saved_at']
+        batch.sort(key=by_mtime)
+        with self._lock:
+            batch = [item for item in batch if item[0] not in self._files]
+            self._tracked_bytes += sum(info['size'] for _, info in batch)
+            # Adopted files are older than SESSION_TIMEOUT, so older than what this
+            # process saved for its live sessions; they sit at the front, and
+            # this batch is merged into them, oldest first
+            adopted = []
+            while self._files and next(iter(self._files.values())).get('adopted'):
+                adopted.append(self._files.popitem(last=False))
+            for path, info in reversed(list(heapq.merge(adopted, batch, key=by_mtime))):
+                self._files[path] = info
+                self._files.move_to_end(path, last=False)
@@ -1,3 +1,4 @@
+import logging
 import cv2
 import pytesseract
 import re
@@ -5,10 +6,16 @@ import numpy as np
 from datetime import datetime
 from typing import Tuple, Optional, List
 from config import Config
+from utils.image_store import ImageStore, ImageInput
+from utils.memory_accounting import memory_accountant
+from utils.geometry_hints import Quad, order_quad, quad_edge_support, card_edges
+
+logger = logging.getLogger(__name__)
 
 class OCRService:
     def __init__(self):
         self.config = Config()
+        self.store = ImageStore.from_config(self.config)
         self.dob_patterns = [
             r'DOB[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})',
             r'Date of Birth[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})',
@@ -16,14 +23,20 @@ class OCRService:
             r'जन्म तिथि[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})'
         ]
     
-    def extract_dob_from_aadhaar(self, image_path: str) -> Tuple[Optional[str], int]:
+    @memory_accountant.track('extract_dob')
+    def extract_dob_from_aadhaar(self, image_path: ImageInput, card_quad: Optional[Quad] = None) -> Tuple[Optional[str], int]:
         """Extract date of birth from Aadhaar card image"""
         try:
             # Read and preprocess image
-            image = cv2.imread(image_path)
+            image = self.store.as_array(image_path)
             if image is None:
                 return None, 0
             
+            # Only read the card itself when the hinted corners check out
+            card = self._card_from_hint(image, card_quad)
+            if card is not None:
+                image = card
+            
             # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
@@ -43,9 +56,39 @@ class OCRService:
             return dob, confidence
             
         except Exception as e:
-            print(f"Error in DOB extraction: {str(e)}")
+            logger.error(f"Error in DOB extraction: {str(e)}")
             return None, 0
     
+    def _card_from_hint(self, image: np.ndarray, card_quad: Optional[Quad]) -> Optional[np.ndarray]:
+        """Rectify the card from client-supplied corners, or None if they don't look like the card"""
+        if card_quad is None:
+            return None
+        height, width = image.shape[:2]
+        quad = order_quad(np.array(card_quad, dtype=np.float32) * np.array([width, height], dtype=np.float32))
+        if not cv2.isContourConvex(quad.reshape(-1, 1, 2)) \
+                or cv2.contourArea(quad) < self.config.CARD_HINT_MIN_AREA * width * height:
+            return None
+        
+        sides = np.linalg.norm(quad - np.roll(quad, -1, axis=0), axis=1)
+        horizontal, vertical = (sides[0] + sides[2]) / 2, (sides[1] + sides[3]) / 2
+        aspect = max(horizontal, vertical) / max(min(horizontal, vertical), 1.0)
+        if abs(aspect / self.config.CARD_ASPECT_RATIO - 1) > self.config.CARD_HINT_ASPECT_TOLERANCE:
+            return None
+        
+        # The outline must sit on real edges; checked on a small copy of the image
+        scale = min(1.0, self.config.QUALITY_ANALYSIS_MAX_DIMENSION / max(width, height))
+        small = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        edges = card_edges(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        if quad_edge_support(edges, quad * scale) < self.config.CARD_HINT_MIN_EDGE_SUPPORT:
+            return None
+        
+        long_side = self.config.CARD_WARP_WIDTH
+        short_side = int(long_side / self.config.CARD_ASPECT_RATIO)
+        out_width, out_height = (long_side, short_side) if horizontal >= vertical else (short_side, long_side)
+        target = np.array([[0, 0], [out_width - 1, 0], [out_width - 1, out_height - 1], [0, out_height - 1]], dtype=np.float32)
+        return cv2.warpPerspective(image, cv2.getPerspectiveTransform(quad, target), (out_width, out_height))
+    
+    @memory_accountant.track('ocr_enhance')
     def _enhance_image_for_ocr(self, gray_image: np.ndarray) -> np.ndarray:
         """Enhance image quality for better OCR results"""
         # Apply Gaussian blur to reduce noise
@@ -0,0 +1,193 @@
+import os
+import time
+import queue
+import random
+import logging
+import threading
+from collections import deque, defaultdict
+from typing import Dict, Any, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ShadowService:
+    """Re-run a sample of completed verifications with alternate model settings.
+
+    Each entry of SHADOW_CONFIGS maps a name to Config overrides, e.g.
+    {'facenet': {'FACE_VERIFICATION_MODEL': 'Facenet512'}}. Sampled sessions are
+    queued to a single background thread, which runs every shadow configuration
+    on the stored images and records per-stage latency and agreement with the
+    primary result. The queue is bounded and submissions are dropped when it is
+    full, so requests never wait on it.
+
+    The thread shares the GIL and TensorFlow's thread pools with the requests,
+    so a lower OS priority alone does not keep it out of their way. Instead it
+    only starts an evaluation while at most SHADOW_MAX_PRIMARY_IN_FLIGHT model
+    requests (bracketed by primary_started/primary_finished) are running, and
+    after each one rests long enough to stay under SHADOW_DUTY_CYCLE of wall
+    time.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.sample_rate = self.config.SHADOW_SAMPLE_RATE
+        self._queue: queue.Queue = queue.Queue(maxsize=self.config.SHADOW_QUEUE_SIZE)
+        self._results: deque = deque(maxlen=self.config.SHADOW_MAX_RESULTS)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._services: Dict[str, Dict[str, Any]] = {}
+        self._idle = threading.Condition()
+        self._primary_in_flight = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='shadow-eval', daemon=True)
+        self._thread.start()
+
+    def maybe_submit(self, session_id: str, session: Dict[str, Any], primary: Dict[str, Any],
+                     timings: Dict[str, float]):
+        """Queue a completed verification and its stage timings (ms) if it is sampled"""
+        if random.random() >= self.sample_rate:
+            return
+        job = {
+            'session_id': session_id,
+            'aadhaar_path': session.get('aadhaar_path'),
+            'selfie_path': session.get('selfie_path'),
+            'primary': primary,
+            'timings': timings
+        }
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def primary_started(self):
+        """Mark a request that runs the models; shadow evaluations hold off while it runs"""
+        with self._idle:
+            self._primary_in_flight += 1
+
+    def primary_finished(self):
+        with self._idle:
+            self._primary_in_flight -= 1
+            self._idle.notify_all()
+
+    def report(self) -> Dict[str, Any]:
+        """Agreement rates and mean stage latencies per shadow configuration"""
+        with self._lock:
+            results = list(self._results)
+            dropped = self.dropped
+
+        summary: Dict[str, Dict[str, Any]] = {}
+        for name in self.config.SHADOW_CONFIGS:
+            runs = [r for r in results if r['config'] == name]
+            agreement, latency = defaultdict(list), defaultdict(lambda: {'primary': [], 'shadow': []})
+            for run in runs:
+                for key, agreed in run['agreement'].items():
+                    if agreed is not None:
+                        agreement[key].append(agreed)
+                for stage, timings in run['stages'].items():
+                    for side in ('primary', 'shadow'):
+                        if timings.get(side) is not None:
+                            latency[stage][side].append(timings[side])
+            summary[name] = {
+                'runs': len(runs),
+                'agreement': {key: round(sum(values) / len(values), 4) for key, values in agreement.items()},
+                'mean_latency_ms': {
+                    stage: {side: round(sum(v) / len(v), 1) if v else None for side, v in sides.items()}
+                    for stage, sides in latency.items()
+                }
+            }
+        return {
+            'sample_rate': self.sample_rate,
+            'queued': self._queue.qsize(),
+            'dropped': dropped,
+            'primary_in_flight': self._primary_in_flight,
+            'configs': summary,
+            'recent': results[-20:]
+        }
+
+    def _run(self):
+        try:
+            # Linux applies setpriority to a single thread when given its native id
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            job = self._queue.get()
+            for name, overrides in self.config.SHADOW_CONFIGS.items():
+                self._wait_for_idle()
+                started = time.perf_counter()
+                try:
+                    result = self._evaluate(name, overrides, job)
+                except Exception as e:
+                    logger.error(f'Shadow evaluation {name} failed: {str(e)}', extra={'session_id': job['session_id']})
+                    result = None
+                if result is not None:
+                    with self._lock:
+                        self._results.append(result)
+                self._rest(time.perf_counter() - started)
+
+    def _wait_for_idle(self):
+        """Block until few enough primary requests are running the models"""
+        with self._idle:
+            self._idle.wait_for(lambda: self._primary_in_flight <= self.config.SHADOW_MAX_PRIMARY_IN_FLIGHT)
+
+    def _rest(self, busy_seconds: float):
+        """Sleep so evaluation time stays within SHADOW_DUTY_CYCLE of wall time"""
+        duty_cycle = self.config.SHADOW_DUTY_CYCLE
+        if 0 < duty_cycle < 1:
+            time.sleep(busy_seconds * (1 - duty_cycle) / duty_cycle)
+
+    def _evaluate(self, name: str, overrides: Dict[str, Any], job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not all(path and os.path.exists(path) for path in (job['aadhaar_path'], job['selfie_path'])):
+            return None  # the janitor got there first
+        services = self._services_for(name, overrides)
+        primary, primary_timings = job['primary'], job['timings']
+
+        started = time.perf_counter()
+        dob, _ = services['ocr'].extract_dob_from_aadhaar(job['aadhaar_path'])
+        ocr_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        face = services['face'].verify_faces(job['aadhaar_path'], job['selfie_path'])
+        face_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        age = services['face'].estimate_age_from_selfie(job['selfie_path'])
+        age_ms = (time.perf_counter() - started) * 1000
+
+        primary_age = primary.get('age_estimation', {}).get('estimated_age')
+        age_agrees = None
+        if primary_age is not None and age.get('estimated_age') is not None:
+            age_agrees = abs(age['estimated_age'] - primary_age) <= self.config.SHADOW_AGE_AGREEMENT_YEARS
+
+        return {
+            'session_id': job['session_id'],
+            'config': name,
+            'stages': {
+                'extract_dob': {'primary': primary_timings.get('extract_dob'), 'shadow': round(ocr_ms, 1)},
+                'verify_faces': {'primary': primary_timings.get('verify_faces'), 'shadow': round(face_ms, 1)},
+                'estimate_age': {'primary': primary_timings.get('estimate_age'), 'shadow': round(age_ms, 1)}
+            },
+            'agreement': {
+                'dob': dob == primary.get('document_info', {}).get('dob'),
+                'face_verified': face.get('verified') == primary.get('face_verification', {}).get('verified'),
+                'age': age_agrees
+            },
+            'shadow_error': face.get('error') or age.get('error')
+        }
+
+    def _services_for(self, name: str, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        """OCR and face services whose config carries the shadow overrides"""
+        if name not in self._services:
+            from services.ocr_service import OCRService
+            from services.face_service import FaceService
+            shadow_config = type(f'ShadowConfig_{name}', (Config,), dict(overrides))()
+            ocr, face = OCRService(), FaceService()
+            ocr.config = face.config = shadow_config
+            face.warmup()
+            self._services[name] = {'ocr': ocr, 'face': face}
+        return self._services[name]
@@ -0,0 +1,43 @@
+"""Memory budget gate over the reference set (see memory_budget.py).
+
+The model run needs the reference images in MEMORY_BUDGET_REFERENCE_DIR
+(default reference_images/) and is skipped when there are none; once they are
+present, a missing memory_budgets.json fails the gate.
+"""
+import os
+import pytest
+import memory_budget
+
+MIB = 2**20
+
+
+def test_over_budget_rss_fails():
+    measured = {'estimate_age': {'peak_bytes': 1 * MIB, 'rss_delta_bytes': 300 * MIB}}
+    budgets = {'estimate_age': {'peak_bytes': 2 * MIB, 'rss_delta_bytes': 200 * MIB}}
+    problems = {row['metric']: row['problem'] for row in memory_budget.compare(measured, budgets)}
+    assert problems == {'peak_bytes': None, 'rss_delta_bytes': 'OVER'}
+
+
+def test_missing_stages_fail():
+    measured = {'verify_faces': {'peak_bytes': MIB, 'rss_delta_bytes': MIB}}
+    budgets = {'estimate_age': {'peak_bytes': MIB, 'rss_delta_bytes': MIB}}
+    problems = {(row['stage'], row['problem']) for row in memory_budget.compare(measured, budgets)}
+    assert problems == {('verify_faces', 'no budget'), ('estimate_age', 'not measured')}
+
+
+def test_recorded_budgets_cover_measurements():
+    measured = {'quality_gate': {'peak_bytes': 10 * MIB, 'rss_delta_bytes': -MIB}}
+    budgets = memory_budget.make_budgets(measured, headroom=0.1, rss_slack=MIB)
+    assert budgets == {'quality_gate': {'peak_bytes': 11 * MIB, 'rss_delta_bytes': MIB}}
+    assert not any(row['problem'] for row in memory_budget.compare(measured, budgets))
+
+
+@pytest.mark.skipif(not memory_budget.find_cases(memory_budget.DEFAULT_REFERENCE_DIR),
+                    reason=f'no reference images in {memory_budget.DEFAULT_REFERENCE_DIR}')
+def test_stages_within_budget():
+    assert os.path.exists(memory_budget.DEFAULT_BUDGET_FILE), \
+        'no memory_budgets.json; run python memory_budget.py record'
+    measured = memory_budget.measure(memory_budget.find_cases(memory_budget.DEFAULT_REFERENCE_DIR))
+    rows = memory_budget.compare(measured, memory_budget.load_budgets(memory_budget.DEFAULT_BUDGET_FILE))
+    failures = [f"{row['stage']} {row['metric']}: {row['problem']}" for row in rows if row['problem']]
+    assert not failures, failures
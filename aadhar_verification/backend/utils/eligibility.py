@@ -0,0 +1,3 @@
+# Youngest document age accepted for verification; AgeService.is_eligible_for_verification's
+# default, and the boundary the root app's age refinement is spent around
+MIN_VERIFICATION_AGE = 18
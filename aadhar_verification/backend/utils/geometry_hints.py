@@ -0,0 +1,95 @@
+import json
+from typing import Any, List, Optional, Tuple
+import cv2
+import numpy as np
+
+# Client hints are fractions of the image width and height, so they stay valid
+# when the client or the image store rescales the image
+Box = Tuple[float, float, float, float]
+Quad = List[Tuple[float, float]]
+PixelBox = Tuple[int, int, int, int]
+
+# Slack for clients that round coordinates just past the image edge
+_EDGE_TOLERANCE = 0.02
+
+def _numbers(value: Any) -> Optional[List[float]]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if not isinstance(value, (list, tuple)):
+        return None
+    try:
+        numbers = np.ravel(np.asarray(value, dtype=float))
+    except (TypeError, ValueError):
+        return None
+    return [float(n) for n in numbers] if np.isfinite(numbers).all() else None
+
+def parse_face_box(value: Any) -> Optional[Box]:
+    """A normalized [x, y, w, h] face box, or None if the hint is missing or malformed"""
+    numbers = _numbers(value) if value is not None else None
+    if not numbers or len(numbers) != 4:
+        return None
+    x, y, w, h = numbers
+    if w <= 0 or h <= 0 or x < -_EDGE_TOLERANCE or y < -_EDGE_TOLERANCE \
+            or x + w > 1 + _EDGE_TOLERANCE or y + h > 1 + _EDGE_TOLERANCE:
+        return None
+    return x, y, w, h
+
+def parse_card_quad(value: Any) -> Optional[Quad]:
+    """Four normalized [x, y] card corners, or None if the hint is missing or malformed"""
+    numbers = _numbers(value) if value is not None else None
+    if not numbers or len(numbers) != 8:
+        return None
+    if any(n < -_EDGE_TOLERANCE or n > 1 + _EDGE_TOLERANCE for n in numbers):
+        return None
+    return [(numbers[i], numbers[i + 1]) for i in range(0, 8, 2)]
+
+def box_to_pixels(box: Box, width: int, height: int) -> PixelBox:
+    x, y, w, h = box
+    return int(round(x * width)), int(round(y * height)), int(round(w * width)), int(round(h * height))
+
+def box_from_pixels(box: PixelBox, width: int, height: int) -> Box:
+    x, y, w, h = (float(v) for v in box)
+    return x / width, y / height, w / width, h / height
+
+def expand_box(box: PixelBox, margin: float, width: int, height: int) -> PixelBox:
+    """Grow a box by margin times its size on every side, clipped to the image"""
+    x, y, w, h = box
+    dx, dy = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(width, x + w + dx), min(height, y + h + dy)
+    return x0, y0, max(0, x1 - x0), max(0, y1 - y0)
+
+def box_iou(a: PixelBox, b: PixelBox) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+def order_quad(points: np.ndarray) -> np.ndarray:
+    """Corners ordered top-left, top-right, bottom-right, bottom-left"""
+    sums, diffs = points.sum(axis=1), np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+def quad_edge_support(edges: np.ndarray, quad: np.ndarray, samples: int = 32) -> float:
+    """Share of points sampled along the quad's sides that land on an edge pixel"""
+    height, width = edges.shape[:2]
+    hits = total = 0
+    for start, end in zip(quad, np.roll(quad, -1, axis=0)):
+        for t in np.linspace(0, 1, samples, endpoint=False):
+            x, y = (start + (end - start) * t).astype(int)
+            if 0 <= x < width and 0 <= y < height:
+                hits += edges[y, x] > 0
+            total += 1
+    return hits / total if total else 0.0
+
+def card_edges(gray: np.ndarray, tolerance: int = 3) -> np.ndarray:
+    """Canny edges thickened by a few pixels, for checking hinted card sides"""
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+    return cv2.dilate(edges, np.ones((2 * tolerance + 1, 2 * tolerance + 1), np.uint8))
@@ -0,0 +1,115 @@
+import struct
+from typing import Optional, Tuple, BinaryIO
+
+ImageHeader = Tuple[str, int, int]
+
+# How far into an upload we look for dimensions; JPEG EXIF blocks can push SOF past 64KB
+HEADER_READ_LIMIT = 256 * 1024
+HEADER_CHUNK_SIZE = 16 * 1024
+
+EXTENSION_FORMATS = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'gif': 'GIF',
+    'bmp': 'BMP',
+}
+
+# Start-of-frame markers carry the image dimensions (DHT, JPG and DAC are excluded)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+def sniff_image_header(data: bytes) -> Optional[ImageHeader]:
+    """Return (format, width, height) read from the header bytes without decoding.
+
+    Returns None when more bytes are needed; raises ValueError for anything that
+    is not a supported image.
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) < 24:
+            return None
+        if data[12:16] != b'IHDR':
+            raise ValueError("Malformed PNG header")
+        width, height = struct.unpack('>II', data[16:24])
+        return 'PNG', width, height
+
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) < 10:
+            return None
+        width, height = struct.unpack('<HH', data[6:10])
+        return 'GIF', width, height
+
+    if data.startswith(b'BM'):
+        if len(data) < 26:
+            return None
+        (dib_size,) = struct.unpack('<I', data[14:18])
+        if dib_size == 12:
+            width, height = struct.unpack('<HH', data[18:22])
+        else:
+            width, height = struct.unpack('<ii', data[18:26])
+        return 'BMP', abs(width), abs(height)
+
+    if data.startswith(b'\xff\xd8'):
+        return _sniff_jpeg(data)
+
+    if len(data) < 8:
+        return None
+    raise ValueError("Unrecognized image format")
+
+def _sniff_jpeg(data: bytes) -> Optional[ImageHeader]:
+    pos = 2
+    while True:
+        # Markers may be preceded by any number of 0xFF fill bytes
+        while pos < len(data) and data[pos] == 0xFF:
+            pos += 1
+        if pos >= len(data):
+            return None
+        if data[pos - 1] != 0xFF:
+            raise ValueError("Malformed JPEG header")
+        marker = data[pos]
+        pos += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:
+            raise ValueError("JPEG ends before its frame header")
+        if pos + 2 > len(data):
+            return None
+        (length,) = struct.unpack('>H', data[pos:pos + 2])
+        if length < 2:
+            raise ValueError("Malformed JPEG segment")
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 7 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[pos + 3:pos + 7])
+            return 'JPEG', width, height
+        pos += length
+
+def read_image_header(stream: BinaryIO, limit: int = HEADER_READ_LIMIT,
+                      chunk_size: int = HEADER_CHUNK_SIZE) -> ImageHeader:
+    """Read just enough of a stream to sniff it, then rewind the stream"""
+    start = stream.tell()
+    head = b''
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            head += chunk
+            info = sniff_image_header(head)
+            if info is not None:
+                return info
+            if not chunk or len(head) >= limit:
+                raise ValueError("Could not find image dimensions in the file header")
+    finally:
+        stream.seek(start)
+
+def check_image_header(info: ImageHeader, extension: Optional[str] = None,
+                       max_dimension: Optional[int] = None, max_pixels: Optional[int] = None):
+    """Raise ValueError if sniffed header info breaks the upload limits"""
+    image_format, width, height = info
+    if extension and EXTENSION_FORMATS.get(extension.lower()) != image_format:
+        raise ValueError(f"File content is {image_format}, which does not match its .{extension} extension")
+    if width == 0 or height == 0:
+        raise ValueError("Image has no pixels")
+    if max_dimension and max(width, height) > max_dimension:
+        raise ValueError(f"Image is {width}x{height}; the largest side may be at most {max_dimension} pixels")
+    if max_pixels and width * height > max_pixels:
+        raise ValueError(f"Image is {width}x{height}; at most {max_pixels} pixels are allowed")
@@ -0,0 +1,163 @@
+import os
+import mmap
+import uuid
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import Optional, Iterator, Union
+import cv2
+import numpy as np
+# Relative so the root app can import this module from its own package path
+from .image_header import EXTENSION_FORMATS, HEADER_READ_LIMIT, sniff_image_header, check_image_header
+
+# Stages accept either a stored image path or an already decoded BGR array
+ImageInput = Union[str, np.ndarray]
+
+def upload_extension(filename: Optional[str]) -> Optional[str]:
+    """Lower-cased extension of an upload's file name, or None unless it is a supported image type"""
+    if not filename or '.' not in filename:
+        return None
+    file_ext = filename.rsplit('.', 1)[1].lower()
+    return file_ext if file_ext in EXTENSION_FORMATS else None
+
+def unique_name(prefix: str = '') -> str:
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+def load_image(path: str, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    """Decode an image straight from a read-only memory map of the file"""
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return cv2.imdecode(np.frombuffer(mapped, np.uint8), flags)
+    except (OSError, ValueError):
+        return None
+
+class ImageStore:
+    """Sharded on-disk store for uploaded images.
+
+    Files live under <root>/<aa>/<bb>/ where aabb comes from a hash of the file
+    name, which keeps every directory small. Uploads are normalized to a
+    working-resolution JPEG; the original bytes are kept only if configured.
+    Images whose header declares more than max_pixels are refused before they
+    are decoded. Shared by the backend and the root app.
+    """
+
+    def __init__(self, root: str, max_dimension: int = 1024, jpeg_quality: int = 90,
+                 keep_originals: bool = False, max_pixels: Optional[int] = None):
+        self.root = root
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.keep_originals = keep_originals
+        self.max_pixels = max_pixels
+
+    @classmethod
+    def from_config(cls, config) -> 'ImageStore':
+        return cls(
+            config.UPLOAD_FOLDER,
+            max_dimension=config.IMAGE_STORE_MAX_DIMENSION,
+            jpeg_quality=config.IMAGE_STORE_JPEG_QUALITY,
+            keep_originals=config.IMAGE_STORE_KEEP_ORIGINALS,
+            max_pixels=config.MAX_IMAGE_PIXELS
+        )
+
+    def save(self, file, name: str) -> str:
+        """Store an uploaded file under name and return the path of the working copy"""
+        file_ext = upload_extension(file.filename)
+        if file_ext is None:
+            raise ValueError('Unsupported file type')
+        return self.save_bytes(file.read(), file_ext, name)
+
+    def save_bytes(self, data: bytes, file_ext: str, name: str) -> str:
+        """Store encoded image bytes under name and return the path of the working copy"""
+        # The extension ends up in file names, so only known image types get through
+        if file_ext not in EXTENSION_FORMATS:
+            raise ValueError('Unsupported file type')
+        # Refuse decompression bombs before cv2 allocates the full bitmap
+        info = sniff_image_header(data[:HEADER_READ_LIMIT])
+        if info is not None:
+            check_image_header(info, max_pixels=self.max_pixels)
+
+        shard = self._shard_dir(name)
+
+        if self.keep_originals:
+            self._write_atomic(os.path.join(shard, f"{name}.orig.{file_ext}"), data)
+
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            # Keep undecodable uploads as-is so validation can report them
+            path = os.path.join(shard, f"{name}.{file_ext}")
+            self._write_atomic(path, data)
+            return path
+
+        image = self._to_working_resolution(image)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError('Failed to encode image')
+
+        path = os.path.join(shard, f"{name}.jpg")
+        self._write_atomic(path, encoded.tobytes())
+        return path
+
+    @contextmanager
+    def open_mapped(self, path: str) -> Iterator[mmap.mmap]:
+        """Memory-map a stored file read-only"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def load_image(self, path: str, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+        """Decode a stored image straight from its memory map"""
+        return load_image(path, flags)
+
+    def as_array(self, image: ImageInput) -> Optional[np.ndarray]:
+        """Pass decoded arrays (or an image that failed to load) through and load stored paths"""
+        if image is None or isinstance(image, np.ndarray):
+            return image
+        return self.load_image(image)
+
+    def delete(self, path: str) -> bool:
+        """Delete a working copy together with its original, if one was kept"""
+        removed = False
+        shard, filename = os.path.split(path)
+        original_prefix = filename.rsplit('.', 1)[0] + '.orig.'
+        for candidate in (path, *self._originals(shard, original_prefix)):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+                removed = True
+        return removed
+
+    def _shard_dir(self, name: str) -> str:
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        shard = os.path.join(self.root, digest[:2], digest[2:4])
+        os.makedirs(shard, exist_ok=True)
+        return shard
+
+    def _originals(self, shard: str, original_prefix: str):
+        if not self.keep_originals or not os.path.isdir(shard):
+            return []
+        return [os.path.join(shard, f) for f in os.listdir(shard) if f.startswith(original_prefix)]
+
+    def _to_working_resolution(self, image: np.ndarray) -> np.ndarray:
+        max_dim = self.max_dimension
+        height, width = image.shape[:2]
+        scale = max_dim / max(height, width)
+        if scale >= 1:
+            return image
+        return cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def _write_atomic(self, path: str, data: bytes):
+        """Write to a temp file in the target directory, then rename into place"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
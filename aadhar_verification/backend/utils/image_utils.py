@@ -1,30 +1,22 @@
+import logging
 import os
-import uuid
-from PIL import Image
 import cv2
 import numpy as np
-from typing import Optional, Tuple
-from werkzeug.utils import secure_filename
+from typing import Optional, Tuple, Dict, Any
 from config import Config
+from utils.image_store import ImageStore, unique_name
+from utils.image_header import read_image_header
+
+logger = logging.getLogger(__name__)
 
 class ImageUtils:
     def __init__(self):
         self.config = Config()
+        self.store = ImageStore.from_config(self.config)
     
     def save_uploaded_file(self, file, prefix: str = '') -> str:
-        """Save uploaded file with unique name"""
-        # Generate unique filename
-        file_ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{prefix}_{uuid.uuid4().hex}.{file_ext}"
-        
-        # Ensure upload directory exists
-        os.makedirs(self.config.UPLOAD_FOLDER, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(self.config.UPLOAD_FOLDER, filename)
-        file.save(file_path)
-        
-        return file_path
+        """Save uploaded file into the sharded image store"""
+        return self.store.save(file, unique_name(prefix))
     
     def is_allowed_file(self, filename: str) -> bool:
         """Check if file extension is allowed"""
@@ -34,13 +26,16 @@ class ImageUtils:
     def resize_image(self, image_path: str, max_size: Tuple[int, int] = (1024, 1024)) -> str:
         """Resize image if it's too large"""
         try:
-            with Image.open(image_path) as img:
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                    img.save(image_path, optimize=True, quality=85)
+            image = self.store.load_image(image_path)
+            if image is not None:
+                height, width = image.shape[:2]
+                scale = min(max_size[0] / width, max_size[1] / height)
+                if scale < 1:
+                    image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+                    cv2.imwrite(image_path, image, [cv2.IMWRITE_JPEG_QUALITY, 85])
             return image_path
         except Exception as e:
-            print(f"Error resizing image: {str(e)}")
+            logger.error(f"Error resizing image: {str(e)}")
             return image_path
     
     def validate_image(self, image_path: str) -> Dict[str, Any]:
@@ -50,11 +45,9 @@ class ImageUtils:
             if not os.path.exists(image_path):
                 return {'valid': False, 'error': 'File does not exist'}
             
-            # Try to open with PIL
-            with Image.open(image_path) as img:
-                width, height = img.size
-                format = img.format
-                mode = img.mode
+            # Dimensions and format come from the header; nothing is decoded
+            with open(image_path, 'rb') as f:
+                format, width, height = read_image_header(f)
             
             # Basic validation
             if width < 100 or height < 100:
@@ -67,8 +60,7 @@ class ImageUtils:
                 'valid': True,
                 'width': width,
                 'height': height,
-                'format': format,
-                'mode': mode
+                'format': format
             }
             
         except Exception as e:
@@ -77,10 +69,7 @@ class ImageUtils:
     def cleanup_file(self, file_path: str) -> bool:
         """Delete file safely"""
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                return True
-            return False
+            return self.store.delete(file_path)
         except Exception as e:
-            print(f"Error deleting file {file_path}: {str(e)}")
+            logger.error(f"Error deleting file {file_path}: {str(e)}")
             return False
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import json
+import socket
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Any, Tuple
+import numpy as np
+
+# Messages are a 4-byte big-endian length followed by a JSON body
+_HEADER = struct.Struct('>I')
+
+_PEERCRED = struct.Struct('3i')  # struct ucred: pid, uid, gid
+
+def peer_uid(sock: socket.socket) -> int:
+    """User id of the process at the other end of a connected Unix socket (Linux)"""
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size)
+    return _PEERCRED.unpack(creds)[1]
+
+def prepare_socket_dir(socket_path: str):
+    """Create the socket's directory private to this user, refusing one others can reach"""
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f'{directory} must be owned by this user and closed to others (mode 0700)')
+
+def send_message(sock: socket.socket, message: Dict[str, Any]):
+    body = json.dumps(message, default=_to_json).encode()
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+def recv_message(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length))
+
+def share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """Copy an array into a new shared memory block and describe it for the peer"""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, {'shm': shm.name, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+def attach_array(spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Map an array shared by the peer without copying it"""
+    shm = shared_memory.SharedMemory(name=spec['shm'])
+    # The creating process owns the block; don't let our tracker unlink it on exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm, np.ndarray(tuple(spec['shape']), dtype=spec['dtype'], buffer=shm.buf)
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError('Connection closed mid-message')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def _to_json(value):
+    """Convert numpy scalars and arrays found in service results"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+import tracemalloc
+from functools import wraps
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+from config import Config
+
+class MemoryAccountant:
+    """Peak and retained Python allocations plus RSS deltas per pipeline stage.
+
+    tracemalloc's peak counter is process-wide and each stage resets it, so
+    while accounting is enabled stages are serialized: a thread entering an
+    outermost stage waits for any other thread's stage to finish. Requests
+    still run concurrently outside stages, and their allocations there can
+    show up in a stage's figures; run one request per process (or
+    memory_budget.py) for exact numbers. Disabled unless MEMORY_ACCOUNTING is
+    set, in which case stages cost a few microseconds, the serialization, and
+    tracemalloc's own overhead on every allocation.
+    """
+
+    def __init__(self, enabled: bool = False, frames: int = 1):
+        self.enabled = enabled
+        self.frames = frames
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stage_lock = threading.RLock()  # held by the thread measuring stages
+        self._local = threading.local()
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def track(self, name: str):
+        """Decorator form of stage()"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        with self._stage_lock, self._measure(name):
+            yield
+
+    @contextmanager
+    def _measure(self, name: str):
+        stack = self._local.__dict__.setdefault('stack', [])
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # Our reset_peak() below would hide the parent's peak so far
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        frame = {'start': current, 'peak': current}
+        stack.append(frame)
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            stack.pop()
+            peak = max(peak, frame['peak'])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            rss_after = _rss_bytes()
+            self._record(name, {
+                'peak_bytes': peak - frame['start'],
+                'retained_bytes': current - frame['start'],
+                'rss_delta_bytes': rss_after - rss_before if rss_after is not None and rss_before is not None else None,
+                'duration_ms': (time.perf_counter() - started) * 1000
+            })
+
+    def _record(self, name: str, sample: Dict[str, Any]):
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'calls': 0, 'max_peak_bytes': 0, 'total_retained_bytes': 0,
+                'max_rss_delta_bytes': None, 'last': None
+            })
+            stats['calls'] += 1
+            stats['max_peak_bytes'] = max(stats['max_peak_bytes'], sample['peak_bytes'])
+            stats['total_retained_bytes'] += sample['retained_bytes']
+            if sample['rss_delta_bytes'] is not None:
+                stats['max_rss_delta_bytes'] = max(stats['max_rss_delta_bytes'] or 0, sample['rss_delta_bytes'])
+            stats['last'] = sample
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self._stats.items()}
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        return {'enabled': self.enabled, 'rss_bytes': _rss_bytes(), 'traced_bytes': traced, 'stages': stages}
+
+    def top_allocations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Source lines holding the most live memory right now"""
+        if not tracemalloc.is_tracing():
+            return []
+        statistics = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+        return [{'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count} for stat in statistics]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+memory_accountant = MemoryAccountant(enabled=Config.MEMORY_ACCOUNTING, frames=Config.MEMORY_ACCOUNTING_FRAMES)
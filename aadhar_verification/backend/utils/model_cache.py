@@ -0,0 +1,266 @@
+"""Pre-converted model weights that load by memory-mapping.
+
+Every process that builds a DeepFace model parses its .h5 weight file from
+~/.deepface/weights. This module converts the configured models once into
+MODEL_CACHE_DIR: the Keras architecture as JSON plus all weight tensors in one
+flat, aligned file. FaceService.warmup maps that file read-only and puts the
+rebuilt models into the cache DeepFace's build_model looks in first
+(deepface.modules.modeling.cached_models, keyed by task and model name; older
+releases used DeepFace.model_obj), so startup skips HDF5 parsing and the file
+is read from the page cache that all workers on a node share.
+
+Current DeepFace caches a client wrapper around the Keras model rather than
+the model itself. The entry records the wrapper's class and plain attributes
+(name, input and output shape) so an equivalent wrapper can be restored
+around the rebuilt model without running its constructor, which would load
+the .h5 file again.
+
+An entry records the size and mtime of the source weight file and the DeepFace
+and TensorFlow versions. If any of these changed, or the entry cannot be read,
+loading falls back to DeepFace's own loader.
+
+    python -m utils.model_cache build [--model VGG-Face --model Age]
+    python -m utils.model_cache status
+"""
+import os
+import sys
+import json
+import uuid
+import logging
+import argparse
+import importlib
+from collections import defaultdict
+from importlib import metadata
+from typing import Dict, Any, Optional, List
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Weight files DeepFace downloads for the models we can cache
+SOURCE_WEIGHTS = {
+    'VGG-Face': 'vgg_face_weights.h5',
+    'Facenet': 'facenet_weights.h5',
+    'Facenet512': 'facenet512_weights.h5',
+    'ArcFace': 'arcface_weights.h5',
+    'Age': 'age_model_weights.h5'
+}
+# Task that deepface.modules.modeling.build_model files each model under
+MODEL_TASKS = {
+    'VGG-Face': 'facial_recognition',
+    'Facenet': 'facial_recognition',
+    'Facenet512': 'facial_recognition',
+    'ArcFace': 'facial_recognition',
+    'Age': 'facial_attribute'
+}
+ALIGNMENT = 64
+
+def _slug(model_name: str) -> str:
+    return model_name.lower().replace('-', '_')
+
+def _manifest_path(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, f'{_slug(model_name)}.json')
+
+def _fingerprint(model_name: str) -> Optional[Dict[str, Any]]:
+    """What the cached weights were converted from; None if the model is not cacheable"""
+    if model_name not in SOURCE_WEIGHTS:
+        return None
+    home = os.environ.get('DEEPFACE_HOME', os.path.expanduser('~'))
+    source = os.path.join(home, '.deepface', 'weights', SOURCE_WEIGHTS[model_name])
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    import tensorflow as tf
+    return {
+        'model': model_name,
+        'source': source,
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'deepface': metadata.version('deepface'),
+        'tensorflow': tf.__version__
+    }
+
+def _modeling():
+    """deepface.modules.modeling, or None for releases that cache in DeepFace.model_obj"""
+    try:
+        from deepface.modules import modeling
+    except ImportError:
+        return None
+    return modeling
+
+def build_model(model_name: str):
+    """Build a model through DeepFace's own loader and cache; returns what DeepFace caches for it"""
+    modeling = _modeling()
+    if modeling is None:
+        from deepface import DeepFace
+        return DeepFace.build_model(model_name)
+    return modeling.build_model(task=MODEL_TASKS.get(model_name, 'facial_recognition'), model_name=model_name)
+
+def _client_spec(client) -> Optional[Dict[str, Any]]:
+    """How to restore a DeepFace client wrapper around a rebuilt model; None for a bare Keras model"""
+    if not hasattr(client, 'model') or hasattr(client, 'get_weights'):
+        return None
+    attributes = {}
+    for name, value in vars(client).items():
+        if name == 'model':
+            continue
+        if value is not None and not isinstance(value, (str, int, float, bool, list, tuple)):
+            raise ValueError(f'{type(client).__name__}.{name} cannot be stored in the cache')
+        attributes[name] = value
+    return {'module': type(client).__module__, 'class': type(client).__qualname__, 'attributes': attributes}
+
+def _restore_client(spec: Dict[str, Any], model):
+    cls = getattr(importlib.import_module(spec['module']), spec['class'])
+    client = cls.__new__(cls)  # the constructor would load the .h5 weights
+    for name, value in spec['attributes'].items():
+        # JSON turns shape tuples into lists
+        setattr(client, name, tuple(value) if isinstance(value, list) else value)
+    client.model = model
+    return client
+
+def stale_reason(model_name: str, cache_dir: str) -> Optional[str]:
+    """Why the cache entry cannot be used, or None if it is current"""
+    fingerprint = _fingerprint(model_name)
+    if fingerprint is None:
+        return 'not cacheable or source weights missing'
+    try:
+        with open(_manifest_path(cache_dir, model_name)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return 'no cache entry'
+    changed = [key for key, value in fingerprint.items() if manifest['fingerprint'].get(key) != value]
+    if changed:
+        return f'changed since conversion: {", ".join(changed)}'
+    if not os.path.exists(os.path.join(cache_dir, manifest['weights'])):
+        return 'weights file missing'
+    return None
+
+def build_entry(model_name: str, built, cache_dir: str) -> str:
+    """Write a cache entry for a model from build_model and return its manifest path"""
+    fingerprint = _fingerprint(model_name)
+    if fingerprint is None:
+        raise ValueError(f'{model_name} is not cacheable or its source weights are missing')
+    client = _client_spec(built)
+    model = built.model if client is not None else built
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = _manifest_path(cache_dir, model_name)
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f).get('weights')
+    except (OSError, ValueError):
+        previous = None
+
+    # A fresh name per build, so processes still mapping the old file are unaffected
+    weights_name = f'{_slug(model_name)}-{uuid.uuid4().hex[:8]}.weights'
+    tensors = []
+    offset = 0
+    with open(os.path.join(cache_dir, weights_name), 'wb') as f:
+        for array in model.get_weights():
+            array = np.ascontiguousarray(array)
+            padding = -offset % ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            f.write(array.tobytes())
+            tensors.append({'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str})
+            offset += array.nbytes
+
+    manifest = {
+        'fingerprint': fingerprint,
+        'architecture': model.to_json(),
+        'client': client,
+        'weights': weights_name,
+        'size': offset,
+        'tensors': tensors
+    }
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    if previous and previous != weights_name:
+        try:
+            os.remove(os.path.join(cache_dir, previous))
+        except OSError:
+            pass
+    return manifest_path
+
+def load_entry(model_name: str, cache_dir: str):
+    """Rebuild what DeepFace caches for a model from its entry, or None if the entry is stale or unreadable"""
+    reason = stale_reason(model_name, cache_dir)
+    if reason:
+        logger.info(f'Model cache miss for {model_name}: {reason}')
+        return None
+    try:
+        from tensorflow.keras.models import model_from_json
+        with open(_manifest_path(cache_dir, model_name)) as f:
+            manifest = json.load(f)
+        blob = np.memmap(os.path.join(cache_dir, manifest['weights']), dtype=np.uint8, mode='r')
+        if blob.size != manifest['size']:
+            raise ValueError(f'weights file is {blob.size} bytes, expected {manifest["size"]}')
+        weights = [
+            np.frombuffer(blob, dtype=np.dtype(t['dtype']), count=int(np.prod(t['shape'])), offset=t['offset'])
+            .reshape(t['shape'])
+            for t in manifest['tensors']
+        ]
+        model = model_from_json(manifest['architecture'])
+        model.set_weights(weights)
+        if manifest.get('client'):
+            return _restore_client(manifest['client'], model)
+        return model
+    except Exception as e:
+        logger.warning(f'Model cache entry for {model_name} is unusable, falling back: {str(e)}')
+        return None
+
+def load_cached_models(model_names: List[str], cache_dir: str) -> List[str]:
+    """Install current cache entries into DeepFace's model cache; returns the names loaded"""
+    modeling = _modeling()
+    loaded = []
+    for model_name in model_names:
+        if modeling is not None:
+            # build_model creates this dict on first use if it is missing; a
+            # defaultdict covers the tasks it would have pre-filled
+            tasks = modeling.__dict__.setdefault('cached_models', defaultdict(dict))
+            registry = tasks.setdefault(MODEL_TASKS.get(model_name, 'facial_recognition'), {})
+        else:
+            from deepface import DeepFace
+            registry = DeepFace.__dict__.setdefault('model_obj', {})
+        if model_name in registry:
+            loaded.append(model_name)
+            continue
+        built = load_entry(model_name, cache_dir)
+        if built is None:
+            continue
+        if (modeling is not None) != hasattr(built, 'model'):
+            logger.info(f'Model cache miss for {model_name}: entry does not match the DeepFace API')
+            continue
+        registry[model_name] = built
+        loaded.append(model_name)
+    return loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'status'])
+    parser.add_argument('--model', action='append', help='Model to convert (default: the configured models)')
+    parser.add_argument('--cache-dir', default=Config.MODEL_CACHE_DIR)
+    args = parser.parse_args()
+    model_names = args.model or [Config.FACE_VERIFICATION_MODEL, Config.AGE_ESTIMATION_MODEL]
+
+    if args.command == 'status':
+        for model_name in model_names:
+            print(f'{model_name:<12} {stale_reason(model_name, args.cache_dir) or "current"}')
+        return
+
+    failures = 0
+    for model_name in model_names:
+        try:
+            path = build_entry(model_name, build_model(model_name), args.cache_dir)
+        except Exception as e:
+            print(f'{model_name:<12} failed: {str(e)}')
+            failures += 1
+            continue
+        print(f'{model_name:<12} written to {path}')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from typing import Iterator, Optional, Tuple
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Field, File, Data, Epilogue
+
+def iter_multipart_parts(stream, boundary: str, chunk_size: int = 64 * 1024,
+                         max_part_size: Optional[int] = None) -> Iterator[Tuple[str, Optional[str], bytes]]:
+    """Yield (name, filename, data) for each multipart part as soon as it is complete.
+
+    The body is read from the stream chunk by chunk, so a caller that stops
+    iterating early never reads (or buffers) the remaining parts.
+    """
+    decoder = MultipartDecoder(boundary.encode())
+    current = None
+    buffer = []
+    buffered = 0
+    eof = False
+
+    while True:
+        event = decoder.next_event()
+
+        if isinstance(event, NeedData):
+            if eof:
+                raise ValueError('Unexpected end of multipart body')
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                eof = True
+            decoder.receive_data(chunk or None)
+
+        elif isinstance(event, (Field, File)):
+            current = event
+            buffer = []
+            buffered = 0
+
+        elif isinstance(event, Data):
+            buffer.append(event.data)
+            buffered += len(event.data)
+            if max_part_size is not None and buffered > max_part_size:
+                raise ValueError(f'Multipart part "{current.name}" is too large')
+            if not event.more_data:
+                yield current.name, getattr(current, 'filename', None), b''.join(buffer)
+
+        elif isinstance(event, Epilogue):
+            return
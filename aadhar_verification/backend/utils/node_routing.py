@@ -0,0 +1,105 @@
+import re
+import logging
+import urllib.error
+import urllib.request
+from typing import Dict, Optional, Set
+from flask import Request, Response, jsonify
+
+logger = logging.getLogger(__name__)
+
+# Headers that describe one connection and must not be copied across the proxy hop
+HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length'
+}
+FORWARDED_HEADER = 'X-Forwarded-Node'
+CLUSTER_SECRET_HEADER = 'X-Cluster-Secret'  # authenticates node-to-node calls
+FORWARD_CHUNK_SIZE = 64 * 1024
+UUID_LENGTH = 36
+
+def session_owner(session_id: Optional[str]) -> Optional[str]:
+    """Node encoded in a '<node>-<uuid>' session id, or None for a plain uuid"""
+    if not session_id or len(session_id) <= UUID_LENGTH + 1 or session_id[-UUID_LENGTH - 1] != '-':
+        return None
+    return session_id[:-UUID_LENGTH - 1]
+
+class NodeRouter:
+    """Send each session's requests to the node holding its files.
+
+    With NODE_ID set, new session ids are '<node>-<uuid>', so uploads, the
+    in-memory session and its progress stream stay on the node that created
+    them. Any node can take a request; one for another node's session is
+    proxied to that node from CLUSTER_NODES, streaming in both directions so
+    bursts and server-sent events pass through unbuffered. Each node must be a
+    single serving process, since sessions live in process memory. The
+    document hash index is not per session; DOCUMENT_HASH_NODE names the one
+    node that holds it for the cluster (see HashService).
+    """
+
+    def __init__(self, node_id: str, nodes: Dict[str, str], timeout: float,
+                 form_endpoints: Optional[Set[str]] = None):
+        if not re.fullmatch(r'[a-z0-9]{1,16}', node_id):
+            raise ValueError(f'NODE_ID must be 1-16 lowercase letters or digits, got {node_id!r}')
+        self.node_id = node_id
+        self.nodes = nodes
+        self.timeout = timeout
+        # Endpoints taking session_id as a form field; elsewhere it must be in the URL
+        self.form_endpoints = form_endpoints or set()
+
+    def route(self, request: Request) -> Optional[Response]:
+        """Proxy the request if another node owns its session; None to handle it here"""
+        owner = session_owner(self._session_id(request))
+        if owner is None or owner == self.node_id:
+            return None
+        if request.headers.get(FORWARDED_HEADER):
+            # The sending node thinks we own it; don't bounce it around the cluster
+            return jsonify({'error': 'Session is not owned by this node'}), 421
+        base_url = self.nodes.get(owner)
+        if not base_url:
+            return jsonify({'error': 'Session owner node is unknown'}), 503
+        return self.forward(base_url, request)
+
+    def forward(self, base_url: str, request: Request) -> Response:
+        cached = request.__dict__.get('_cached_data')
+        body = cached if cached is not None else request.stream
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        headers[FORWARDED_HEADER] = self.node_id
+        if cached is not None or request.content_length is not None:
+            headers['Content-Length'] = str(len(cached) if cached is not None else request.content_length)
+
+        upstream_request = urllib.request.Request(
+            base_url.rstrip('/') + request.full_path.rstrip('?'),
+            data=body if request.method not in ('GET', 'HEAD') else None,
+            headers=headers,
+            method=request.method
+        )
+        try:
+            upstream = urllib.request.urlopen(upstream_request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            upstream = e  # error responses are relayed as they are
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning(f'Forwarding to {base_url} failed: {str(e)}')
+            return jsonify({'error': 'Session owner node is unreachable'}), 503
+
+        read = getattr(upstream, 'read1', upstream.read)
+
+        def relay():
+            try:
+                while True:
+                    chunk = read(FORWARD_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+            finally:
+                upstream.close()
+
+        response_headers = [(k, v) for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS]
+        return Response(relay(), status=upstream.getcode(), headers=response_headers, direct_passthrough=True)
+
+    def _session_id(self, request: Request) -> Optional[str]:
+        session_id = (request.view_args or {}).get('session_id') or request.args.get('session_id')
+        if session_id or request.endpoint not in self.form_endpoints:
+            return session_id
+        # Cache the raw body first so it can still be forwarded once the form is parsed
+        request.get_data(cache=True)
+        return request.form.get('session_id')
@@ -0,0 +1,33 @@
+import os
+import fcntl
+from typing import Optional
+
+class ProcessLock:
+    """Non-blocking exclusive flock on a file, held until the process exits.
+
+    Used to elect one process among the workers sharing a directory. The lock
+    belongs to an open file description, which a forked child would share, so
+    a process that did not open the file itself reopens it before trying.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self.held = False
+
+    def acquire(self) -> bool:
+        """Try to take the lock; True while this process holds it"""
+        if self._pid != os.getpid():
+            self._fd, self._pid, self.held = None, os.getpid(), False
+        if self.held:
+            return True
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.held = True
+        return True
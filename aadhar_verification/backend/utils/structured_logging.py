@@ -0,0 +1,112 @@
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Any, Optional, List
+
+# Attributes every LogRecord has; anything else was passed through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line, including fields passed via extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != 'sample_rate' and not key.startswith('_'):
+                event[key] = value
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            event['exc'] = record.exc_text  # formatted before the record was queued
+        return json.dumps(event, default=str, separators=(',', ':'))
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records below WARNING from noisy loggers"""
+
+    def __init__(self, noisy_loggers: List[str], sample_rate: float):
+        super().__init__()
+        self.noisy_loggers = tuple(noisy_loggers)
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        # extra={'sample_rate': ...} samples a single call site
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None and record.name.startswith(self.noisy_loggers):
+            rate = self.sample_rate
+        return rate is None or random.random() < rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread; drop them rather than block when it falls behind"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the message arguments but keep the traceback apart from the message.
+
+        QueueHandler.prepare() folds the formatted traceback into msg and clears
+        exc_info, so formatters would never see it. The traceback is rendered
+        into exc_text here instead, while its frames are still alive.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def configure_logging(level: str = 'INFO', log_file: Optional[str] = None, json_format: bool = True,
+                      noisy_loggers: Optional[List[str]] = None, noisy_sample_rate: float = 0.01,
+                      queue_size: int = 10000) -> DroppingQueueHandler:
+    """Route all logging through a queue drained by a background writer thread.
+
+    Request threads only pay for formatting the message and a put_nowait; the
+    file and stream writes happen on the listener thread.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(SamplingFilter(noisy_loggers or [], noisy_sample_rate))
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level))
+    return queue_handler
+
+def log_request(logger: logging.Logger, started: float, status: int, **fields: Any):
+    """Emit one structured event summarizing a request"""
+    fields['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    fields['status'] = status
+    logger.info('request', extra=fields)
@@ -0,0 +1,64 @@
+import os
+from typing import Dict, Any
+
+def limit_tesseract_threads(threads: int):
+    """Cap OpenMP in tesseract subprocesses without touching this process.
+
+    pytesseract starts tesseract with the environment held in its module's
+    `environ`; it gets a copy carrying OMP_THREAD_LIMIT, so OpenMP users in the
+    worker itself (BLAS, OpenCV) keep their own limits.
+    """
+    import pytesseract.pytesseract as tesseract_runner
+    tesseract_runner.environ = {**os.environ, 'OMP_THREAD_LIMIT': str(threads)}
+
+def apply_thread_budget(config, include_tensorflow: bool = True) -> Dict[str, Any]:
+    """Pin the thread pools of BLAS, tesseract, OpenCV and TensorFlow for this worker.
+
+    Must run before the services import numpy, cv2 or tensorflow: BLAS reads its
+    environment when it is loaded and TensorFlow's pools are fixed on first use.
+    Pass include_tensorflow=False in processes that should never import it.
+    Returns a report of the effective settings.
+    """
+    env = {
+        'OPENBLAS_NUM_THREADS': config.BLAS_THREADS,
+        'MKL_NUM_THREADS': config.BLAS_THREADS,
+        'OMP_NUM_THREADS': config.BLAS_THREADS,
+        'TF_NUM_INTRAOP_THREADS': config.TF_INTRA_OP_THREADS,
+        'TF_NUM_INTEROP_THREADS': config.TF_INTER_OP_THREADS,
+    }
+    for name, value in env.items():
+        os.environ[name] = str(value)
+
+    limit_tesseract_threads(config.TESSERACT_THREADS)
+
+    report = {
+        'cpu_count': os.cpu_count(),
+        'workers_per_node': config.WORKERS_PER_NODE,
+        'threads_per_worker': config.THREADS_PER_WORKER,
+        'env': {name: os.environ[name] for name in env},
+        'tesseract_threads': config.TESSERACT_THREADS
+    }
+
+    import cv2
+    cv2.setNumThreads(config.OPENCV_THREADS)
+    report['opencv_threads'] = cv2.getNumThreads()
+
+    if not include_tensorflow:
+        report['tensorflow'] = None
+        return report
+
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(config.TF_INTRA_OP_THREADS)
+        tf.config.threading.set_inter_op_parallelism_threads(config.TF_INTER_OP_THREADS)
+        report['tensorflow'] = {
+            'intra_op_threads': tf.config.threading.get_intra_op_parallelism_threads(),
+            'inter_op_threads': tf.config.threading.get_inter_op_parallelism_threads()
+        }
+    except ImportError:
+        report['tensorflow'] = None
+    except RuntimeError as e:
+        # TensorFlow was already initialized; only the env vars above apply
+        report['tensorflow'] = {'error': str(e)}
+
+    return report
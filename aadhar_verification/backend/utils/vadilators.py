@@ -1,5 +1,7 @@
 import re
 from typing import Dict, Any, Optional
+from config import Config
+from utils.image_header import read_image_header, check_image_header
 
 class Validators:
     @staticmethod
@@ -8,8 +10,8 @@ class Validators:
         if not session_id:
             return {'valid': False, 'error': 'Session ID is required'}
         
-        # Check if it's a valid UUID format
-        uuid_pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+        # Check if it's a valid UUID format, optionally prefixed with the owning node
+        uuid_pattern = r'^(?:[a-z0-9]{1,16}-)?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
         if not re.match(uuid_pattern, session_id):
             return {'valid': False, 'error': 'Invalid session ID format'}
         
@@ -29,7 +31,19 @@ class Validators:
                 file.filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'bmp'}):
             return {'valid': False, 'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, BMP'}
         
-        return {'valid': True}
+        # Sniff the header only; the body is not read unless it passes
+        try:
+            image_format, width, height = read_image_header(file.stream)
+            check_image_header(
+                (image_format, width, height),
+                extension=file.filename.rsplit('.', 1)[1],
+                max_dimension=Config.MAX_IMAGE_DIMENSION,
+                max_pixels=Config.MAX_IMAGE_PIXELS
+            )
+        except ValueError as e:
+            return {'valid': False, 'error': f'Invalid image file: {str(e)}'}
+        
+        return {'valid': True, 'format': image_format, 'width': width, 'height': height}
     
     @staticmethod
     def validate_date_format(date_str: str) -> Dict[str, Any]:
@@ -7,6 +7,7 @@ export default function App() {
   const [step, setStep] = useState(1);
   const [sessionId, setSessionId] = useState(null);
   const [result, setResult] = useState(null);
+  const [uploadError, setUploadError] = useState(null);
 
   return (
     <div className="container">
@@ -15,10 +16,14 @@ export default function App() {
         <AadhaarUpload onSuccess={id => { setSessionId(id); setStep(2); }} />
       )}
       {step === 2 && (
-        <SelfieCapture sessionId={sessionId} onSuccess={() => setStep(3)} />
+        <SelfieCapture sessionId={sessionId} onSuccess={() => setStep(3)} onError={setUploadError} />
       )}
       {step === 3 && (
-        <VerificationResult sessionId={sessionId} onResult={res => { setResult(res); setStep(4); }} />
+        <VerificationResult
+          sessionId={sessionId}
+          uploadError={uploadError}
+          onResult={res => { setResult(res); setStep(4); }}
+        />
       )}
       {step === 4 && result && (
         <div className="card">
@@ -1,4 +1,19 @@
 import React, { useState } from 'react';
+import { drawScaled, detectFaceBox } from '../geometry';
+
+// Downscale before upload and look for the photo's face; falls back to the original file
+const prepare = async file => {
+  try {
+    const bitmap = await createImageBitmap(file);
+    const canvas = document.createElement('canvas');
+    drawScaled(bitmap, canvas, bitmap.width, bitmap.height);
+    const face = await detectFaceBox(canvas);
+    const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.92));
+    return { upload: new File([blob], 'aadhaar.jpg', { type: 'image/jpeg' }), face };
+  } catch {
+    return { upload: file, face: null };
+  }
+};
 
 export default function AadhaarUpload({ onSuccess }) {
   const [preview, setPreview] = useState(null);
@@ -10,8 +25,10 @@ export default function AadhaarUpload({ onSuccess }) {
     setFeedback(null);
     setPreview(URL.createObjectURL(file));
 
+    const { upload: prepared, face } = await prepare(file);
     const form = new FormData();
-    form.append('file', file);
+    form.append('file', prepared);
+    if (face) form.append('face_box', JSON.stringify(face));
     const res = await fetch('/upload-aadhaar', { method: 'POST', body: form });
     const data = await res.json();
     setLoading(false);
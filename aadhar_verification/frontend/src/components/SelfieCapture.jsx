@@ -1,8 +1,11 @@
 import React, { useRef, useState } from 'react';
+import { drawScaled, detectFaceBox } from '../geometry';
 
-export default function SelfieCapture({ sessionId, onSuccess }) {
+const BURST_FRAMES = 5;
+const BURST_INTERVAL_MS = 150;
+
+export default function SelfieCapture({ sessionId, onSuccess, onError }) {
   const [preview, setPreview] = useState(null);
-  const [feedback, setFeedback] = useState(null);
   const [loading, setLoading] = useState(false);
   const video = useRef(), canvas = useRef();
 
@@ -11,27 +14,44 @@ export default function SelfieCapture({ sessionId, onSuccess }) {
     video.current.srcObject = stream;
   };
 
-  const capture = () => {
+  const grabFrame = async () => {
     const v = video.current, c = canvas.current;
-    c.width = v.videoWidth;
-    c.height = v.videoHeight;
-    c.getContext('2d').drawImage(v, 0, 0);
-    c.toBlob(upload, 'image/jpeg');
+    drawScaled(v, c, v.videoWidth, v.videoHeight);
+    const face = await detectFaceBox(c);
+    const blob = await new Promise(resolve => c.toBlob(resolve, 'image/jpeg'));
+    return { blob, face };
+  };
+
+  // Send a short burst; the server stops reading at the first good frame
+  const capture = async () => {
+    const frames = [];
+    for (let i = 0; i < BURST_FRAMES; i++) {
+      frames.push(await grabFrame());
+      await new Promise(r => setTimeout(r, BURST_INTERVAL_MS));
+    }
+    upload(frames);
   };
 
-  const upload = async blob => {
+  const upload = frames => {
     setLoading(true);
-    setPreview(URL.createObjectURL(blob));
-    const file = new File([blob], 'selfie.jpg');
+    setPreview(URL.createObjectURL(frames[0].blob));
     const form = new FormData();
-    form.append('file', file);
     form.append('session_id', sessionId);
-    const res = await fetch('/upload-selfie', { method: 'POST', body: form });
-    const data = await res.json();
-    setLoading(false);
+    // Must come before the frames, which the server reads as they stream in
+    form.append('face_hints', JSON.stringify(frames.map(f => f.face)));
+    frames.forEach(({ blob }, i) => form.append('frames', new File([blob], `frame${i}.jpg`)));
 
-    if (res.ok) onSuccess();
-    else setFeedback({ type: 'error', message: data.error });
+    // Progress and results arrive over the session's event stream. The session id is also in
+    // the URL so a node can forward the burst to the node that owns the session without reading it.
+    // Requests rejected before the pipeline starts publish no event, so report those here.
+    fetch(`/upload-selfie-burst?session_id=${sessionId}`, { method: 'POST', body: form })
+      .then(async res => {
+        if (res.ok) return;
+        const data = await res.json().catch(() => ({}));
+        onError(data.issues ? data.issues.join(', ') : data.error || 'Upload failed');
+      })
+      .catch(() => onError('Upload failed'));
+    onSuccess();
   };
 
   return (
@@ -51,7 +71,6 @@ export default function SelfieCapture({ sessionId, onSuccess }) {
         </>
       )}
       {loading && <div className="loader" />}
-      {feedback && <div className={`feedback ${feedback.type}`}>{feedback.message}</div>}
       <canvas ref={canvas} className="hidden" />
     </div>
   );
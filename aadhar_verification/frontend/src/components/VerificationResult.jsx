@@ -1,25 +1,55 @@
-import React, { useEffect } from 'react';
+import React, { useEffect, useState } from 'react';
 
-export default function VerificationResult({ sessionId, onResult }) {
-  const [loading, setLoading] = React.useState(true);
+const STAGE_LABELS = {
+  frame_selected: 'Best frame selected',
+  quality_checked: 'Image quality checked',
+  face_detected: 'Faces detected',
+  match_computed: 'Face match computed',
+  age_estimated: 'Age estimated'
+};
 
+export default function VerificationResult({ sessionId, uploadError, onResult }) {
+  const [stages, setStages] = useState([]);
+  const [error, setError] = useState(null);
+
+  useEffect(() => {
+    // Follow pipeline progress instead of waiting on the upload request
+    const events = new EventSource(`/session/${sessionId}/events`);
+
+    Object.keys(STAGE_LABELS).forEach(stage =>
+      events.addEventListener(stage, e => {
+        const { data } = JSON.parse(e.data);
+        setStages(prev => [...prev, { stage, data }]);
+        if (stage === 'quality_checked' && !data.acceptable) {
+          setError(`Image quality issues: ${data.issues.join(', ')}`);
+        }
+      })
+    );
+    events.addEventListener('verification_complete', e => {
+      events.close();
+      onResult(JSON.parse(e.data).data);
+    });
+    events.addEventListener('failed', e => {
+      events.close();
+      const { data } = JSON.parse(e.data);
+      setError(data.issues ? data.issues.join(', ') : data.error);
+    });
+
+    return () => events.close();
+  }, [sessionId]);
+
+  // The upload itself was rejected, so no stage events will follow
   useEffect(() => {
-    (async () => {
-      const res = await fetch('/verify', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ session_id: sessionId })
-      });
-      const data = await res.json();
-      onResult(data);
-      setLoading(false);
-    })();
-  }, []);
+    if (uploadError) setError(uploadError);
+  }, [uploadError]);
 
   return (
     <div className="card text-center">
       <h2>Verifying...</h2>
-      {loading && <div className="loader" />}
+      <ul>
+        {stages.map(({ stage }, i) => <li key={i}>✅ {STAGE_LABELS[stage]}</li>)}
+      </ul>
+      {error ? <div className="feedback error">{error}</div> : <div className="loader" />}
     </div>
   );
 }
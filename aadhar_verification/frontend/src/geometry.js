@@ -0,0 +1,30 @@
+// Matches the server's working resolution; larger images are downscaled there anyway
+export const MAX_DIMENSION = 1024;
+
+// Draw a video frame or image bitmap into the canvas, no larger than MAX_DIMENSION
+export const drawScaled = (source, canvas, width, height) => {
+  const scale = Math.min(1, MAX_DIMENSION / Math.max(width, height));
+  canvas.width = Math.round(width * scale);
+  canvas.height = Math.round(height * scale);
+  canvas.getContext('2d').drawImage(source, 0, 0, canvas.width, canvas.height);
+};
+
+const faceDetector = 'FaceDetector' in window
+  ? new window.FaceDetector({ fastMode: true, maxDetectedFaces: 1 })
+  : null;
+
+// Largest face as [x, y, w, h] fractions of the canvas, or null.
+// Only a hint: the server confirms it before skipping its own detection.
+export const detectFaceBox = async canvas => {
+  if (!faceDetector) return null;
+  try {
+    const faces = await faceDetector.detect(canvas);
+    if (!faces.length) return null;
+    const { x, y, width, height } = faces
+      .map(f => f.boundingBox)
+      .reduce((a, b) => (a.width * a.height >= b.width * b.height ? a : b));
+    return [x / canvas.width, y / canvas.height, width / canvas.width, height / canvas.height];
+  } catch {
+    return null;
+  }
+};
@@ -7,7 +7,9 @@ export default defineConfig({
     proxy: {
       '/upload-aadhaar': { target: 'http://localhost:5000', changeOrigin: true },
       '/upload-selfie': { target: 'http://localhost:5000', changeOrigin: true },
-      '/verify': { target: 'http://localhost:5000', changeOrigin: true }
+      '/upload-selfie-burst': { target: 'http://localhost:5000', changeOrigin: true },
+      '/verify': { target: 'http://localhost:5000', changeOrigin: true },
+      '/session': { target: 'http://localhost:5000', changeOrigin: true }
     }
   }
 });
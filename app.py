@@ -1,12 +1,18 @@
 import os
-import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: records are queued and written by a background thread
+from aadhar_verification.backend.utils.structured_logging import configure_logging
+configure_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    log_file=os.environ.get("LOG_FILE"),
+    json_format=os.environ.get("LOG_FORMAT", "json") == "json",
+    noisy_loggers=['tensorflow', 'h5py', 'PIL', 'urllib3', 'werkzeug'],
+    noisy_sample_rate=float(os.environ.get("LOG_NOISY_SAMPLE_RATE", "0.01"))
+)
 
 class Base(DeclarativeBase):
     pass
@@ -28,12 +34,63 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['IMAGE_MAX_DIMENSION'] = 1024  # working resolution stored for uploads
+app.config['KEEP_ORIGINAL_UPLOADS'] = os.environ.get("KEEP_ORIGINAL_UPLOADS", "false").lower() == "true"
+# Checked against the image header before an upload is read or decoded
+app.config['UPLOAD_MAX_DIMENSION'] = 8000
+app.config['UPLOAD_MAX_PIXELS'] = 40_000_000
+app.config['MAX_AADHAR_IMAGES'] = 4  # front, back and extra pages per upload
+app.config['OCR_WORKERS'] = 4  # concurrent OCR passes per worker process
 
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Upload cleanup (see janitor.py); ages in seconds
+app.config['JANITOR_ENABLED'] = os.environ.get("JANITOR_ENABLED", "true").lower() == "true"
+app.config['JANITOR_INTERVAL_SECONDS'] = 30
+app.config['JANITOR_BATCH_SIZE'] = 200
+app.config['UPLOAD_RETENTION'] = 24 * 3600  # hard limit for any upload
+app.config['COMPLETED_UPLOAD_RETENTION'] = 10 * 60  # after verification completes
+app.config['ACTIVE_UPLOAD_AGE'] = 3600  # younger uploads are never evicted for the quota
+app.config['UPLOAD_DISK_QUOTA'] = 2 * 1024 * 1024 * 1024  # 2GB
+
+if app.config['JANITOR_ENABLED']:
+    from janitor import init_janitor
+    init_janitor(app)
+
+# Per-request profiling (see profiling.py)
+app.config['PROFILING_SECRET'] = os.environ.get("PROFILING_SECRET")
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+app.config['PROFILE_FORMAT'] = os.environ.get("PROFILE_FORMAT", "pstats")  # or "collapsed"
+app.config['PROFILE_DIR'] = 'profiles'
+
+from profiling import init_profiling
+init_profiling(app)
+
+# Traffic capture for replay (see capture.py and replay.py)
+app.config['CAPTURE_ENABLED'] = os.environ.get("CAPTURE_ENABLED", "false").lower() == "true"
+app.config['CAPTURE_SAMPLE_RATE'] = float(os.environ.get("CAPTURE_SAMPLE_RATE", "1.0"))
+app.config['CAPTURE_IMAGES'] = os.environ.get("CAPTURE_IMAGES", "false").lower() == "true"
+app.config['CAPTURE_DIR'] = 'captures'
+app.config['SERVER_TIMING'] = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
+from capture import init_capture, init_request_logging
+init_capture(app)
+init_request_logging(app)
+
+# Database tuning and background writes (see persistence.py)
+app.config['WRITE_BEHIND_INTERVAL'] = 0.5  # seconds between group commits
+app.config['WRITE_BEHIND_MAX_BATCH'] = 200
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+
 # initialize the app with the extension
+from persistence import WriteBehindQueue
 db.init_app(app)
+write_behind = WriteBehindQueue(
+    app, db,
+    interval=app.config['WRITE_BEHIND_INTERVAL'],
+    max_batch=app.config['WRITE_BEHIND_MAX_BATCH']
+)
 
 # Import routes after app creation
 from routes import *
@@ -42,3 +99,6 @@ with app.app_context():
     # Import models to ensure tables are created
     import models
     db.create_all()
+    # create_all() skips existing tables; add columns introduced since
+    from schema import upgrade_schema
+    upgrade_schema(db)
@@ -0,0 +1,230 @@
+"""Offline bulk verification of (Aadhar image, selfie) pairs.
+
+Input is either a CSV with id,aadhar_path,selfie_path columns or a folder with
+one sub-folder per pair holding aadhar.* and selfie.* images. Results are
+streamed to a JSONL file or to the VerificationSession table; rerunning the
+same command skips pairs that already have a result and retries failed ones.
+Selfies go through the same quality gate as /upload_selfie: a rejected pair
+is recorded with its quality flags and verification_complete false, and no
+model runs for it. Rows written here are left out of the analytics rollups.
+
+Usage:
+    python bulk_verify.py pairs.csv --output results.jsonl --workers 8
+    python bulk_verify.py audit_folder/ --db
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from multiprocessing import get_context
+
+BULK_SESSION_PREFIX = 'bulk-'
+
+# One service per worker process, created by the pool initializer
+_service = None
+
+
+def init_worker():
+    """Set up logging, create the worker's service and load the models once"""
+    # Workers are spawned, so nothing from the parent (logging thread, database
+    # pool) is inherited; TensorFlow only ever initializes here
+    from aadhar_verification.backend.utils.structured_logging import configure_logging
+    configure_logging(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        log_file=os.environ.get("LOG_FILE"),
+        json_format=os.environ.get("LOG_FORMAT", "json") == "json"
+    )
+    from verification_service import VerificationService
+    global _service
+    _service = VerificationService()
+    _service.warmup()
+
+
+def verify_pair(pair):
+    """Run the full verification pipeline for one pair"""
+    started = time.time()
+    result = {
+        'id': pair['id'],
+        'aadhar_path': pair['aadhar_path'],
+        'selfie_path': pair['selfie_path'],
+        'error': None
+    }
+
+    try:
+        ocr_result = _service.extract_dob_details(pair['aadhar_path'])
+        dob = ocr_result['dob']
+        age = _service.calculate_age(dob) if dob else None
+        quality = _service.quality_gate(pair['selfie_path'])
+        result.update({
+            'extracted_dob': dob,
+            'extracted_age': age,
+            'ocr_confidence': ocr_result['confidence'],
+            'ocr_pattern_index': ocr_result['pattern_index'],
+            'quality_flags': int(quality['flags']),
+            'verification_complete': quality['passed']
+        })
+        if not quality['passed']:
+            # /upload_selfie asks for a retake here instead of running the models
+            result['quality_issues'] = quality['issues']
+            result['elapsed'] = round(time.time() - started, 3)
+            return result
+
+        face_result = _service.face_match_details(pair['aadhar_path'], pair['selfie_path'])
+        result.update({
+            'face_match_verified': face_result['verified'],
+            'face_match_confidence': face_result['confidence'],
+            'face_distance': face_result['distance'],
+            'face_threshold': face_result['threshold'],
+            'estimated_age_range': None,
+            'estimated_exact_age': None,
+            'raw_estimated_age': None,
+            'age_verification_passed': False
+        })
+
+        if face_result['verified']:
+            age_result = _service.age_estimate_details(pair['selfie_path'], claimed_age=age)
+            result.update({
+                'estimated_age_range': age_result['age_range'],
+                'estimated_exact_age': age_result['exact_age'],
+                'raw_estimated_age': age_result['raw_age']
+            })
+            if age_result['age_range'] and age is not None:
+                result['age_verification_passed'] = _service.compare_ages(age, age_result['age_range'])
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['elapsed'] = round(time.time() - started, 3)
+    return result
+
+
+def load_pairs(source):
+    """Read pairs from a CSV file or a folder of per-pair sub-folders"""
+    if os.path.isfile(source):
+        with open(source, newline='') as f:
+            pairs = {}
+            for row in csv.DictReader(f):
+                if row['id'] in pairs:
+                    # Ids become session ids, which must be unique
+                    print(f"Skipping duplicate id {row['id']!r}", file=sys.stderr)
+                    continue
+                pairs[row['id']] = {'id': row['id'], 'aadhar_path': row['aadhar_path'], 'selfie_path': row['selfie_path']}
+            return list(pairs.values())
+
+    pairs = []
+    for entry in sorted(os.scandir(source), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        images = {}
+        for name in os.listdir(entry.path):
+            stem = name.rsplit('.', 1)[0].lower()
+            if stem in ('aadhar', 'selfie'):
+                images[stem] = os.path.join(entry.path, name)
+        if len(images) == 2:
+            pairs.append({'id': entry.name, 'aadhar_path': images['aadhar'], 'selfie_path': images['selfie']})
+    return pairs
+
+
+class JsonlSink:
+    """Append results to a JSONL file; the file itself is the checkpoint"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def completed_ids(self):
+        if not os.path.exists(self.path):
+            return set()
+        done = set()
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partial line from a killed run
+                if not record.get('error'):
+                    done.add(record['id'])
+        return done
+
+    def write(self, result):
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.write(json.dumps(result) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class DatabaseSink:
+    """Store results as VerificationSession rows, committing in batches"""
+
+    def __init__(self, batch_size=100):
+        from app import app, db
+        from models import VerificationSession
+        self.app, self.db, self.model = app, db, VerificationSession
+        self.batch_size = batch_size
+        self.pending = 0
+        self.context = app.app_context()
+        self.context.push()
+
+    def completed_ids(self):
+        rows = self.db.session.query(self.model.session_id).filter(
+            self.model.session_id.startswith(BULK_SESSION_PREFIX)
+        )
+        return {session_id[len(BULK_SESSION_PREFIX):] for (session_id,) in rows}
+
+    def write(self, result):
+        if result['error']:
+            return  # Leave failed pairs unrecorded so a rerun retries them
+        fields = {k: v for k, v in result.items() if hasattr(self.model, k) and k != 'id'}
+        self.db.session.add(self.model(session_id=f"{BULK_SESSION_PREFIX}{result['id']}", **fields))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.db.session.commit()
+            self.pending = 0
+
+    def close(self):
+        self.db.session.commit()
+        self.context.pop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='CSV file or folder of pairs')
+    parser.add_argument('--output', default='bulk_results.jsonl', help='JSONL output file')
+    parser.add_argument('--db', action='store_true', help='Write results to the VerificationSession table instead')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=4)
+    parser.add_argument('--report-every', type=int, default=100)
+    args = parser.parse_args()
+
+    sink = DatabaseSink() if args.db else JsonlSink(args.output)
+    done = sink.completed_ids()
+    pairs = [p for p in load_pairs(args.source) if p['id'] not in done]
+    print(f"{len(pairs)} pairs to verify ({len(done)} already done)")
+
+    started = time.time()
+    processed = failed = 0
+    try:
+        with get_context('spawn').Pool(args.workers, initializer=init_worker) as pool:
+            for result in pool.imap_unordered(verify_pair, pairs, chunksize=args.chunksize):
+                sink.write(result)
+                processed += 1
+                failed += result['error'] is not None
+                if processed % args.report_every == 0 or processed == len(pairs):
+                    rate = processed / (time.time() - started)
+                    remaining = (len(pairs) - processed) / rate if rate else 0
+                    print(f"{processed}/{len(pairs)} done, {failed} failed, "
+                          f"{rate:.1f} pairs/s, ~{remaining / 60:.0f} min left", flush=True)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Opt-in capture of upload traffic for replay (see replay.py).
+
+With CAPTURE_ENABLED, a CAPTURE_SAMPLE_RATE fraction of sessions has its requests
+to the upload routes appended to <CAPTURE_DIR>/capture-<pid>.jsonl: arrival time, an
+HMAC-derived session token, image format, size and dimensions, response status
+and per-stage timings. Image bytes are written to <CAPTURE_DIR>/blobs/ only
+when CAPTURE_IMAGES is set. Filenames and session ids are never recorded.
+
+Sessions are sampled by their token, so a session is captured whole or not at
+all; requests made before a session exists are sampled one by one.
+
+Stages are timed with stage(); with SERVER_TIMING set the timings, and the
+request total measured the same way as in the capture, are also returned in a
+Server-Timing header, which is how replay.py measures a build.
+"""
+import os
+import json
+import time
+import hmac
+import random
+import hashlib
+from contextlib import contextmanager
+from flask import g, request, session
+from aadhar_verification.backend.utils.image_header import read_image_header
+from aadhar_verification.backend.utils.structured_logging import log_request
+
+CAPTURED_ENDPOINTS = {'start_verification', 'upload_aadhar', 'upload_selfie'}
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0) + (time.perf_counter() - started) * 1000
+
+
+def session_token(session_id, secret):
+    """Stable pseudonym for a session, so retries can be grouped without the id"""
+    return hmac.new(secret.encode(), session_id.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def session_sampled(token, rate):
+    """Whether a session token falls in the sample; the same for every request of the session"""
+    return int(token, 16) < rate * 16 ** len(token)
+
+
+def describe_upload(file, blob_dir=None):
+    """Anonymized metadata of an uploaded file, optionally saving its bytes"""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    info = {'field': file.name, 'size': size, 'content_type': file.mimetype}
+    try:
+        info['format'], info['width'], info['height'] = read_image_header(stream)
+    except ValueError:
+        info['format'] = None
+
+    if blob_dir:
+        data = stream.read()
+        stream.seek(0)
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(blob_dir, digest)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        info['blob'] = digest
+    return info
+
+
+def init_capture(app):
+    """Register request hooks for traffic capture and Server-Timing"""
+    if not app.config['CAPTURE_ENABLED'] and not app.config['SERVER_TIMING']:
+        return
+
+    blob_dir = None
+    if app.config['CAPTURE_ENABLED']:
+        os.makedirs(app.config['CAPTURE_DIR'], exist_ok=True)
+        if app.config['CAPTURE_IMAGES']:
+            blob_dir = os.path.join(app.config['CAPTURE_DIR'], 'blobs')
+            os.makedirs(blob_dir, exist_ok=True)
+
+    @app.before_request
+    def start_capture():
+        if request.endpoint not in CAPTURED_ENDPOINTS:
+            return
+        g.capture_started = time.time()
+
+    @app.after_request
+    def finish_capture(response):
+        started = g.get('capture_started')
+        if started is None:
+            return response
+        timings = g.get('stage_timings', {})
+        total_ms = round((time.time() - started) * 1000, 1)
+
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = ', '.join(
+                [f"{name};dur={duration:.1f}" for name, duration in timings.items()] + [f"total;dur={total_ms}"]
+            )
+
+        if not app.config['CAPTURE_ENABLED']:
+            return response
+        # Decided here, once start_verification has created the session
+        session_id = session.get('verification_session_id')
+        token = session_token(session_id, app.secret_key) if session_id else None
+        rate = app.config['CAPTURE_SAMPLE_RATE']
+        sampled = session_sampled(token, rate) if token else random.random() < rate
+        if sampled:
+            record = {
+                'ts': started,
+                'endpoint': request.endpoint,
+                'path': request.path,
+                'method': request.method,
+                'session': token,
+                'files': [describe_upload(f, blob_dir) for _, f in request.files.items(multi=True)],
+                'status': response.status_code,
+                'success': (response.get_json(silent=True) or {}).get('success'),
+                'total_ms': total_ms,
+                'stages': {name: round(duration, 1) for name, duration in timings.items()}
+            }
+            path = os.path.join(app.config['CAPTURE_DIR'], f"capture-{os.getpid()}.jsonl")
+            with open(path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return response
+
+
+def init_request_logging(app):
+    """Log one structured event per request with its session and stage timings"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request_event(response):
+        log_request(
+            app.logger, g.get('request_started', time.perf_counter()), response.status_code,
+            method=request.method,
+            path=request.path,
+            session_id=session.get('verification_session_id'),
+            stages={name: round(ms, 1) for name, ms in g.get('stage_timings', {}).items()}
+        )
+        return response
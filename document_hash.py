@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+from sqlalchemy import or_
+from app import db
+from models import DocumentHash
+from image_store import load_image
+
+# 64-bit dHash split into 4 bands of 16 bits for multi-index hashing
+HASH_BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def crop_card(img):
+    """Crop the image to the largest card-like contour, or return it unchanged"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return gray
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    # Ignore tiny contours; the card should cover a good part of the photo
+    if w * h < 0.2 * gray.shape[0] * gray.shape[1]:
+        return gray
+    return gray[y:y + h, x:x + w]
+
+
+def compute_dhash(image_path):
+    """Compute a 64-bit difference hash of the card crop, or None if unreadable"""
+    img = load_image(image_path)
+    if img is None:
+        return None
+
+    small = cv2.resize(crop_card(img), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def split_bands(doc_hash):
+    """Split a 64-bit hash into its 16-bit bands"""
+    return [(doc_hash >> (i * BAND_BITS)) & BAND_MASK for i in range(HASH_BANDS)]
+
+
+def band_neighbours(value, radius):
+    """All band values within the given Hamming radius of value"""
+    neighbours = {value}
+    frontier = {value}
+    for _ in range(radius):
+        frontier = {v ^ (1 << bit) for v in frontier for bit in range(BAND_BITS)}
+        neighbours |= frontier
+    return list(neighbours)
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+class DocumentHashIndex:
+    """Near-duplicate lookup over stored Aadhaar hashes.
+
+    By the pigeonhole principle, two hashes within distance r agree to within
+    r // HASH_BANDS bits on at least one band, so each lookup only probes a few
+    indexed band values instead of scanning the table.
+    """
+
+    def __init__(self, max_distance=6):
+        self.max_distance = max_distance
+        self.band_radius = max_distance // HASH_BANDS
+
+    def lookup(self, doc_hash):
+        """Return the closest stored DocumentHash within max_distance, or None"""
+        bands = split_bands(doc_hash)
+        conditions = [
+            getattr(DocumentHash, f'band{i}').in_(band_neighbours(band, self.band_radius))
+            for i, band in enumerate(bands)
+        ]
+        candidates = DocumentHash.query.filter(or_(*conditions)).all()
+
+        best, best_distance = None, self.max_distance + 1
+        for candidate in candidates:
+            distance = hamming_distance(doc_hash, int(candidate.doc_hash, 16))
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return best
+
+    def add(self, doc_hash, session_id, dob, confidence):
+        """Store a hash together with the OCR result it produced"""
+        bands = split_bands(doc_hash)
+        record = DocumentHash(
+            doc_hash=f'{doc_hash:016x}',
+            band0=bands[0],
+            band1=bands[1],
+            band2=bands[2],
+            band3=bands[3],
+            session_id=session_id,
+            extracted_dob=dob,
+            ocr_confidence=confidence
+        )
+        db.session.add(record)
+        return record
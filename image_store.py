@@ -0,0 +1,20 @@
+import io
+from PIL import Image, ImageSequence
+from aadhar_verification.backend.utils.image_store import ImageStore, load_image, upload_extension
+
+
+def split_pages(data, file_ext, max_pages):
+    """Split a multi-frame GIF into (bytes, ext) pages; other images are one page"""
+    if not data.startswith((b'GIF87a', b'GIF89a')):
+        return [(data, file_ext)]
+    with Image.open(io.BytesIO(data)) as img:
+        if getattr(img, 'n_frames', 1) == 1:
+            return [(data, file_ext)]
+        pages = []
+        for frame in ImageSequence.Iterator(img):
+            if len(pages) == max_pages:
+                break
+            buffer = io.BytesIO()
+            frame.convert('RGB').save(buffer, format='PNG')
+            pages.append((buffer.getvalue(), 'png'))
+        return pages
@@ -0,0 +1,157 @@
+"""Background cleanup of uploaded images in UPLOAD_FOLDER.
+
+Uploads are named after their session (aadhar_<session id>[_<page>] and
+selfie_<session id>), so no bookkeeping is needed: the janitor walks the
+image store's shards JANITOR_BATCH_SIZE files per run and looks the sessions
+up. A file goes once its session has completed and COMPLETED_UPLOAD_RETENTION
+has passed, or UPLOAD_RETENTION after it was saved whatever the session state.
+
+Disk usage is measured over each full pass of the walk. When it is above
+UPLOAD_DISK_QUOTA, the oldest files seen in that pass are evicted, skipping
+ones younger than ACTIVE_UPLOAD_AGE that a verification in progress may
+still read. All workers share the folder, so only the process holding a lock
+file in it does any of this; the others' threads just keep trying the lock.
+"""
+import os
+import re
+import time
+import heapq
+import threading
+from aadhar_verification.backend.utils.image_store import ImageStore
+from aadhar_verification.backend.utils.process_lock import ProcessLock
+
+UPLOAD_NAME = re.compile(r'(?:aadhar|selfie)_([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+
+
+class UploadJanitor:
+    """Incremental retention sweep and disk quota for one uploads folder"""
+
+    def __init__(self, app):
+        self.app = app
+        self.root = app.config['UPLOAD_FOLDER']
+        self.store = ImageStore(self.root)
+        self.lock = ProcessLock(os.path.join(self.root, '.janitor.lock'))
+        self.batch_size = app.config['JANITOR_BATCH_SIZE']
+        self._walk = None
+        self._pass_bytes = 0
+        # Oldest evictable files of the current pass, as a max-heap on -mtime
+        self._oldest = []
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {'runs': 0, 'files_removed': 0, 'bytes_reclaimed': 0, 'disk_bytes': None}
+
+    def ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['JANITOR_INTERVAL_SECONDS'])
+            try:
+                self.run_once()
+            except Exception as e:
+                self.app.logger.error(f"Upload janitor run failed: {str(e)}")
+
+    def run_once(self):
+        """Process one batch of the walk; returns what was removed, or None if another process owns cleanup"""
+        if not self.lock.acquire():
+            return None
+        if self._walk is None:
+            self._walk = self._walk_uploads(self.root)
+            self._pass_bytes = 0
+            self._oldest = []
+
+        files, pass_complete = [], False
+        for _ in range(self.batch_size):
+            entry = next(self._walk, None)
+            if entry is None:
+                pass_complete = True
+                self._walk = None
+                break
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.path, entry.name, stat.st_mtime, stat.st_size))
+
+        now = time.time()
+        removed = reclaimed = 0
+        expired = self._expired(files, now)
+        evictable_before = now - self.app.config['ACTIVE_UPLOAD_AGE']
+        for path, name, mtime, size in files:
+            if path in expired:
+                removed += 1
+                reclaimed += size if self.store.delete(path) else 0
+                continue
+            self._pass_bytes += size
+            if mtime < evictable_before:
+                heapq.heappush(self._oldest, (-mtime, path, size))
+                if len(self._oldest) > self.batch_size:
+                    heapq.heappop(self._oldest)  # drops the newest
+
+        if pass_complete:
+            disk_bytes = self._pass_bytes
+            for _, path, size in sorted(self._oldest, reverse=True):
+                if disk_bytes <= self.app.config['UPLOAD_DISK_QUOTA']:
+                    break
+                if self.store.delete(path):
+                    removed += 1
+                    reclaimed += size
+                    disk_bytes -= size
+            self.stats['disk_bytes'] = disk_bytes
+
+        self.stats['runs'] += 1
+        self.stats['files_removed'] += removed
+        self.stats['bytes_reclaimed'] += reclaimed
+        if removed:
+            self.app.logger.info(f"Upload janitor removed {removed} files, reclaimed {reclaimed} bytes")
+        return {'files_removed': removed, 'bytes_reclaimed': reclaimed}
+
+    def _expired(self, files, now):
+        """Paths among files that the retention policy says to delete"""
+        from models import VerificationSession
+
+        session_ids = {match.group(1) for match in (UPLOAD_NAME.match(name) for _, name, _, _ in files) if match}
+        completed = set()
+        if session_ids:
+            with self.app.app_context():
+                rows = VerificationSession.query.with_entities(VerificationSession.session_id).filter(
+                    VerificationSession.session_id.in_(session_ids),
+                    VerificationSession.verification_complete.is_(True)
+                ).all()
+            completed = {session_id for (session_id,) in rows}
+
+        expired = set()
+        for path, name, mtime, _ in files:
+            age = now - mtime
+            match = UPLOAD_NAME.match(name)
+            if age > self.app.config['UPLOAD_RETENTION']:
+                expired.add(path)
+            elif match and match.group(1) in completed and age > self.app.config['COMPLETED_UPLOAD_RETENTION']:
+                expired.add(path)
+        return expired
+
+    def _walk_uploads(self, root):
+        """Lazily yield files across the image store's shard directories"""
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk_uploads(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.path != self.lock.path:
+                    yield entry
+
+
+def init_janitor(app):
+    """Start the upload janitor with the first request of each worker"""
+    janitor = UploadJanitor(app)
+
+    @app.before_request
+    def start_janitor():
+        janitor.ensure_started()
+
+    return janitor
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from quality_flags import quality_issue_messages
 
 class VerificationSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,9 +15,15 @@ class VerificationSession(db.Model):
     estimated_age_range = db.Column(db.String(20))
     estimated_exact_age = db.Column(db.Integer)
     age_verification_passed = db.Column(db.Boolean)
-    image_quality_issues = db.Column(db.Text)  # JSON string of quality issues
+    quality_flags = db.Column(db.SmallInteger, default=0)  # QualityFlag bitmask
+    document_reused = db.Column(db.Boolean, default=False)
+    # Raw model outputs, kept so decisions can be re-scored offline
+    ocr_pattern_index = db.Column(db.Integer)
+    face_distance = db.Column(db.Float)
+    face_threshold = db.Column(db.Float)
+    raw_estimated_age = db.Column(db.Float)
     verification_complete = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -29,7 +36,43 @@ class VerificationSession(db.Model):
             'estimated_age_range': self.estimated_age_range,
             'estimated_exact_age': self.estimated_exact_age,
             'age_verification_passed': self.age_verification_passed,
-            'image_quality_issues': self.image_quality_issues,
+            'image_quality_issues': quality_issue_messages(self.quality_flags or 0),
+            'document_reused': self.document_reused,
             'verification_complete': self.verification_complete,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class DocumentHash(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    doc_hash = db.Column(db.String(16), nullable=False)  # 64-bit dHash as hex
+    # 16-bit bands of doc_hash, indexed for multi-index Hamming lookups
+    band0 = db.Column(db.Integer, nullable=False, index=True)
+    band1 = db.Column(db.Integer, nullable=False, index=True)
+    band2 = db.Column(db.Integer, nullable=False, index=True)
+    band3 = db.Column(db.Integer, nullable=False, index=True)
+    session_id = db.Column(db.String(100))
+    extracted_dob = db.Column(db.String(20))
+    ocr_confidence = db.Column(db.Float)
+    seen_count = db.Column(db.Integer, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class VerificationSessionArchive(db.Model):
+    """Old VerificationSession rows, stored as zlib-compressed JSON"""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(100), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+
+class VerificationRollup(db.Model):
+    """Per-hour and per-day counters of completed sessions (see rollups.py)"""
+    __table_args__ = (db.UniqueConstraint('period', 'bucket_start', 'metric', 'bin'),)
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(8), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    metric = db.Column(db.String(32), nullable=False)
+    bin = db.Column(db.Integer, nullable=False, default=0)  # histogram bin lower edge, 0 for counters
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,190 @@
+"""Database tuning, write-behind updates and archival of old sessions.
+
+Archive sessions older than ARCHIVE_AFTER_DAYS:
+    python persistence.py archive [--days 30] [--batch-size 500]
+"""
+import json
+import time
+import zlib
+import queue
+import atexit
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers no longer block the writer
+    'synchronous': 'NORMAL',  # fsync at checkpoints only; safe with WAL
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,  # ~20MB page cache
+}
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+    # pysqlite's own transaction handling breaks SAVEPOINT; begin transactions ourselves
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(Engine, 'begin')
+def _begin_sqlite_transaction(conn):
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('BEGIN')
+
+
+class WriteBehindQueue:
+    """Apply non-critical updates in the background, many per transaction.
+
+    Callers submit functions that modify db.session; a worker thread runs a
+    batch of them and commits once, so requests don't wait on those writes.
+    Each update runs in its own savepoint, so one that fails is dropped on its
+    own; updates that fail with OperationalError (e.g. "database is locked")
+    are retried up to max_attempts times. The queue is bounded and lives in
+    memory, so only submit writes that can be lost or rebuilt, like rollups.
+    """
+
+    def __init__(self, app, db, interval=0.5, max_batch=200, max_queue=10000, max_attempts=5):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def submit(self, update):
+        self._ensure_started()
+        self._enqueue(update, 0)
+
+    def _enqueue(self, update, attempts):
+        try:
+            self._queue.put_nowait((update, attempts))
+        except queue.Full:
+            self.app.logger.error("Write-behind queue is full, dropping an update")
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Apply everything queued so far"""
+        while not self._queue.empty():
+            self._apply_batch()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._queue.empty():
+                self._apply_batch()
+
+    def _apply_batch(self):
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+
+        with self.app.app_context():
+            applied = []
+            for update, attempts in batch:
+                try:
+                    with self.db.session.begin_nested():
+                        update()
+                except OperationalError as e:
+                    self._retry(update, attempts, e)
+                    continue
+                except Exception as e:
+                    self.app.logger.error(f"Write-behind update failed and was dropped: {str(e)}")
+                    continue
+                applied.append((update, attempts))
+
+            try:
+                self.db.session.commit()
+            except OperationalError as e:
+                self.db.session.rollback()
+                for update, attempts in applied:
+                    self._retry(update, attempts, e)
+            except Exception as e:
+                self.db.session.rollback()
+                self.app.logger.error(f"Write-behind commit of {len(applied)} updates failed: {str(e)}")
+
+    def _retry(self, update, attempts, error):
+        if attempts + 1 < self.max_attempts:
+            self._enqueue(update, attempts + 1)
+        else:
+            self.app.logger.error(f"Write-behind update dropped after {attempts + 1} attempts: {str(error)}")
+
+
+def archive_sessions(db, older_than, batch_size=500):
+    """Move sessions created before older_than into the compressed archive table"""
+    from models import VerificationSession, VerificationSessionArchive
+
+    moved = 0
+    while True:
+        rows = VerificationSession.query.filter(
+            VerificationSession.created_at < older_than
+        ).order_by(VerificationSession.id).limit(batch_size).all()
+        if not rows:
+            return moved
+
+        for row in rows:
+            record = {c.name: getattr(row, c.name) for c in VerificationSession.__table__.columns}
+            payload = zlib.compress(json.dumps(record, default=str).encode(), 9)
+            db.session.add(VerificationSessionArchive(
+                session_id=row.session_id,
+                created_at=row.created_at,
+                payload=payload
+            ))
+            db.session.delete(row)
+        db.session.commit()
+        moved += len(rows)
+
+
+def load_archived_session(session_id):
+    """Return an archived session as a dict, or None"""
+    from models import VerificationSessionArchive
+
+    archived = VerificationSessionArchive.query.filter_by(session_id=session_id).first()
+    if not archived:
+        return None
+    return json.loads(zlib.decompress(archived.payload))
+
+
+def main():
+    from app import app, db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['archive'])
+    parser.add_argument('--days', type=int, default=app.config['ARCHIVE_AFTER_DAYS'])
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(days=args.days)
+        moved = archive_sessions(db, cutoff, batch_size=args.batch_size)
+    print(f"Archived {moved} sessions created before {cutoff.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""On-demand CPU profiling of individual requests.
+
+A request is profiled when it carries a valid X-Profile header or is picked by
+PROFILE_SAMPLE_RATE. The header value is "<unix timestamp>:<hex HMAC-SHA256 of
+the timestamp keyed with PROFILING_SECRET>" and is accepted for five minutes.
+Only the request's own thread is profiled; other requests run untouched.
+From Python 3.12 cProfile hooks the whole process and only one profiler can be
+active, so there cProfile runs for one request at a time and requests picked
+while it is busy go unprofiled.
+"""
+import os
+import sys
+import time
+import hmac
+import random
+import hashlib
+import cProfile
+import threading
+from collections import Counter
+from flask import g, request, session
+
+SIGNATURE_MAX_AGE = 300
+# cProfile uses the process-wide sys.monitoring from 3.12
+CPROFILE_PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class StackSampler:
+    """Periodically sample one thread's stack into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.items():
+                f.write(f"{stack} {count}\n")
+
+
+def is_valid_signature(value, secret):
+    """Check an X-Profile header value against the shared secret"""
+    try:
+        timestamp, signature = value.split(':', 1)
+        if abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(secret.encode(), timestamp.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def init_profiling(app):
+    """Register request hooks that profile selected requests"""
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+
+    def should_profile():
+        header = request.headers.get('X-Profile')
+        secret = app.config['PROFILING_SECRET']
+        if header and secret and is_valid_signature(header, secret):
+            return True
+        rate = app.config['PROFILE_SAMPLE_RATE']
+        return rate > 0 and random.random() < rate
+
+    cprofile_lock = threading.Lock()
+
+    @app.before_request
+    def start_profiling():
+        if not should_profile():
+            return
+        if app.config['PROFILE_FORMAT'] == 'collapsed':
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+            extension = 'collapsed'
+        else:
+            if CPROFILE_PROCESS_WIDE and not cprofile_lock.acquire(blocking=False):
+                return  # another request is being profiled
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Some other profiling tool is already active
+                if CPROFILE_PROCESS_WIDE:
+                    cprofile_lock.release()
+                return
+            extension = 'pstats'
+        g.profiler = profiler
+        g.profile_started = time.time()
+        session_id = session.get('verification_session_id', 'nosession')
+        g.profile_file = f"{session_id}_{request.endpoint}_{int(g.profile_started * 1000)}.{extension}"
+
+    @app.after_request
+    def add_profile_header(response):
+        if 'profile_file' in g:
+            response.headers['X-Profile-File'] = g.profile_file
+        return response
+
+    # Teardown runs even when the view raises, and after a streamed body is sent
+    @app.teardown_request
+    def stop_profiling(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+
+        path = os.path.join(app.config['PROFILE_DIR'], g.profile_file)
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            profiler.write(path)
+        else:
+            profiler.disable()
+            if CPROFILE_PROCESS_WIDE:
+                cprofile_lock.release()
+            profiler.dump_stats(path)
+
+        app.logger.info(f"Profiled {request.path} in {time.time() - g.profile_started:.3f}s -> {path}")
@@ -0,0 +1,39 @@
+"""Selfie quality problems as a bitmask, and the messages shown for them.
+
+Kept apart from verification_service so models.py can use them without
+importing the image and face pipeline.
+"""
+import enum
+
+
+class QualityFlag(enum.IntFlag):
+    """Image quality problems, stored as a bitmask"""
+    BLURRY = 1
+    TOO_DARK = 2
+    OVEREXPOSED = 4
+    NO_FACE = 8
+    FACE_TOO_SMALL = 16
+    UNREADABLE = 32  # the file could not be decoded as an image
+
+QUALITY_MESSAGES = {
+    QualityFlag.BLURRY: "Image appears to be blurry",
+    QualityFlag.TOO_DARK: "Image is too dark or has poor lighting",
+    QualityFlag.OVEREXPOSED: "Image is overexposed - avoid direct light behind or on your face",
+    QualityFlag.NO_FACE: "No face found - look straight at the camera",
+    QualityFlag.FACE_TOO_SMALL: "Face is too small - move closer to the camera",
+    QualityFlag.UNREADABLE: "Cannot read image - upload a JPEG or PNG photo",
+}
+
+
+def quality_issue_messages(flags):
+    """Human-readable issues for a quality bitmask"""
+    return [message for flag, message in QUALITY_MESSAGES.items() if flags & flag]
+
+
+def quality_flags_from_messages(messages):
+    """Bitmask for a list of issue messages; unknown messages are ignored"""
+    flags = QualityFlag(0)
+    for flag, message in QUALITY_MESSAGES.items():
+        if message in messages:
+            flags |= flag
+    return flags
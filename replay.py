@@ -0,0 +1,185 @@
+"""Replay captured upload traffic against a build and diff stage latencies.
+
+    python replay.py http://localhost:5000 captures/capture-*.jsonl [--speed 2] [--fail-threshold 0.2]
+
+Requests keep their captured arrival offsets, divided by --speed, and each
+captured session is replayed in order with its own cookie jar. Uploads whose
+image bytes were not captured (CAPTURE_IMAGES) are skipped. The target should
+run with SERVER_TIMING=true so per-stage timings can be compared with the
+baseline recorded in the capture. Exits non-zero if any stage's p90 regressed
+by more than --fail-threshold.
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'BMP': 'bmp'}
+
+
+def load_trace(paths):
+    """Captured records from all files, in arrival order"""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda r: r['ts'])
+
+
+def encode_multipart(files, blob_dir):
+    boundary = uuid.uuid4().hex
+    body = []
+    for info in files:
+        with open(os.path.join(blob_dir, info['blob']), 'rb') as f:
+            data = f.read()
+        filename = f"{info['field']}.{FORMAT_EXTENSIONS.get(info['format'], 'jpg')}"
+        body.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{info["field"]}"; filename="{filename}"\r\n'
+            f'Content-Type: {info.get("content_type") or "application/octet-stream"}\r\n\r\n'.encode()
+        )
+        body.append(data)
+        body.append(b'\r\n')
+    body.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(body), f'multipart/form-data; boundary={boundary}'
+
+
+def parse_server_timing(header):
+    timings = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                timings[name] = float(value)
+    return timings
+
+
+class Replayer:
+    def __init__(self, target, blob_dir, speed=1.0, timeout=300):
+        self.target = target.rstrip('/')
+        self.blob_dir = blob_dir
+        self.speed = speed
+        self.timeout = timeout
+        self.results = []
+        self._lock = threading.Lock()
+
+    def run(self, records, concurrency):
+        if not records:
+            return
+        sessions = defaultdict(list)
+        for i, record in enumerate(records):
+            # Requests made before a session existed are replayed on their own
+            sessions[record['session'] or f'anonymous-{i}'].append(record)
+
+        self.t0 = records[0]['ts']
+        self.started = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for session_records in sessions.values():
+                pool.submit(self._replay_session, session_records)
+
+    def _replay_session(self, records):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        for record in records:
+            delay = self.started + (record['ts'] - self.t0) / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._send(opener, record)
+
+    def _send(self, opener, record):
+        body, content_type = None, None
+        if record['files']:
+            body, content_type = encode_multipart(record['files'], self.blob_dir)
+        req = urllib.request.Request(self.target + record['path'], data=body, method=record['method'])
+        if content_type:
+            req.add_header('Content-Type', content_type)
+
+        try:
+            with opener.open(req, timeout=self.timeout) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            status, headers = e.code, e.headers
+        except OSError as e:
+            status, headers = None, {}
+            print(f"{record['path']} failed: {e}")
+        stages = parse_server_timing(headers.get('Server-Timing'))
+
+        with self._lock:
+            self.results.append({
+                'endpoint': record['endpoint'],
+                'status': status,
+                # Server-side like the captured total; the client's clock would add the upload transfer
+                'total_ms': stages.pop('total', None),
+                'stages': stages
+            })
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_samples(records):
+    """{(endpoint, stage): [ms, ...]} including the whole request as 'total'"""
+    samples = defaultdict(list)
+    for record in records:
+        if record.get('total_ms') is not None:
+            samples[(record['endpoint'], 'total')].append(record['total_ms'])
+        for name, duration in record['stages'].items():
+            samples[(record['endpoint'], name)].append(duration)
+    return samples
+
+
+def diff_latencies(baseline, replayed, fail_threshold):
+    """Print p50/p90/p99 per stage and return the keys whose p90 regressed"""
+    regressions = []
+    print(f"{'endpoint':<20} {'stage':<15} {'n':>5} {'p50 base':>9} {'p50 new':>9} {'p90 base':>9} {'p90 new':>9} {'p99 new':>9} {'p90 delta':>9}")
+    for key in sorted(set(baseline) | set(replayed)):
+        base, new = baseline.get(key), replayed.get(key)
+        if not base or not new:
+            print(f"{key[0]:<20} {key[1]:<15} missing in {'replay' if base else 'baseline'}")
+            continue
+        delta = percentile(new, 0.9) / max(percentile(base, 0.9), 1e-6) - 1
+        if delta > fail_threshold:
+            regressions.append(key)
+        print(f"{key[0]:<20} {key[1]:<15} {len(new):>5} "
+              f"{percentile(base, 0.5):>9.1f} {percentile(new, 0.5):>9.1f} "
+              f"{percentile(base, 0.9):>9.1f} {percentile(new, 0.9):>9.1f} "
+              f"{percentile(new, 0.99):>9.1f} {delta:>+9.1%}{'  REGRESSION' if delta > fail_threshold else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('target', help='Base URL of the build under test')
+    parser.add_argument('captures', nargs='+', help='capture-*.jsonl files')
+    parser.add_argument('--blob-dir', help='Captured image bytes (default: blobs/ next to the first capture)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier')
+    parser.add_argument('--concurrency', type=int, default=16, help='Sessions replayed at once')
+    parser.add_argument('--fail-threshold', type=float, default=0.2, help='Allowed relative p90 increase')
+    args = parser.parse_args()
+
+    records = load_trace(args.captures)
+    replayable = [r for r in records if all('blob' in f for f in r['files'])]
+    blob_dir = args.blob_dir or os.path.join(os.path.dirname(args.captures[0]), 'blobs')
+    replayer = Replayer(args.target, blob_dir, speed=args.speed)
+
+    started = time.time()
+    replayer.run(replayable, args.concurrency)
+    print(f"Replayed {len(replayer.results)} requests in {time.time() - started:.1f}s, "
+          f"skipped {len(records) - len(replayable)} without captured images")
+
+    baseline = latency_samples(replayable)
+    regressions = diff_latencies(baseline, latency_samples(replayer.results), args.fail_threshold)
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Replay verification decisions with new thresholds using stored model outputs.
+
+Usage:
+    python rescore.py --age-tolerance 8 --face-threshold 0.6 --age-adjustment 4
+"""
+import argparse
+import numpy as np
+from app import app, db
+from models import VerificationSession
+import thresholds
+
+COLUMNS = [
+    'face_match_verified',
+    'age_verification_passed',
+    'face_distance',
+    'face_threshold',
+    'raw_estimated_age',
+    'extracted_age',
+    'ocr_pattern_index',
+    'document_reused',
+]
+
+
+def load_artifacts():
+    """Load the stored decisions and raw outputs of completed sessions as arrays"""
+    rows = db.session.query(
+        *[getattr(VerificationSession, c) for c in COLUMNS]
+    ).filter(VerificationSession.verification_complete.is_(True)).all()
+
+    arrays = {}
+    for i, column in enumerate(COLUMNS):
+        values = [row[i] for row in rows]
+        arrays[column] = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    return arrays
+
+
+def rescore(arrays, face_threshold=None, age_tolerance=10, age_adjustment=6,
+            age_range_margin=5, min_estimated_age=18, max_ocr_pattern=None):
+    """Recompute face and age decisions for every session in one vectorized pass"""
+    distance = arrays['face_distance']
+    threshold = arrays['face_threshold'] if face_threshold is None else np.full_like(distance, face_threshold)
+    stored_face = arrays['face_match_verified'] == 1
+
+    # Sessions without a stored distance (mock results, older rows) keep their decision
+    has_distance = ~np.isnan(distance) & ~np.isnan(threshold)
+    face = np.where(has_distance, distance <= threshold, stored_face)
+
+    raw_age = arrays['raw_estimated_age']
+    claimed = arrays['extracted_age']
+    adjusted = np.maximum(min_estimated_age, np.floor(raw_age) - age_adjustment)
+    lower = np.maximum(min_estimated_age, adjusted - age_range_margin) - age_tolerance
+    upper = adjusted + age_range_margin + age_tolerance
+    with np.errstate(invalid='ignore'):
+        in_range = (lower <= claimed) & (claimed <= upper)
+
+    # Age is only estimated for face matches, so newly matched faces can't be scored
+    has_age = ~np.isnan(raw_age) & ~np.isnan(claimed)
+    age = face & np.where(has_age, in_range, arrays['age_verification_passed'] == 1)
+    # Reused documents took their DOB from the earlier upload and have no
+    # pattern of their own, so the pattern limit doesn't apply to them
+    reused = arrays['document_reused'] == 1
+    if max_ocr_pattern is not None:
+        pattern = arrays['ocr_pattern_index']
+        age &= reused | (~np.isnan(pattern) & (pattern <= max_ocr_pattern))
+
+    return {
+        'face_match_verified': face,
+        'age_verification_passed': age,
+        'unscored_age': face & ~has_age,
+        'reused_unpatterned': reused if max_ocr_pattern is not None else np.zeros_like(reused),
+    }
+
+
+def summarize(arrays, rescored):
+    """Print how decisions shift compared to the stored ones"""
+    total = len(arrays['face_distance'])
+    print(f"Sessions: {total}")
+    if not total:
+        return
+
+    for field in ('face_match_verified', 'age_verification_passed'):
+        old = arrays[field] == 1
+        new = rescored[field]
+        print(f"\n{field}")
+        print(f"  pass rate: {old.mean() * 100:.2f}% -> {new.mean() * 100:.2f}%")
+        print(f"  pass -> fail: {np.count_nonzero(old & ~new)}")
+        print(f"  fail -> pass: {np.count_nonzero(~old & new)}")
+
+    unscored = np.count_nonzero(rescored['unscored_age'])
+    if unscored:
+        print(f"\n{unscored} sessions now match faces but have no stored age estimate")
+
+    reused = np.count_nonzero(rescored['reused_unpatterned'])
+    if reused:
+        print(f"\n{reused} sessions reused an earlier document and were not checked against --max-ocr-pattern")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--face-threshold', type=float, default=thresholds.FACE_DISTANCE_THRESHOLD,
+                        help="Face distance threshold (default: each row's stored threshold)")
+    parser.add_argument('--age-tolerance', type=int, default=thresholds.AGE_TOLERANCE)
+    parser.add_argument('--age-adjustment', type=int, default=thresholds.AGE_ADJUSTMENT)
+    parser.add_argument('--age-range-margin', type=int, default=thresholds.AGE_RANGE_MARGIN)
+    parser.add_argument('--min-estimated-age', type=int, default=thresholds.MIN_ESTIMATED_AGE)
+    parser.add_argument('--max-ocr-pattern', type=int, default=None,
+                        help='Fail age verification when the DOB came from a lower-priority OCR pattern')
+    args = parser.parse_args()
+
+    with app.app_context():
+        arrays = load_artifacts()
+
+    rescored = rescore(
+        arrays,
+        face_threshold=args.face_threshold,
+        age_tolerance=args.age_tolerance,
+        age_adjustment=args.age_adjustment,
+        age_range_margin=args.age_range_margin,
+        min_estimated_age=args.min_estimated_age,
+        max_ocr_pattern=args.max_ocr_pattern
+    )
+    summarize(arrays, rescored)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Hourly and daily rollups of completed verification sessions.
+
+Each completed session adds one to a set of (metric, bin) counters in the hour
+and day it was created in, so reports never scan VerificationSession.
+
+Rebuild the rollups from the sessions table and the archive (e.g. after
+deploying); rows written by bulk_verify.py are not live traffic and are
+skipped:
+    python rollups.py rebuild [--days 30]
+"""
+import json
+import zlib
+import argparse
+import itertools
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from bulk_verify import BULK_SESSION_PREFIX
+
+PERIODS = ('hour', 'day')
+
+# Confidence histograms use 10-point bins labelled by their lower edge (0..100)
+CONFIDENCE_BIN_WIDTH = 10
+# Estimated minus document age, in 2-year bins clamped to +/- AGE_GAP_LIMIT
+AGE_GAP_BIN_WIDTH = 2
+AGE_GAP_LIMIT = 20
+
+COUNTERS = ('sessions', 'verified', 'face_matched', 'age_passed', 'age_mismatch', 'document_reused')
+HISTOGRAMS = ('face_confidence', 'ocr_confidence', 'age_gap', 'quality_flag')
+
+UPSERT_BATCH = 500
+
+
+def bucket_start(moment, period):
+    """Start of the hour or day that moment falls in"""
+    if period == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _confidence_bin(value):
+    return max(0, min(100, int(value) // CONFIDENCE_BIN_WIDTH * CONFIDENCE_BIN_WIDTH))
+
+
+def session_increments(values):
+    """(metric, bin) counters a completed session contributes to"""
+    face_matched = bool(values.get('face_match_verified'))
+    age_passed = bool(values.get('age_verification_passed'))
+
+    increments = [('sessions', 0)]
+    if face_matched and age_passed:
+        increments.append(('verified', 0))
+    if face_matched:
+        increments.append(('face_matched', 0))
+    if age_passed:
+        increments.append(('age_passed', 0))
+    elif face_matched and values.get('estimated_age_range') and values.get('extracted_age'):
+        increments.append(('age_mismatch', 0))
+    if values.get('document_reused'):
+        increments.append(('document_reused', 0))
+
+    if values.get('face_match_confidence') is not None:
+        increments.append(('face_confidence', _confidence_bin(values['face_match_confidence'])))
+    if values.get('ocr_confidence') is not None:
+        increments.append(('ocr_confidence', _confidence_bin(values['ocr_confidence'])))
+    if values.get('estimated_exact_age') is not None and values.get('extracted_age') is not None:
+        gap = values['estimated_exact_age'] - values['extracted_age']
+        gap = max(-AGE_GAP_LIMIT, min(AGE_GAP_LIMIT, gap))
+        increments.append(('age_gap', gap // AGE_GAP_BIN_WIDTH * AGE_GAP_BIN_WIDTH))
+
+    flags = values.get('quality_flags') or 0
+    bit = 1
+    while bit <= flags:
+        if flags & bit:
+            increments.append(('quality_flag', bit))
+        bit <<= 1
+    return increments
+
+
+def record_sessions(db, sessions):
+    """Add sessions, given as dicts of column values, to the rollups; the caller commits"""
+    from models import VerificationRollup
+
+    counts = defaultdict(int)
+    for values in sessions:
+        created_at = values.get('created_at') or datetime.utcnow()
+        for metric, bin_ in session_increments(values):
+            for period in PERIODS:
+                counts[(period, bucket_start(created_at, period), metric, bin_)] += 1
+
+    rows = [
+        {'period': period, 'bucket_start': start, 'metric': metric, 'bin': bin_, 'count': count}
+        for (period, start, metric, bin_), count in counts.items()
+    ]
+    # Counters are bumped in SQL so concurrent workers never lose an update
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    for i in range(0, len(rows), UPSERT_BATCH):
+        stmt = dialect.insert(VerificationRollup).values(rows[i:i + UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['period', 'bucket_start', 'metric', 'bin'],
+            set_={'count': VerificationRollup.count + stmt.excluded['count']}
+        )
+        db.session.execute(stmt)
+
+
+def record_session(db, values):
+    record_sessions(db, [values])
+
+
+def rollup_report(period, start, end):
+    """Counters, rates and histograms for every bucket in [start, end)"""
+    from models import VerificationRollup
+
+    rows = VerificationRollup.query.filter(
+        VerificationRollup.period == period,
+        VerificationRollup.bucket_start >= start,
+        VerificationRollup.bucket_start < end
+    ).order_by(VerificationRollup.bucket_start).all()
+
+    buckets = {}
+    for row in rows:
+        bucket = buckets.setdefault(row.bucket_start, {
+            'bucket_start': row.bucket_start.isoformat(),
+            **{name: 0 for name in COUNTERS},
+            **{name: {} for name in HISTOGRAMS}
+        })
+        if row.metric in HISTOGRAMS:
+            bucket[row.metric][row.bin] = row.count
+        else:
+            bucket[row.metric] = row.count
+
+    for bucket in buckets.values():
+        sessions = bucket['sessions'] or 1
+        bucket['pass_rate'] = round(bucket['verified'] / sessions, 4)
+        bucket['age_mismatch_rate'] = round(bucket['age_mismatch'] / sessions, 4)
+    return list(buckets.values())
+
+
+def _archived_sessions(since):
+    """Completed sessions created since a cutoff that the archiver has moved out"""
+    from models import VerificationSessionArchive
+
+    archived = VerificationSessionArchive.query.filter(
+        VerificationSessionArchive.created_at >= since,
+        ~VerificationSessionArchive.session_id.startswith(BULK_SESSION_PREFIX)
+    ).yield_per(1000)
+    for row in archived:
+        values = json.loads(zlib.decompress(row.payload))
+        if values.get('verification_complete'):
+            values['created_at'] = row.created_at  # the payload holds it as a string
+            yield values
+
+
+def rebuild(db, since):
+    """Recompute rollups for sessions created since a cutoff, archived ones included"""
+    from models import VerificationSession, VerificationRollup
+
+    first_day = bucket_start(since, 'day')
+    VerificationRollup.query.filter(VerificationRollup.bucket_start >= first_day).delete()
+    completed = VerificationSession.query.filter(
+        VerificationSession.verification_complete.is_(True),
+        VerificationSession.created_at >= first_day,
+        ~VerificationSession.session_id.startswith(BULK_SESSION_PREFIX)
+    ).yield_per(1000)
+    columns = [c.name for c in VerificationSession.__table__.columns]
+    live = ({name: getattr(s, name) for name in columns} for s in completed)
+    record_sessions(db, itertools.chain(live, _archived_sessions(first_day)))
+    db.session.commit()
+
+
+def main():
+    from app import app, db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    with app.app_context():
+        since = datetime.utcnow() - timedelta(days=args.days)
+        rebuild(db, since)
+    print(f"Rebuilt rollups since {bucket_start(since, 'day').isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,42 @@
-import os
 import uuid
-import json
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from flask import render_template, request, jsonify, current_app, session
-from werkzeug.utils import secure_filename
-from app import app, db
-from models import VerificationSession
+from app import app, db, write_behind
+from models import VerificationSession, DocumentHash
 from verification_service import VerificationService
+from document_hash import DocumentHashIndex, compute_dhash
+from image_store import ImageStore, split_pages, upload_extension
+from aadhar_verification.backend.utils.image_header import read_image_header, check_image_header
+from rollups import PERIODS, bucket_start, record_session, rollup_report
+from capture import stage
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+document_hash_index = DocumentHashIndex(max_distance=6)
+image_store = ImageStore(
+    app.config['UPLOAD_FOLDER'],
+    max_dimension=app.config['IMAGE_MAX_DIMENSION'],
+    keep_originals=app.config['KEEP_ORIGINAL_UPLOADS'],
+    max_pixels=app.config['UPLOAD_MAX_PIXELS']
+)
+
+# Shared by all requests so concurrent OCR stays bounded per worker
+ocr_executor = ThreadPoolExecutor(max_workers=app.config['OCR_WORKERS'], thread_name_prefix='ocr')
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return upload_extension(filename) is not None
+
+def upload_header_error(file):
+    """Sniff the upload's image header and return an error message, or None if it may be read"""
+    try:
+        check_image_header(
+            read_image_header(file.stream),
+            extension=file.filename.rsplit('.', 1)[1] if '.' in file.filename else None,
+            max_dimension=app.config['UPLOAD_MAX_DIMENSION'],
+            max_pixels=app.config['UPLOAD_MAX_PIXELS']
+        )
+    except ValueError as e:
+        return str(e)
+    return None
 
 @app.route('/')
 def index():
@@ -38,18 +64,33 @@ def upload_aadhar():
     if 'aadhar_image' not in request.files:
         return jsonify({'success': False, 'error': 'No file uploaded'})
     
-    file = request.files['aadhar_image']
-    if file.filename == '':
+    # Front, back, or a multi-page GIF; every image is validated before any is read
+    files = [f for f in request.files.getlist('aadhar_image') if f.filename != '']
+    if not files:
         return jsonify({'success': False, 'error': 'No file selected'})
     
-    if not allowed_file(file.filename):
-        return jsonify({'success': False, 'error': 'Invalid file type. Please upload an image.'})
+    if len(files) > app.config['MAX_AADHAR_IMAGES']:
+        return jsonify({'success': False, 'error': f"Upload at most {app.config['MAX_AADHAR_IMAGES']} images"})
+    
+    for file in files:
+        if not allowed_file(file.filename):
+            return jsonify({'success': False, 'error': 'Invalid file type. Please upload an image.'})
+        
+        header_error = upload_header_error(file)
+        if header_error:
+            return jsonify({'success': False, 'error': header_error})
     
     try:
-        # Save uploaded file
-        filename = secure_filename(f"aadhar_{session['verification_session_id']}.{file.filename.rsplit('.', 1)[1].lower()}")
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Save uploaded images, one per page
+        with stage('save'):
+            pages = []
+            for file in files:
+                pages.extend(split_pages(file.read(), upload_extension(file.filename), app.config['MAX_AADHAR_IMAGES']))
+            base_name = f"aadhar_{session['verification_session_id']}"
+            paths = [
+                image_store.save_bytes(data, ext, base_name if i == 0 else f"{base_name}_{i}")
+                for i, (data, ext) in enumerate(pages[:app.config['MAX_AADHAR_IMAGES']])
+            ]
         
         # Get verification session
         verification_session = VerificationSession.query.filter_by(
@@ -59,13 +100,49 @@ def upload_aadhar():
         if not verification_session:
             return jsonify({'success': False, 'error': 'Invalid session'})
         
-        # Extract DOB using OCR
         verification_service = VerificationService()
-        dob, confidence = verification_service.extract_dob(filepath)
+        
+        # Look for a near-duplicate of any page before paying for OCR
+        with stage('document_hash'):
+            hashes = [compute_dhash(path) for path in paths]
+            previous = None
+            for doc_hash in hashes:
+                previous = document_hash_index.lookup(doc_hash) if doc_hash is not None else None
+                if previous:
+                    break
+        
+        dob_index = None
+        if previous:
+            current_app.logger.warning(
+                f"Aadhar image for session {verification_session.session_id} "
+                f"matches document from session {previous.session_id}"
+            )
+            # Fraud signals are committed with the session, not written behind
+            DocumentHash.query.filter_by(id=previous.id).update({DocumentHash.seen_count: DocumentHash.seen_count + 1})
+            dob, confidence = previous.extracted_dob, previous.ocr_confidence
+        else:
+            # Extract DOB from all pages at once; the first valid hit wins
+            with stage('extract_dob'):
+                dob_index, ocr_result = verification_service.extract_dob_first(paths, ocr_executor)
+            dob, confidence = ocr_result['dob'], ocr_result['confidence']
         
         if not dob:
+            db.session.commit()  # keep a reused document's seen_count
             return jsonify({'success': False, 'error': 'Could not extract date of birth from the document'})
         
+        if not previous:
+            # Index every page, so a later upload of any one of them is caught;
+            # committed below with the session, so the next upload already sees them
+            for doc_hash in dict.fromkeys(h for h in hashes if h is not None):
+                document_hash_index.add(doc_hash, verification_session.session_id, dob, confidence)
+        
+        # The photo may be on a different page than the DOB
+        with stage('face_reference'):
+            face_index = verification_service.find_face_reference(paths) if len(paths) > 1 else 0
+        if face_index is None:
+            face_index = dob_index or 0
+        filepath = paths[face_index]
+        
         age = verification_service.calculate_age(dob)
         
         # Update verification session
@@ -73,13 +150,19 @@ def upload_aadhar():
         verification_session.extracted_dob = dob
         verification_session.extracted_age = age
         verification_session.ocr_confidence = confidence
+        verification_session.document_reused = previous is not None
+        verification_session.ocr_pattern_index = None if previous else ocr_result['pattern_index']
         db.session.commit()
         
         return jsonify({
             'success': True,
             'dob': dob,
             'age': age,
-            'confidence': confidence
+            'confidence': confidence,
+            'document_reused': previous is not None,
+            'images_processed': len(paths),
+            'dob_image_index': dob_index,
+            'face_image_index': face_index
         })
         
     except Exception as e:
@@ -99,11 +182,17 @@ def upload_selfie():
     if file.filename == '':
         return jsonify({'success': False, 'error': 'No file selected'})
     
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file type. Please upload an image.'})
+    
+    header_error = upload_header_error(file)
+    if header_error:
+        return jsonify({'success': False, 'error': header_error})
+    
     try:
         # Save uploaded selfie
-        filename = secure_filename(f"selfie_{session['verification_session_id']}.{file.filename.rsplit('.', 1)[1].lower()}")
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with stage('save'):
+            filepath = image_store.save(file, f"selfie_{session['verification_session_id']}")
         
         # Get verification session
         verification_session = VerificationSession.query.filter_by(
@@ -115,20 +204,40 @@ def upload_selfie():
         
         verification_service = VerificationService()
         
-        # Check image quality
-        quality_issues = verification_service.check_image_quality(filepath)
+        # Reject unusable selfies before any model runs
+        with stage('quality_gate'):
+            quality = verification_service.quality_gate(filepath)
+        quality_flags, quality_issues = quality['flags'], quality['issues']
+        
+        if not quality['passed']:
+            verification_session.selfie_path = filepath
+            verification_session.quality_flags = int(quality_flags)
+            db.session.commit()
+            return jsonify({
+                'success': False,
+                'error': 'Selfie is not usable, please retake it',
+                'quality_issues': quality_issues,
+                'retake': True
+            })
         
         # Perform face verification
-        face_matched, face_confidence = verification_service.verify_face_match(
-            verification_session.aadhar_path, filepath
-        )
+        with stage('face_match'):
+            face_result = verification_service.face_match_details(
+                verification_session.aadhar_path, filepath
+            )
+        face_matched, face_confidence = face_result['verified'], face_result['confidence']
         
         # Estimate age from selfie
-        age_range, exact_age = None, None
+        age_range, exact_age, raw_age, age_confidence = None, None, None, None
         age_verification_passed = False
         
         if face_matched:
-            age_range, exact_age = verification_service.estimate_visual_age_range(filepath)
+            with stage('age_estimate'):
+                age_result = verification_service.age_estimate_details(
+                    filepath, claimed_age=verification_session.extracted_age
+                )
+            age_range, exact_age, raw_age = age_result['age_range'], age_result['exact_age'], age_result['raw_age']
+            age_confidence = age_result['age_confidence']
             if age_range and verification_session.extracted_age:
                 age_verification_passed = verification_service.compare_ages(
                     verification_session.extracted_age, age_range
@@ -141,16 +250,23 @@ def upload_selfie():
         verification_session.estimated_age_range = age_range
         verification_session.estimated_exact_age = exact_age
         verification_session.age_verification_passed = age_verification_passed
-        verification_session.image_quality_issues = json.dumps(quality_issues)
+        verification_session.face_distance = face_result['distance']
+        verification_session.face_threshold = face_result['threshold']
+        verification_session.raw_estimated_age = raw_age
+        verification_session.quality_flags = int(quality_flags)
         verification_session.verification_complete = True
         db.session.commit()
         
+        rollup_values = {c.name: getattr(verification_session, c.name) for c in VerificationSession.__table__.columns}
+        write_behind.submit(lambda: record_session(db, rollup_values))
+        
         return jsonify({
             'success': True,
             'face_matched': face_matched,
             'face_confidence': face_confidence,
             'estimated_age_range': age_range,
             'estimated_exact_age': exact_age,
+            'age_confidence': age_confidence,
             'age_verification_passed': age_verification_passed,
             'quality_issues': quality_issues,
             'verification_complete': True
@@ -177,3 +293,23 @@ def verification_status():
         'success': True,
         'session': verification_session.to_dict()
     })
+
+@app.route('/reports/rollups')
+def rollup_reports():
+    """Read-only verification analytics served from the hourly/daily rollups"""
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        return jsonify({'success': False, 'error': f"period must be one of: {', '.join(PERIODS)}"})
+    
+    try:
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        default_span = timedelta(days=30) if period == 'day' else timedelta(hours=48)
+        start = datetime.fromisoformat(request.args['start']) if 'start' in request.args else end - default_span
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be ISO 8601 dates'})
+    
+    return jsonify({
+        'success': True,
+        'period': period,
+        'buckets': rollup_report(period, bucket_start(start, period), end)
+    })
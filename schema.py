@@ -0,0 +1,89 @@
+"""Bring an existing database up to date with the models.
+
+db.create_all() only creates missing tables. Columns added to a model after
+its table exists are listed in ADDED_COLUMNS and added here with ALTER TABLE,
+then filled for existing rows; indexes added later are in ADDED_INDEXES.
+Every step checks the live schema first, so upgrade_schema() is safe to run
+at each startup.
+"""
+import json
+import logging
+from sqlalchemy import bindparam, inspect, text
+from models import VerificationSession
+from quality_flags import quality_flags_from_messages
+
+logger = logging.getLogger(__name__)
+
+# (model, column) pairs added after the model's table was first shipped
+ADDED_COLUMNS = [
+    (VerificationSession, 'document_reused'),
+    (VerificationSession, 'ocr_pattern_index'),
+    (VerificationSession, 'face_distance'),
+    (VerificationSession, 'face_threshold'),
+    (VerificationSession, 'raw_estimated_age'),
+    (VerificationSession, 'quality_flags'),
+]
+
+# (model, indexed column) pairs whose index was added later
+ADDED_INDEXES = [
+    (VerificationSession, 'created_at'),
+]
+
+
+def _backfill_default(conn, table, column):
+    """Give existing rows the column's Python-side default, if it has one"""
+    if column.default is not None and column.default.is_scalar:
+        conn.execute(table.update().where(column.is_(None)).values({column.name: column.default.arg}))
+
+
+def _backfill_quality_flags(conn, table, column):
+    """Convert the JSON issue messages of the replaced image_quality_issues column"""
+    if 'image_quality_issues' in {c['name'] for c in inspect(conn).get_columns(table.name)}:
+        rows = conn.execute(text(
+            f'SELECT id, image_quality_issues FROM {table.name} WHERE image_quality_issues IS NOT NULL'
+        )).all()
+        updates = []
+        for row_id, issues in rows:
+            try:
+                messages = json.loads(issues)
+            except ValueError:
+                continue
+            updates.append({'row_id': row_id, 'flags': int(quality_flags_from_messages(messages or []))})
+        if updates:
+            conn.execute(
+                table.update().where(table.c.id == bindparam('row_id')).values(quality_flags=bindparam('flags')),
+                updates
+            )
+    _backfill_default(conn, table, column)
+
+
+# Column name -> function(conn, table, column) filling it for existing rows
+BACKFILLS = {
+    'quality_flags': _backfill_quality_flags,
+}
+
+
+def upgrade_schema(db):
+    inspector = inspect(db.engine)
+    for model, name in ADDED_COLUMNS:
+        table = model.__table__
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        if name in existing:
+            continue
+
+        column = table.c[name]
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        with db.engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}'))
+            BACKFILLS.get(name, _backfill_default)(conn, table, column)
+        logger.info(f"Added column {table.name}.{name}")
+
+    for model, name in ADDED_INDEXES:
+        table = model.__table__
+        indexed = {tuple(i['column_names']) for i in inspector.get_indexes(table.name)}
+        if (name,) in indexed:
+            continue
+        for index in table.indexes:
+            if [c.name for c in index.columns] == [name]:
+                index.create(db.engine)
+                logger.info(f"Created index {index.name}")
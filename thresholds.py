@@ -0,0 +1,16 @@
+"""Decision thresholds shared by VerificationService and the offline tools.
+
+Nothing here imports the models, so rescore.py can read the defaults
+without loading TensorFlow.
+"""
+from aadhar_verification.backend.utils.eligibility import MIN_VERIFICATION_AGE
+
+AGE_TOLERANCE = 10
+FACE_DISTANCE_THRESHOLD = None  # None keeps DeepFace's model default
+AGE_ADJUSTMENT = 6  # years subtracted for poor camera quality (middle of 5-7)
+AGE_RANGE_MARGIN = 5
+MIN_ESTIMATED_AGE = 18
+# Extra age passes are spent only within AGE_REFINE_MARGIN years of the legal
+# age, which is the boundary AgeService.is_eligible_for_verification applies
+MIN_LEGAL_AGE = MIN_VERIFICATION_AGE
+AGE_REFINE_MARGIN = 4
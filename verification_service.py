@@ -4,31 +4,73 @@ import re
 import json
 import numpy as np
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
 import pytesseract
+import thresholds
+from quality_flags import QualityFlag, quality_issue_messages
+from image_store import load_image
 
-# Import DeepFace with error handling for TensorFlow issues
-try:
-    import warnings
-    warnings.filterwarnings('ignore', category=FutureWarning)
-    warnings.filterwarnings('ignore', category=UserWarning)
-    
-    # Set TensorFlow logging to reduce noise
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-    
-    from deepface import DeepFace
-    DEEPFACE_AVAILABLE = True
-except Exception as e:
-    print(f"Warning: DeepFace not available - {e}")
-    print("Face verification will be disabled")
-    DEEPFACE_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+# DeepFace (and TensorFlow) is imported on first use, see load_deepface()
+DEEPFACE_AVAILABLE = None
+_deepface = None
+
+def load_deepface():
+    """Import DeepFace once, or return None if it can't be loaded.
+    
+    Deferred so that tools which only read the database, and parents that
+    fork workers, never initialize TensorFlow.
+    """
+    global DEEPFACE_AVAILABLE, _deepface
+    if DEEPFACE_AVAILABLE is None:
+        try:
+            import warnings
+            warnings.filterwarnings('ignore', category=FutureWarning)
+            warnings.filterwarnings('ignore', category=UserWarning)
+            
+            # Set TensorFlow logging to reduce noise
+            os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+            
+            from deepface import DeepFace
+            _deepface = DeepFace
+            DEEPFACE_AVAILABLE = True
+        except Exception as e:
+            logger.warning(f"DeepFace not available - {e}. Face verification will be disabled")
+            DEEPFACE_AVAILABLE = False
+    return _deepface
+
+_face_cascade = None
+
+def get_face_cascade():
+    """Load the Haar face cascade once per process"""
+    global _face_cascade
+    if _face_cascade is None:
+        _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _face_cascade
 
 class VerificationService:
     def __init__(self):
         # Configuration
-        self.AGE_TOLERANCE = 10
+        self.AGE_TOLERANCE = thresholds.AGE_TOLERANCE
         self.OCR_LANGS = 'eng+hin'
         self.BLUR_THRESHOLD = 100
         self.BRIGHTNESS_THRESHOLD = 50
+        self.OVEREXPOSURE_FRACTION = 0.25  # share of near-white pixels
+        self.MIN_FACE_SIZE = 50  # pixels at full resolution
+        self.QUALITY_MAX_DIMENSION = 640  # quality gate works on a pyramid level this small
+        # Selfies with any of these issues are rejected before the face models run
+        self.QUALITY_GATE_REJECT = (QualityFlag.BLURRY | QualityFlag.TOO_DARK | QualityFlag.OVEREXPOSED
+                                    | QualityFlag.NO_FACE | QualityFlag.FACE_TOO_SMALL | QualityFlag.UNREADABLE)
+        self.FACE_DISTANCE_THRESHOLD = thresholds.FACE_DISTANCE_THRESHOLD
+        self.AGE_ADJUSTMENT = thresholds.AGE_ADJUSTMENT
+        self.AGE_RANGE_MARGIN = thresholds.AGE_RANGE_MARGIN
+        self.MIN_ESTIMATED_AGE = thresholds.MIN_ESTIMATED_AGE
+        self.MIN_LEGAL_AGE = thresholds.MIN_LEGAL_AGE
+        self.AGE_REFINE_MARGIN = thresholds.AGE_REFINE_MARGIN
+        self.AGE_TTA_PADDINGS = (0.0, 0.2)  # face crops re-scored, each also flipped
+        self.AGE_SPREAD_PENALTY = 10  # confidence lost per year of spread between passes
         
         # Set tesseract path from environment or use system default
         tesseract_cmd = os.getenv('TESSERACT_CMD', '/nix/store/44vcjbcy1p2yhc974bcw250k2r5x5cpa-tesseract-5.3.4/bin/tesseract')
@@ -44,10 +86,25 @@ class VerificationService:
             r'\b\d{2}[/-]\d{2}[/-]\d{2}\b'  # YY format
         ]
     
+    def warmup(self):
+        """Load the face and age models now rather than on the first request"""
+        DeepFace = load_deepface()
+        if DeepFace is None:
+            return
+        try:
+            DeepFace.build_model('VGG-Face')
+            try:
+                DeepFace.build_model(task='facial_attribute', model_name='Age')
+            except TypeError:
+                # Older DeepFace releases take the model name only
+                DeepFace.build_model('Age')
+        except Exception as e:
+            logger.error(f"Model warmup failed: {e}")
+    
     def is_blurry(self, img_path):
         """Check if image is blurry using Laplacian variance"""
         try:
-            img = cv2.imread(img_path)
+            img = load_image(img_path)
             if img is None:
                 return True
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -58,7 +115,7 @@ class VerificationService:
     def is_too_dark(self, img_path):
         """Check if image is too dark"""
         try:
-            img = cv2.imread(img_path)
+            img = load_image(img_path)
             if img is None:
                 return True
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -68,22 +125,70 @@ class VerificationService:
     
     def check_image_quality(self, img_path):
         """Check image quality and return list of issues"""
-        issues = []
+        return quality_issue_messages(self.image_quality_flags(img_path))
+    
+    def image_quality_flags(self, img_path):
+        """Check image quality and return a QualityFlag bitmask"""
+        return self.quality_gate(img_path)['flags']
+    
+    def quality_gate(self, img_path):
+        """Cheap usability checks on a small pyramid level, run before any model"""
+        img = load_image(img_path)
+        if img is None:
+            flags = QualityFlag.UNREADABLE
+            return {'passed': False, 'flags': flags, 'issues': quality_issue_messages(flags), 'metrics': {}}
+        
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        scale = 1.0
+        while max(gray.shape) > self.QUALITY_MAX_DIMENSION:
+            gray = cv2.pyrDown(gray)
+            scale /= 2
         
-        if self.is_blurry(img_path):
-            issues.append("Image appears to be blurry")
+        # Brightness and over-exposure both come from one histogram
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        brightness = float(np.dot(hist, np.arange(256)) / hist.sum())
+        overexposed = float(hist[250:].sum() / hist.sum())
+        blur_score = float(cv2.Laplacian(gray, cv2.CV_64F).var())
         
-        if self.is_too_dark(img_path):
-            issues.append("Image is too dark or has poor lighting")
+        min_face = max(1, int(self.MIN_FACE_SIZE * scale / 2))
+        faces = get_face_cascade().detectMultiScale(gray, 1.1, 4, minSize=(min_face, min_face))
+        face_size = max((min(w, h) for (x, y, w, h) in faces), default=0) / scale
         
-        return issues
+        flags = QualityFlag(0)
+        if blur_score < self.BLUR_THRESHOLD:
+            flags |= QualityFlag.BLURRY
+        if brightness < self.BRIGHTNESS_THRESHOLD:
+            flags |= QualityFlag.TOO_DARK
+        if overexposed > self.OVEREXPOSURE_FRACTION:
+            flags |= QualityFlag.OVEREXPOSED
+        if len(faces) == 0:
+            flags |= QualityFlag.NO_FACE
+        elif face_size < self.MIN_FACE_SIZE:
+            flags |= QualityFlag.FACE_TOO_SMALL
+        
+        return {
+            'passed': not (flags & self.QUALITY_GATE_REJECT),
+            'flags': flags,
+            'issues': quality_issue_messages(flags),
+            'metrics': {
+                'blur_score': round(blur_score, 2),
+                'brightness': round(brightness, 2),
+                'overexposed_fraction': round(overexposed, 4),
+                'face_size': round(face_size, 1)
+            }
+        }
     
     def extract_dob(self, image_path):
         """Extract date of birth from document using OCR"""
+        details = self.extract_dob_details(image_path)
+        return details['dob'], details['confidence']
+    
+    def extract_dob_details(self, image_path):
+        """Extract DOB along with the index of the pattern that matched it"""
         try:
-            img = cv2.imread(image_path)
+            img = load_image(image_path)
             if img is None:
-                return None, 0
+                return {'dob': None, 'confidence': 0, 'pattern_index': None}
             
             # Convert to grayscale for better OCR
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -105,13 +210,57 @@ class VerificationService:
                     
                     # Calculate confidence based on pattern priority
                     confidence = max(100 - i * 20, 20)
-                    return dob, confidence
+                    return {'dob': dob, 'confidence': confidence, 'pattern_index': i}
             
-            return None, 0
+            return {'dob': None, 'confidence': 0, 'pattern_index': None}
             
         except Exception as e:
-            print(f"Error in DOB extraction: {e}")
-            return None, 0
+            logger.error(f"Error in DOB extraction: {e}")
+            return {'dob': None, 'confidence': 0, 'pattern_index': None}
+    
+    def extract_dob_first(self, image_paths, executor=None):
+        """Extract the DOB from several images at once and return the first valid hit.
+        
+        Returns (index, details), with index None if no image yields a DOB that
+        parses to an age. Extractions that have not started are cancelled as soon
+        as one succeeds; ones already running finish in the background.
+        """
+        def has_age(details):
+            return details['dob'] and self.calculate_age(details['dob']) is not None
+        
+        if len(image_paths) == 1:
+            details = self.extract_dob_details(image_paths[0])
+            if has_age(details):
+                return 0, details
+            return None, {'dob': None, 'confidence': 0, 'pattern_index': None}
+        
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=len(image_paths))
+        futures = {executor.submit(self.extract_dob_details, path): i for i, path in enumerate(image_paths)}
+        try:
+            for future in as_completed(futures):
+                details = future.result()
+                if has_age(details):
+                    return futures[future], details
+        finally:
+            for future in futures:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+        return None, {'dob': None, 'confidence': 0, 'pattern_index': None}
+    
+    def find_face_reference(self, image_paths):
+        """Index of the image with the largest detected face, or None"""
+        best_index, best_size = None, 0
+        for i, path in enumerate(image_paths):
+            img = load_image(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                continue
+            faces = get_face_cascade().detectMultiScale(img, 1.1, 4, minSize=(self.MIN_FACE_SIZE // 2, self.MIN_FACE_SIZE // 2))
+            size = max((w * h for (x, y, w, h) in faces), default=0)
+            if size > best_size:
+                best_index, best_size = i, size
+        return best_index
     
     def calculate_age(self, dob_str):
         """Calculate age from date of birth string"""
@@ -141,15 +290,21 @@ class VerificationService:
             return None
             
         except Exception as e:
-            print(f"Error calculating age: {e}")
+            logger.error(f"Error calculating age: {e}")
             return None
     
     def verify_face_match(self, img1_path, img2_path):
         """Verify if two face images match"""
-        if not DEEPFACE_AVAILABLE:
-            print("DeepFace not available, returning mock verification result")
+        details = self.face_match_details(img1_path, img2_path)
+        return details['verified'], details['confidence']
+    
+    def face_match_details(self, img1_path, img2_path):
+        """Verify two faces and keep the raw distance and threshold for re-scoring"""
+        DeepFace = load_deepface()
+        if DeepFace is None:
+            logger.info("DeepFace not available, returning mock verification result", extra={'sample_rate': 0.01})
             # Return a neutral result when DeepFace is not available
-            return True, 0.5
+            return {'verified': True, 'confidence': 0.5, 'distance': None, 'threshold': None}
             
         try:
             result = DeepFace.verify(
@@ -160,24 +315,43 @@ class VerificationService:
             )
             
             distance = result["distance"]
-            threshold = result["threshold"]
-            verified = result["verified"]
-            
-            # Calculate confidence percentage
-            confidence = max(0, min(100, (1 - distance / threshold) * 100))
+            threshold = self.FACE_DISTANCE_THRESHOLD or result["threshold"]
+            verified = distance <= threshold
             
-            return verified, round(confidence, 2)
+            return {
+                'verified': verified,
+                'confidence': self.face_confidence(distance, threshold),
+                'distance': distance,
+                'threshold': threshold
+            }
             
         except Exception as e:
-            print(f"Face match failed: {e}")
-            return True, 0.5
+            logger.error(f"Face match failed: {e}")
+            return {'verified': True, 'confidence': 0.5, 'distance': None, 'threshold': None}
+    
+    def face_confidence(self, distance, threshold):
+        """Confidence percentage of a face match given its distance"""
+        confidence = max(0, min(100, (1 - distance / threshold) * 100))
+        return round(confidence, 2)
     
     def estimate_visual_age_range(self, image_path):
         """Estimate age range from facial features"""
-        if not DEEPFACE_AVAILABLE:
-            print("DeepFace not available, returning estimated age range")
+        details = self.age_estimate_details(image_path)
+        return details['age_range'], details['exact_age']
+    
+    def age_estimate_details(self, image_path, claimed_age=None):
+        """Estimate age range and keep the raw model age for re-scoring.
+        
+        One pass decides most selfies. When the estimate or the claimed age is
+        close to the legal age, the face is re-scored on flipped and re-cropped
+        copies, the mean age is used and the spread between passes sets the
+        confidence.
+        """
+        DeepFace = load_deepface()
+        if DeepFace is None:
+            logger.info("DeepFace not available, returning estimated age range", extra={'sample_rate': 0.01})
             # Return a reasonable age range when DeepFace is not available, adjusted for camera quality
-            return "18-35", 25
+            return {'age_range': "18-35", 'exact_age': 25, 'raw_age': None, 'passes': 0, 'age_confidence': None}
             
         try:
             result = DeepFace.analyze(
@@ -188,23 +362,68 @@ class VerificationService:
             )
             
             if isinstance(result, list):
-                exact_age = result[0]['age']
-            else:
-                exact_age = result['age']
-            
-            # Adjust for poor camera quality - reduce age by 5-7 years
-            adjusted_age = max(18, int(exact_age) - 6)  # Reduce by 6 years (middle of 5-7 range)
+                result = result[0]
             
-            # Create age range based on adjusted age
-            lower = max(18, adjusted_age - 5)  # Add some tolerance
-            upper = adjusted_age + 5
-            age_range = f"{lower}-{upper}"
+            ages = [float(result['age'])]
+            if self.near_age_boundary(ages[0], claimed_age):
+                ages += self.augmented_ages(image_path, result.get('region'))
+            raw_age = float(np.mean(ages))
+            confidence = None
+            if len(ages) > 1:
+                confidence = round(max(0.0, 100 - float(np.std(ages)) * self.AGE_SPREAD_PENALTY), 2)
             
-            return age_range, adjusted_age
+            age_range, adjusted_age = self.adjust_age_estimate(raw_age)
+            return {'age_range': age_range, 'exact_age': adjusted_age, 'raw_age': raw_age,
+                    'passes': len(ages), 'age_confidence': confidence}
             
         except Exception as e:
-            print(f"Age estimation failed: {e}")
-            return "18-35", 25
+            logger.error(f"Age estimation failed: {e}")
+            return {'age_range': "18-35", 'exact_age': 25, 'raw_age': None, 'passes': 0, 'age_confidence': None}
+    
+    def near_age_boundary(self, raw_age, claimed_age=None):
+        """Whether an age decision is close enough to the legal age to need more passes"""
+        ages = [raw_age - self.AGE_ADJUSTMENT]
+        if claimed_age is not None:
+            ages.append(claimed_age)
+        return any(abs(age - self.MIN_LEGAL_AGE) <= self.AGE_REFINE_MARGIN for age in ages)
+    
+    def augmented_ages(self, image_path, region):
+        """Raw ages of flipped and re-cropped copies of the already detected face"""
+        img = load_image(image_path)
+        if img is None or not region or not region.get('w'):
+            return []
+        
+        DeepFace = load_deepface()
+        x, y, w, h = region['x'], region['y'], region['w'], region['h']
+        ages = []
+        for padding in self.AGE_TTA_PADDINGS:
+            dx, dy = int(w * padding), int(h * padding)
+            crop = img[max(0, y - dy):y + h + dy, max(0, x - dx):x + w + dx]
+            for variant in (crop, cv2.flip(crop, 1)):
+                try:
+                    # The face is already located, so skip detection on the crops
+                    result = DeepFace.analyze(
+                        img_path=variant,
+                        actions=['age'],
+                        detector_backend='skip',
+                        enforce_detection=False,
+                        silent=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Augmented age pass failed: {e}")
+                    continue
+                ages.append(float((result[0] if isinstance(result, list) else result)['age']))
+        return ages
+    
+    def adjust_age_estimate(self, raw_age):
+        """Turn a raw model age into the adjusted age and its range"""
+        # Adjust for poor camera quality - reduce age by 5-7 years
+        adjusted_age = max(self.MIN_ESTIMATED_AGE, int(raw_age) - self.AGE_ADJUSTMENT)
+        
+        # Create age range based on adjusted age
+        lower = max(self.MIN_ESTIMATED_AGE, adjusted_age - self.AGE_RANGE_MARGIN)  # Add some tolerance
+        upper = adjusted_age + self.AGE_RANGE_MARGIN
+        return f"{lower}-{upper}", adjusted_age
     
     def compare_ages(self, claimed_age, estimated_range):
         """Compare claimed age with estimated age range"""
@@ -218,5 +437,5 @@ class VerificationService:
             return (lower - self.AGE_TOLERANCE) <= claimed_age <= (upper + self.AGE_TOLERANCE)
             
         except Exception as e:
-            print(f"Age comparison failed: {e}")
+            logger.error(f"Age comparison failed: {e}")
             return False